@@ -32,6 +32,40 @@ const unsigned long SERIAL_PERIOD_MS = 120;  // para no inundar Serial
 const int SERVO_MIN_US = 544;
 const int SERVO_MAX_US = 2400;
 
+/* ====== Comandos desde la PC (app de control) ======
+   ASCII:   "SET m1 m2 m3 m4 mag\n"  con m en 0..1023 (misma escala que los potes)
+   Binario: trama fija de 9 bytes (ver code/gui/protocolo.py), se acepta siempre:
+            [0xA5][tipo<<4|flags][seq][4 canales x 10 bits][CRC-8 poly 0x07]
+   Delta:   [0xA5][0x3<<4|flags][seq][máscara][canales de la máscara x 10 bits][CRC]
+            sólo los canales que cambiaron (5 a 10 bytes); el resto conserva el objetivo.
+            Se ignora hasta recibir un SET completo.
+   "PROTO BIN\n" / "PROTO ASCII\n" -> responde "PROTO BIN OK" / "PROTO ASCII OK".
+   "PROTO DELTA\n" -> "PROTO DELTA OK" (avisa a la PC que puede mandar deltas).
+   Move:    trama fija con tipo 0x4: la pose va a una cola de MOVE_QUEUE lugares y se
+            ejecuta en orden; F_NUEVA (0x2) en la primera de una corrida vacía la cola.
+            Se acepta sólo la secuencia esperada; una repetida o fuera de orden se
+            descarta y se contesta con el ACK de la última aceptada.
+   Ack:     trama fija con tipo 0x5 hacia la PC: seq = MOVE aceptada, o con F_LLEGO (0x1)
+            la que alcanzó su objetivo (EMA a REACH_TOL cuentas en todos los canales);
+            canales = {lugares libres, MOVE_QUEUE, 0x100 | seq de la última alcanzada, 0}.
+   "PROTO ACK\n" -> "PROTO ACK OK" (la PC puede mandar MOVE).
+   Un SET o delta vacía la cola de MOVE (STOP/HOME de la PC mandan).
+   Desde el primer SET válido los servos siguen a la PC en vez de a los potes.
+*/
+const uint8_t MAG_PIN = 7;        // electroimán (ajusta al pin real)
+const uint8_t SYNC_BYTE = 0xA5;
+const uint8_t FRAME_LEN = 9;
+const uint8_t FRAME_MAX = 10;     // la delta más larga (4 canales)
+const uint8_t T_SET = 0x1;
+const uint8_t T_DELTA = 0x3;
+const uint8_t T_MOVE = 0x4;
+const uint8_t T_ACK = 0x5;
+const uint8_t F_MAG = 0x1;
+const uint8_t F_NUEVA = 0x2;      // MOVE: primera de una corrida
+const uint8_t F_LLEGO = 0x1;      // ACK: la MOVE alcanzó su objetivo
+const uint8_t MOVE_QUEUE = 4;     // poses en cola (créditos de la PC)
+const int REACH_TOL = 8;          // cuentas; el EMA entero se frena hasta 5 antes del objetivo
+
 /* ====== Estado por canal ====== */
 Servo servos[N_CHANNELS];
 int32_t ema[N_CHANNELS];        // EMA en escala ADC
@@ -42,6 +76,28 @@ int observedMax[N_CHANNELS];    // max observado (ayuda a calibrar)
 unsigned long tUpdate = 0;
 unsigned long tSerial = 0;
 
+/* ====== Estado de comandos ====== */
+bool hostActive = false;         // true desde el primer SET: la PC manda
+int hostTarget[N_CHANNELS];      // objetivo recibido (0..1023)
+bool protoBin = false;           // sólo informativo: el RX acepta ambos formatos
+char lineBuf[40];
+uint8_t lineLen = 0;
+uint8_t frameBuf[FRAME_MAX];
+uint8_t frameLen = 0;
+
+/* ====== Cola de movimientos confirmados (MOVE) ====== */
+int moveQ[MOVE_QUEUE][N_CHANNELS];
+uint8_t moveMag[MOVE_QUEUE];
+uint8_t moveSeqQ[MOVE_QUEUE];
+uint8_t moveHead = 0;            // la que se está ejecutando
+uint8_t moveCount = 0;
+bool moveStarted = false;        // la cabeza ya es hostTarget
+bool moveRun = false;            // hay una corrida (moveFirst / moveNext valen)
+bool moveAccepted = false;       // se aceptó alguna MOVE de la corrida
+uint8_t moveFirst = 0;
+uint8_t moveNext = 0;            // próxima secuencia que se acepta
+uint16_t moveReached = 0;        // 0x100 | seq de la última alcanzada (0: ninguna)
+
 /* ---------- Utilidades ---------- */
 
 // Mediana de 3 lecturas en un pin analógico
@@ -57,6 +113,204 @@ int readPotMedian3(uint8_t pin) {
   return c;
 }
 
+// CRC-8 poly 0x07 (igual que protocolo.crc8 en la app)
+uint8_t crc8(const uint8_t *data, uint8_t len) {
+  uint8_t c = 0;
+  for (uint8_t i = 0; i < len; i++) {
+    c ^= data[i];
+    for (uint8_t b = 0; b < 8; b++) c = (c & 0x80) ? (uint8_t)((c << 1) ^ 0x07) : (uint8_t)(c << 1);
+  }
+  return c;
+}
+
+// Largo de una trama delta según su máscara de canales
+uint8_t deltaLen(uint8_t mask) {
+  uint8_t k = 0;
+  for (uint8_t i = 0; i < N_CHANNELS; i++) if (mask & (1 << i)) k++;
+  return 5 + (10 * k + 7) / 8;
+}
+
+// Largo esperado de la trama en frameBuf (0 = todavía faltan bytes para saberlo)
+uint8_t frameExpected() {
+  if (frameLen < 2) return 0;
+  if ((frameBuf[1] >> 4) != T_DELTA) return FRAME_LEN;
+  if (frameLen < 4) return 0;
+  return deltaLen(frameBuf[3]);
+}
+
+// Un comando directo de la PC manda sobre la cola de MOVE
+void clearMoves() {
+  moveCount = 0;
+  moveStarted = false;
+  moveRun = false;
+}
+
+void applyHostSet(int m1, int m2, int m3, int m4, int mag) {
+  clearMoves();
+  int m[N_CHANNELS] = {m1, m2, m3, m4};
+  for (uint8_t i = 0; i < N_CHANNELS; i++) hostTarget[i] = constrain(m[i], 0, 1023);
+  digitalWrite(MAG_PIN, mag ? HIGH : LOW);
+  hostActive = true;
+}
+
+void handleLine(char *line) {
+  int m1, m2, m3, m4, mag;
+  if (strncmp(line, "SET ", 4) == 0) {
+    if (sscanf(line + 4, "%d %d %d %d %d", &m1, &m2, &m3, &m4, &mag) == 5) applyHostSet(m1, m2, m3, m4, mag);
+  } else if (strcmp(line, "PROTO BIN") == 0) {
+    protoBin = true;
+    Serial.println(F("PROTO BIN OK"));
+  } else if (strcmp(line, "PROTO ASCII") == 0) {
+    protoBin = false;
+    Serial.println(F("PROTO ASCII OK"));
+  } else if (strcmp(line, "PROTO DELTA") == 0) {
+    Serial.println(F("PROTO DELTA OK"));
+  } else if (strcmp(line, "PROTO ACK") == 0) {
+    Serial.println(F("PROTO ACK OK"));
+  }
+}
+
+void handleDelta(const uint8_t *f) {
+  if (!hostActive) return;  // sin un SET completo no hay contra qué aplicar la diferencia
+  clearMoves();
+  uint8_t mask = f[3] & 0x0F;
+  uint32_t bits = 0;
+  uint8_t nbits = 0;
+  uint8_t pos = 4;
+  for (uint8_t i = 0; i < N_CHANNELS; i++) {
+    if (!(mask & (1 << i))) continue;
+    while (nbits < 10) { bits |= (uint32_t)f[pos++] << nbits; nbits += 8; }
+    hostTarget[i] = bits & 0x3FF;
+    bits >>= 10;
+    nbits -= 10;
+  }
+  digitalWrite(MAG_PIN, (f[1] & F_MAG) ? HIGH : LOW);
+}
+
+// 4 canales de 10 bits, little-endian: c0 | c1<<10 | c2<<20 | c3<<30
+void unpack4(const uint8_t *f, int *c) {
+  c[0] = f[3] | ((f[4] & 0x03) << 8);
+  c[1] = (f[4] >> 2) | ((f[5] & 0x0F) << 6);
+  c[2] = (f[5] >> 4) | ((f[6] & 0x3F) << 4);
+  c[3] = (f[6] >> 6) | (f[7] << 2);
+}
+
+void sendAck(uint8_t seq, uint8_t flags) {
+  uint16_t c0 = MOVE_QUEUE - moveCount, c1 = MOVE_QUEUE, c2 = moveReached;
+  uint8_t f[FRAME_LEN];
+  f[0] = SYNC_BYTE;
+  f[1] = (T_ACK << 4) | flags;
+  f[2] = seq;
+  f[3] = c0 & 0xFF;
+  f[4] = (c0 >> 8) | ((c1 & 0x3F) << 2);
+  f[5] = (c1 >> 6) | ((c2 & 0x0F) << 4);
+  f[6] = c2 >> 4;
+  f[7] = 0;
+  f[8] = crc8(f + 1, FRAME_LEN - 2);
+  Serial.write(f, FRAME_LEN);
+}
+
+void handleMove(const uint8_t *f, uint8_t flags) {
+  uint8_t seq = f[2];
+  // la primera de una corrida vacía la cola, salvo que sea un reenvío de la misma
+  if ((flags & F_NUEVA) && !(moveRun && seq == moveFirst)) {
+    moveCount = 0;
+    moveStarted = false;
+    moveRun = true;
+    moveAccepted = false;
+    moveFirst = moveNext = seq;
+    moveReached = 0;
+  }
+  if (!moveRun) return;
+  if (seq != moveNext || moveCount >= MOVE_QUEUE) {
+    // repetida, hueco o sin lugar: la PC retransmite desde la última aceptada
+    if (moveAccepted) sendAck(moveNext - 1, 0);
+    return;
+  }
+  uint8_t k = (moveHead + moveCount) % MOVE_QUEUE;
+  unpack4(f, moveQ[k]);
+  moveMag[k] = flags & F_MAG;
+  moveSeqQ[k] = seq;
+  moveCount++;
+  moveNext++;
+  moveAccepted = true;
+  sendAck(seq, 0);
+}
+
+// La cabeza de la cola pasa a ser el objetivo
+void startMove() {
+  for (uint8_t i = 0; i < N_CHANNELS; i++) hostTarget[i] = moveQ[moveHead][i];
+  digitalWrite(MAG_PIN, moveMag[moveHead] ? HIGH : LOW);
+  hostActive = true;
+  moveStarted = true;
+}
+
+bool targetReached() {
+  for (uint8_t i = 0; i < N_CHANNELS; i++) {
+    int32_t d = ema[i] - hostTarget[i];
+    if (d > REACH_TOL || d < -REACH_TOL) return false;
+  }
+  return true;
+}
+
+// Después de cada actualización: confirma la llegada y arranca la próxima
+void updateMoves() {
+  if (moveStarted && targetReached()) {
+    uint8_t seq = moveSeqQ[moveHead];
+    moveHead = (moveHead + 1) % MOVE_QUEUE;
+    moveCount--;
+    moveStarted = false;
+    moveReached = 0x100 | seq;
+    sendAck(seq, F_LLEGO);
+  }
+  if (!moveStarted && moveCount > 0) startMove();
+}
+
+void handleFrame(const uint8_t *f) {
+  uint8_t tipo = f[1] >> 4;
+  uint8_t flags = f[1] & 0x0F;
+  if (tipo == T_DELTA) { handleDelta(f); return; }
+  if (tipo == T_MOVE) { handleMove(f, flags); return; }
+  if (tipo != T_SET) return;
+  int c[N_CHANNELS];
+  unpack4(f, c);
+  applyHostSet(c[0], c[1], c[2], c[3], flags & F_MAG);
+}
+
+// Lee todo lo disponible sin bloquear: tramas binarias (empiezan con SYNC) o líneas ASCII
+void pollSerial() {
+  while (Serial.available()) {
+    uint8_t b = Serial.read();
+    if (frameLen > 0 || b == SYNC_BYTE) {
+      frameBuf[frameLen++] = b;
+      // el largo depende del tipo (SET 9 bytes, delta 5..10): validar cuando esté completa
+      while (frameLen > 0) {
+        uint8_t need = frameExpected();
+        if (need == 0 || frameLen < need) break;
+        if (crc8(frameBuf + 1, need - 2) == frameBuf[need - 1]) {
+          handleFrame(frameBuf);
+          frameLen -= need;
+          memmove(frameBuf, frameBuf + need, frameLen);
+        } else {
+          // resincroniza en el próximo SYNC dentro del buffer (puede quedar otra trama entera)
+          uint8_t k = 1;
+          while (k < frameLen && frameBuf[k] != SYNC_BYTE) k++;
+          frameLen -= k;
+          memmove(frameBuf, frameBuf + k, frameLen);
+        }
+      }
+      continue;
+    }
+    if (b == '\n') {
+      lineBuf[lineLen] = 0;
+      handleLine(lineBuf);
+      lineLen = 0;
+    } else if (b != '\r' && lineLen < sizeof(lineBuf) - 1) {
+      lineBuf[lineLen++] = b;
+    }
+  }
+}
+
 // map con límites y protección división por cero
 int mapConstrain(long x, long in_min, long in_max, long out_min, long out_max) {
   if (in_max == in_min) return (int)out_min;
@@ -68,6 +322,8 @@ int mapConstrain(long x, long in_min, long in_max, long out_min, long out_max) {
 
 void setup() {
   Serial.begin(230400);
+  pinMode(MAG_PIN, OUTPUT);
+  digitalWrite(MAG_PIN, LOW);
 
   for (uint8_t i = 0; i < N_CHANNELS; i++) {
     servos[i].attach(SERVO_PINS[i], SERVO_MIN_US, SERVO_MAX_US);
@@ -87,13 +343,15 @@ void setup() {
 void loop() {
   unsigned long now = millis();
 
+  pollSerial();
+
   // ====== Control de servos (todos los canales) ======
   if (now - tUpdate >= UPDATE_PERIOD_MS) {
     tUpdate = now;
 
     for (uint8_t i = 0; i < N_CHANNELS; i++) {
-      // 1) Lectura robusta
-      int raw = readPotMedian3(POT_PINS[i]);
+      // 1) Lectura robusta (o el objetivo enviado por la PC)
+      int raw = hostActive ? hostTarget[i] : readPotMedian3(POT_PINS[i]);
 
       // 2) Track min/max observados (para calibrar RAW_MIN/MAX luego)
       if (raw < observedMin[i]) observedMin[i] = raw;
@@ -114,6 +372,8 @@ void loop() {
         lastAngle[i] = angle;
       }
     }
+
+    updateMoves();
   }
 
   // ====== Salida Serial resumida y con throttle ======
@@ -0,0 +1,397 @@
+"""
+Benchmarks headless de la app contra los dispositivos simulados (no usa placas; Tk sólo en arranque).
+
+    python bench.py                    # todo, 5 s por prueba
+    python bench.py --duracion 10 --json resultados.json
+    python bench.py --solo teleop codec
+    python bench.py --solo filtro       # antes/después del filtro y las tramas delta
+    python bench.py --solo arranque     # regresiones en el tiempo de arranque de la GUI
+
+Pruebas:
+  teleop       minibrazo simulado -> lector -> SerialClient -> brazo simulado.
+               Tasa de POT y de SET, coalescidos y latencia punta a punta (desde que el
+               minibrazo "imprime" la muestra hasta que el brazo terminó de recibir el SET,
+               incluyendo el tiempo en el cable), en ASCII y en binario.
+  secuencia    reproducción de una secuencia con trayectoria.reproducir: tiempo real vs
+               planificado, jitter de envío y latencia de llegada al brazo por setpoint.
+  codec        codificación/decodificación ASCII vs binaria (mensajes/s y bytes por mensaje).
+  filtro       teleop por el mismo camino que ArmController (filtro + SerialClient) con un
+               minibrazo más realista: se mueve un motor por vez, con pausas, y todos los
+               potes tienen ruido. Compara sin filtro / banda / delta / One-Euro /
+               tope de tasa: bytes/s y SET/s en el enlace del brazo, y error de seguimiento
+               (|objetivo del brazo - salida del minibrazo| muestreado cada 5 ms, en cuentas).
+  arranque     `import main` en un intérprete nuevo por corrida, miniaturas (recursos.py) sin
+               caché y desde la caché, y, si hay pantalla, hasta la primera ventana dibujada y
+               hasta tener logo e imagen del brazo, con la caché fría y caliente.
+
+El CPU se mide con time.process_time() e incluye los hilos de los simuladores; se corre
+una línea de base con sólo los simuladores y se informa también la diferencia.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+import filtros
+import protocolo
+import recursos
+import simulador
+import trayectoria
+from controlador import ArmController
+from serie import SerialClient
+
+
+def _percentiles(vals: List[float]) -> Dict[str, float]:
+    if not vals:
+        return {"n": 0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    v = sorted(vals)
+    pick = lambda q: v[min(len(v) - 1, int(q * len(v)))]
+    return {"n": len(v), "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": v[-1]}
+
+
+class _Cpu:
+    def __enter__(self):
+        self.wall0, self.cpu0 = time.monotonic(), time.process_time()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall = time.monotonic() - self.wall0
+        self.cpu = time.process_time() - self.cpu0
+        self.pct = 100.0 * self.cpu / self.wall if self.wall > 0 else 0.0
+
+
+def _conectar(dev: simulador.DispositivoSimulado, binario: bool) -> SerialClient:
+    c = SerialClient()
+    c.attach(simulador.PuertoSimulado(dev))
+    if binario:
+        c.negotiate_binary(timeout=1.0)
+    return c
+
+
+def _forward_loop(mini: SerialClient, arm: SerialClient, stop: threading.Event):
+    """Mismo camino que el hilo de telemetría de la app: leer POT y reenviar SET."""
+    while not stop.is_set():
+        for msg in mini.read():
+            if isinstance(msg, protocolo.Frame) and msg.tipo == protocolo.T_POT:
+                m1, m2, m3, m4 = msg.canales
+                arm.send_immediate(m1, m2, m3, m4, 0)
+
+
+def bench_linea_base(duracion: float) -> dict:
+    mini_dev, arm_dev = simulador.MiniSimulado(9600), simulador.BrazoSimulado(230400)
+    with _Cpu() as cpu:
+        pm, pa = simulador.PuertoSimulado(mini_dev), simulador.PuertoSimulado(arm_dev)
+        time.sleep(duracion)
+        pm.close(); pa.close()
+    return {"cpu_pct": cpu.pct}
+
+
+def bench_teleop(duracion: float, baud_mini: int, binario: bool) -> dict:
+    mini_dev = simulador.MiniSimulado(baud_mini)
+    arm_dev = simulador.BrazoSimulado(230400)
+    mini = _conectar(mini_dev, binario)
+    arm = _conectar(arm_dev, binario)
+    time.sleep(0.2)
+    n_emit0, n_recv0 = len(mini_dev.emitidos), len(arm_dev.recibidos)
+    stop = threading.Event()
+    with _Cpu() as cpu:
+        t = threading.Thread(target=_forward_loop, args=(mini, arm, stop), daemon=True)
+        t.start()
+        time.sleep(duracion)
+        stop.set()
+        t.join()
+        arm.flush()
+        time.sleep(0.05)
+    emitidos = list(mini_dev.emitidos)[n_emit0:]
+    recibidos = list(arm_dev.recibidos)[n_recv0:]
+    stats = arm.stats()
+    mini.close(); arm.close()
+
+    # latencia: cada SET recibido contra la última emisión del minibrazo con los mismos valores
+    eventos = [(t, 0, p) for t, p in emitidos] + [(t, 1, p[:4]) for t, p in recibidos]
+    eventos.sort()
+    ultima, lat = {}, []
+    for t, tipo, p in eventos:
+        if tipo == 0:
+            ultima[p] = t
+        elif p in ultima:
+            lat.append((t - ultima[p]) * 1000.0)
+    return {
+        "modo": "binario" if binario else "ascii",
+        "baud_mini": baud_mini,
+        "pot_s": len(emitidos) / cpu.wall,
+        "set_s": len(recibidos) / cpu.wall,
+        "coalescidos": stats["coalesced"],
+        "latencia_ms": _percentiles(lat),
+        "cpu_pct": cpu.pct,
+    }
+
+
+def bench_secuencia(duracion: float, binario: bool) -> dict:
+    arm_dev = simulador.BrazoSimulado(230400, diagnostico=False)
+    arm = _conectar(arm_dev, binario)
+    rnd = random.Random(1)
+    poses, total = [], 0.0
+    q = (512, 512, 512, 512, 0)
+    while total < duracion:
+        p = tuple(rnd.randint(100, 900) for _ in range(4)) + (rnd.randint(0, 1),)
+        total = trayectoria.Trayectoria(q, poses + [p]).duracion
+        poses.append(p)
+    tray = trayectoria.Trayectoria(q, poses)
+    enviados = []
+
+    def send(sp):
+        enviados.append((time.monotonic(), sp))
+        arm.send_immediate(*sp)
+
+    n0 = len(arm_dev.recibidos)
+    with _Cpu() as cpu:
+        rep = trayectoria.reproducir(tray, send)
+        arm.flush()
+        time.sleep(0.05)
+    recibidos = list(arm_dev.recibidos)[n0:]
+    arm.close()
+
+    # latencia de llegada: desde que reproducir() entregó el setpoint hasta que el brazo lo recibió
+    eventos = sorted([(t, 0, p) for t, p in enviados] + [(t, 1, p) for t, p in recibidos])
+    ultima, lat = {}, []
+    for t, tipo, p in eventos:
+        if tipo == 0:
+            ultima[p] = t
+        elif p in ultima:
+            lat.append((t - ultima[p]) * 1000.0)
+    return {
+        "modo": "binario" if binario else "ascii",
+        "plan_s": rep.plan_s,
+        "real_s": rep.real_s,
+        "setpoints": rep.setpoints,
+        "recibidos": len(recibidos),
+        "jitter_envio_ms": {"p50": rep.jitter_p50_ms, "p95": rep.jitter_p95_ms, "max": rep.jitter_max_ms},
+        "latencia_llegada_ms": _percentiles(lat),
+        "cpu_pct": cpu.pct,
+    }
+
+
+def _rampa(fase: float, desde: float, hasta: float, dur: float = 1.5) -> float:
+    return desde + (hasta - desde) * min(1.0, max(0.0, fase) / dur)
+
+
+def _ondas_teleop(t: float):
+    """Un motor por vez: 0 va (0-1.5 s) y vuelve (4-5.5 s), 1 va y vuelve entre medio; 2 y 3 quietos."""
+    fase = t % 8.0
+    c0 = _rampa(fase, 200, 800) if fase < 4.0 else _rampa(fase - 4.0, 800, 200)
+    c1 = _rampa(fase - 2.0, 300, 700) if fase < 6.0 else _rampa(fase - 6.0, 700, 300)
+    rnd = random.Random(int(t * 200))   # ruido del pote, igual en todas las variantes
+    return (c0 + rnd.uniform(-6, 6), c1 + rnd.uniform(-6, 6),
+            300 + rnd.uniform(-6, 6), 700 + rnd.uniform(-6, 6))
+
+
+def _escalon(eventos, t: float, i: int):
+    """Valor vigente en t (eventos ordenados (t, pose)); avanza el índice i."""
+    while i + 1 < len(eventos) and eventos[i + 1][0] <= t:
+        i += 1
+    return i
+
+
+VARIANTES_FILTRO = (
+    ("sin_filtro", filtros.SIN_FILTRO, False),                     # como antes
+    ("banda6", filtros.ConfigFiltro(), False),
+    ("banda6_delta", filtros.ConfigFiltro(), True),                # lo que usa la app por defecto
+    ("euro_banda6_delta", filtros.ConfigFiltro(modo="euro"), True),
+    ("banda6_delta_33hz", filtros.ConfigFiltro(max_hz=33.0), True),
+)
+
+
+def bench_filtro(duracion: float, config: filtros.ConfigFiltro, delta: bool) -> dict:
+    mini_dev = simulador.MiniSimulado(115200, ondas=_ondas_teleop)
+    arm_dev = simulador.BrazoSimulado(230400, diagnostico=False)
+    ctrl = ArmController()
+    ctrl.configurar_filtro(config)
+    ctrl.usar_delta(delta)
+    arm, mini = ctrl.arm, ctrl.mini
+    arm.attach(simulador.PuertoSimulado(arm_dev))
+    arm.negotiate_binary(timeout=1.0)
+    mini.attach(simulador.PuertoSimulado(mini_dev))
+    mini.negotiate_binary(timeout=1.0)
+    ctrl.teleop = True
+    time.sleep(0.2)
+    n_emit0, n_recv0 = len(mini_dev.emitidos), len(arm_dev.recibidos)
+    bytes0, sent0 = arm.bytes_tx, arm.sent
+    stop = threading.Event()
+
+    def leer():   # mismo camino que el hilo de telemetría del controlador
+        while not stop.is_set():
+            ctrl._procesar_telemetria(mini.read())
+    with _Cpu() as cpu:
+        t = threading.Thread(target=leer, daemon=True)
+        t.start()
+        time.sleep(duracion)
+        stop.set()
+        t.join()
+        arm.flush()
+        time.sleep(0.05)
+    emitidos = list(mini_dev.emitidos)[n_emit0:]
+    recibidos = list(arm_dev.recibidos)[n_recv0:]
+    bytes_tx, sets = arm.bytes_tx - bytes0, arm.sent - sent0
+    mini.close(); arm.close()
+
+    err = []
+    if emitidos and recibidos:
+        i = j = 0
+        t = max(emitidos[0][0], recibidos[0][0])
+        while t < emitidos[-1][0]:
+            i = _escalon(emitidos, t, i)
+            j = _escalon(recibidos, t, j)
+            err.append(sum(abs(a - b) for a, b in zip(emitidos[i][1], recibidos[j][1][:4])) / 4.0)
+            t += 0.005
+    return {
+        "delta": arm.delta,
+        "pot_s": len(emitidos) / cpu.wall,
+        "set_s": sets / cpu.wall,
+        "bytes_s": bytes_tx / cpu.wall,
+        "bytes_set": bytes_tx / sets if sets else 0.0,
+        "sin_reenviar": ctrl.filtro.suprimidas,
+        "error_cuentas": _percentiles(err),
+        "cpu_pct": cpu.pct,
+    }
+
+
+def bench_codec(n: int = 50_000) -> dict:
+    pose = (512, 1023, 0, 333, 1)
+    out = {}
+    t = time.perf_counter()
+    for _ in range(n):
+        protocolo.format_set(*pose)
+    out["ascii_encode_s"] = n / (time.perf_counter() - t)
+    t = time.perf_counter()
+    for i in range(n):
+        protocolo.encode_set(i, *pose)
+    out["bin_encode_s"] = n / (time.perf_counter() - t)
+
+    lineas = b"".join(b"POT 512 1023 0 333\n" for _ in range(n))
+    tramas = b"".join(protocolo.encode_frame(protocolo.T_POT, i, pose[:4]) for i in range(n))
+    for nombre, data in (("ascii", lineas), ("bin", tramas)):
+        dec = protocolo.FrameDecoder()
+        t = time.perf_counter()
+        for k in range(0, len(data), 4096):
+            for msg in dec.feed(data[k:k + 4096]):
+                if isinstance(msg, str):
+                    protocolo.parse_pot(msg)
+        out[f"{nombre}_decode_s"] = n / (time.perf_counter() - t)
+    out["bytes_set_ascii"] = len(protocolo.format_set(*pose))
+    out["bytes_set_bin"] = protocolo.FRAME_LEN
+    out["bytes_delta_1ch"] = protocolo.delta_len(0b0001)
+    out["bytes_delta_2ch"] = protocolo.delta_len(0b0011)
+    return out
+
+
+_IMPORTAR_MAIN = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+_ABRIR_VENTANA = """
+import time
+t0 = time.perf_counter()
+import main
+app = main.ArmControlApp()
+app.update()
+t_ventana = time.perf_counter() - t0
+while app.recursos.pendientes and time.perf_counter() - t0 < 10:
+    app.update()
+    time.sleep(0.002)
+print(t_ventana, time.perf_counter() - t0)
+app.ctrl.close()
+app.destroy()
+"""
+
+
+def _python(codigo: str, cache: str) -> Optional[List[float]]:
+    """Corre `codigo` en un intérprete nuevo (como un arranque real); None si falla."""
+    env = dict(os.environ, BRAZO_CACHE=cache, BRAZO_BITACORA="0")
+    r = subprocess.run([sys.executable, "-c", codigo], cwd=os.path.dirname(os.path.abspath(__file__)),
+                       env=env, capture_output=True, text=True, timeout=60)
+    if r.returncode != 0:
+        return None
+    return [1000.0 * float(x) for x in r.stdout.split()]
+
+
+def bench_arranque(repeticiones: int = 7) -> dict:
+    out = {}
+    with tempfile.TemporaryDirectory() as cache:
+        tiempos = [_python(_IMPORTAR_MAIN, cache) for _ in range(repeticiones)]
+        out["import_main_ms"] = _percentiles([t[0] for t in tiempos if t])
+
+        logo = recursos.ruta_asset(recursos.LOGO)
+        t = time.perf_counter()
+        png, _ = recursos.miniatura(logo, 260, 120, cache)
+        out["miniatura_fria_ms"] = 1000.0 * (time.perf_counter() - t)
+        out["pillow"] = png is not None
+        if png is not None:
+            t = time.perf_counter()
+            recursos.miniatura(logo, 260, 120, cache)
+            out["miniatura_cache_ms"] = 1000.0 * (time.perf_counter() - t)
+            out["miniatura_bytes"] = len(png)
+
+    with tempfile.TemporaryDirectory() as cache:
+        for caso in ("fria", "caliente"):   # la primera corrida llena la caché de la segunda
+            t = _python(_ABRIR_VENTANA, cache)
+            if t is None:
+                out["ventana"] = "sin pantalla (no se midió)"
+                break
+            out[f"ventana_{caso}_ms"] = t[0]
+            out[f"imagenes_{caso}_ms"] = t[1]
+    return out
+
+
+def _imprimir(res: dict):
+    for nombre, r in res.items():
+        print(f"\n== {nombre} ==")
+        for k, v in r.items():
+            if isinstance(v, dict):
+                v = "  ".join(f"{kk}={vv:.2f}" if isinstance(vv, float) else f"{kk}={vv}" for kk, vv in v.items())
+            elif isinstance(v, float):
+                v = f"{v:,.2f}"
+            print(f"  {k:<18} {v}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmarks headless con dispositivos simulados")
+    ap.add_argument("--duracion", type=float, default=5.0, help="segundos por prueba")
+    ap.add_argument("--solo", nargs="*", choices=["teleop", "secuencia", "codec", "filtro", "arranque"],
+                    help="correr sólo estas pruebas")
+    ap.add_argument("--json", help="guardar resultados en este archivo")
+    args = ap.parse_args(argv)
+    pruebas = set(args.solo or ["teleop", "secuencia", "codec", "filtro", "arranque"])
+
+    res = {}
+    if pruebas & {"teleop", "secuencia"}:
+        res["linea_base_simuladores"] = bench_linea_base(args.duracion)
+    if "teleop" in pruebas:
+        for baud in (9600, 115200):
+            for binario in (False, True):
+                r = bench_teleop(args.duracion, baud, binario)
+                r["cpu_app_pct"] = r["cpu_pct"] - res["linea_base_simuladores"]["cpu_pct"]
+                res[f"teleop_{r['modo']}_{baud}"] = r
+    if "secuencia" in pruebas:
+        for binario in (False, True):
+            r = bench_secuencia(args.duracion, binario)
+            res[f"secuencia_{r['modo']}"] = r
+    if "codec" in pruebas:
+        res["codec"] = bench_codec()
+    if "filtro" in pruebas:
+        for nombre, config, delta in VARIANTES_FILTRO:
+            res[f"filtro_{nombre}"] = bench_filtro(args.duracion, config, delta)
+    if "arranque" in pruebas:
+        res["arranque"] = bench_arranque()
+
+    _imprimir(res)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(res, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Bitácora de sesión: todo lo que pasa por los puertos serie, en binario y sólo agregando.
+
+Cada SerialClient con `bitacora` anota los bytes que escribe (SET, líneas de
+negociación) y los que lee (POT, líneas del firmware) con timestamp monotónico.
+anotar() sólo agrega una tupla a un deque (O(1), sin lock ni E/S): un hilo propio
+junta lo acumulado cada FLUSH_S, lo empaqueta y lo escribe de una vez, así que el
+hilo lector del teleop y el escritor del brazo no esperan al disco. Si el disco no
+da abasto se descartan registros (contador `perdidos`) en vez de crecer sin límite.
+
+Archivos: sesion-AAAAMMDD-HHMMSS-NNN.blog en BRAZO_BITACORA (o ~/.cache/brazo/sesiones),
+rotando a los MAX_BYTES y conservando los MAX_ARCHIVOS más nuevos. Si otra app abrió una
+sesión en el mismo segundo, la segunda lleva sufijo (HHMMSS_02): cada archivo es de un solo
+proceso. La poda no toca archivos en uso (el escritor los toca cada LATIDO_S aunque no haya
+tráfico). Con BRAZO_BITACORA=0 no se graba nada. Formato:
+
+    MAGIC, y después registros  <d t> <B canal> <B tipo> <H largo> <largo bytes>
+
+tipo RX / TX son bytes crudos del puerto; CANAL asocia un número de canal con
+{"rol", "nombre", "puerto"} (JSON) e INICIO guarda la hora de reloj al abrir el
+archivo. Cada archivo repite los CANAL vigentes, así que se puede leer solo.
+repeticion.py vuelve a pasar una bitácora por el pipeline de teleop.
+"""
+import glob
+import json
+import os
+import struct
+import threading
+import time
+from collections import deque, namedtuple
+from typing import Dict, Iterable, Iterator, List, Optional
+
+MAGIC = b"BRZLOG1\n"
+CABECERA = struct.Struct("<dBBH")
+
+RX = 0
+TX = 1
+CANAL = 2
+INICIO = 3
+
+FLUSH_S = 0.25
+LATIDO_S = 30.0                 # el archivo en curso se toca al menos así de seguido (ver _podar)
+MAX_PENDIENTES = 100_000        # registros sin escribir antes de empezar a descartar
+MAX_BYTES = 8 * 1024 * 1024
+MAX_ARCHIVOS = 20
+
+Registro = namedtuple("Registro", "t canal tipo data")
+
+
+def directorio_por_defecto() -> Optional[str]:
+    """Dónde grabar según BRAZO_BITACORA; None si está desactivada."""
+    env = os.environ.get("BRAZO_BITACORA")
+    if env == "0":
+        return None
+    if env:
+        return env
+    base = os.environ.get("BRAZO_CACHE") or os.path.join(os.path.expanduser("~"), ".cache", "brazo")
+    return os.path.join(base, "sesiones")
+
+
+class Bitacora:
+    def __init__(self, directorio: Optional[str] = None, max_bytes: int = MAX_BYTES,
+                 max_archivos: int = MAX_ARCHIVOS):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.max_archivos = max_archivos
+        self._cola = deque()
+        self._canales: Dict[int, dict] = {}
+        self._lock = threading.Lock()      # canales, apertura y cierre (nunca en anotar)
+        self._wake = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self._f = None
+        self._sesion = ""
+        self._parte = 0
+        self._tocado = 0.0                 # monotónico de la última escritura o latido
+        self.path: Optional[str] = None    # archivo en curso
+        self.registros = 0
+        self.bytes = 0
+        self.perdidos = 0
+        self.errores = 0
+
+    @property
+    def activa(self) -> bool:
+        return self.directorio is not None
+
+    # ---------------- Hot path ----------------
+    def anotar(self, canal: int, tipo: int, data: bytes):
+        if len(self._cola) >= MAX_PENDIENTES:
+            self.perdidos += 1
+            return
+        self._cola.append((time.monotonic(), canal, tipo, data))
+
+    def rx(self, canal: int, data: bytes):
+        self.anotar(canal, RX, data)
+
+    def tx(self, canal: int, data: bytes):
+        self.anotar(canal, TX, data)
+
+    # ---------------- Canales ----------------
+    def canal(self, rol: str, nombre: str, puerto: str) -> int:
+        """Número de canal para un puerto (se reutiliza si ya existía). Arranca el escritor."""
+        info = {"rol": rol, "nombre": nombre, "puerto": puerto}
+        with self._lock:
+            for n, previo in self._canales.items():
+                if previo == info:
+                    return n
+            n = len(self._canales)
+            self._canales[n] = info
+            self._arrancar()
+        self.anotar(n, CANAL, json.dumps(info).encode("utf-8"))
+        return n
+
+    def _arrancar(self):
+        if self._hilo is not None or not self.activa:
+            return
+        self._hilo = threading.Thread(target=self._loop, daemon=True)
+        self._hilo.start()
+
+    def cerrar(self):
+        """Escribe lo pendiente y cierra el archivo."""
+        with self._lock:
+            hilo, self._hilo = self._hilo, None
+        if hilo is not None:
+            self._wake.set()
+            hilo.join(timeout=2.0)
+        with self._lock:
+            self._volcar()
+            if self._f is not None:
+                self._f.close()
+                self._f = None
+
+    # ---------------- Escritor ----------------
+    def _loop(self):
+        while self._hilo is threading.current_thread():
+            self._wake.wait(FLUSH_S)
+            self._wake.clear()
+            with self._lock:
+                self._volcar()
+                self._latido()
+
+    def _latido(self):
+        """Sin tráfico el archivo no cambia: se le actualiza la fecha para que nadie lo pode."""
+        if self._f is None or time.monotonic() - self._tocado < LATIDO_S:
+            return
+        try:
+            os.utime(self.path)
+        except OSError:
+            pass
+        self._tocado = time.monotonic()
+
+    def _abrir(self):
+        os.makedirs(self.directorio, exist_ok=True)
+        if not self._sesion:
+            self._sesion = time.strftime("sesion-%Y%m%d-%H%M%S")
+        self._parte += 1
+        otra = 1
+        while True:
+            # "xb": nunca agregar a un archivo ajeno (otra app que arrancó en el mismo segundo)
+            self.path = os.path.join(self.directorio, f"{self._sesion}-{self._parte:03d}.blog")
+            try:
+                self._f = open(self.path, "xb")
+                break
+            except FileExistsError:
+                if self._parte > 1:
+                    self._parte += 1
+                    continue
+                otra += 1
+                self._sesion = time.strftime("sesion-%Y%m%d-%H%M%S") + f"_{otra:02d}"
+        self._tocado = time.monotonic()
+        buf = bytearray(MAGIC)
+        ahora = time.monotonic()
+        _empacar(buf, ahora, 0, INICIO, json.dumps({"reloj": time.time(), "monotonico": ahora}).encode())
+        # cada archivo arranca con los canales vigentes (el CANAL nuevo que esté en la cola se repite, no importa)
+        for n, info in self._canales.items():
+            _empacar(buf, ahora, n, CANAL, json.dumps(info).encode("utf-8"))
+        self._f.write(buf)
+        self._podar()
+
+    def _podar(self):
+        """
+        Borra las sesiones más viejas por encima de max_archivos. Nunca el archivo en
+        curso ni uno tocado hace menos de 2 * LATIDO_S: puede ser el de otra app abierta.
+        """
+        viejos = sorted(glob.glob(os.path.join(self.directorio, "sesion-*.blog")))[:-self.max_archivos]
+        ahora = time.time()
+        for p in viejos:
+            try:
+                if os.path.samefile(p, self.path) or ahora - os.path.getmtime(p) < 2 * LATIDO_S:
+                    continue
+                os.remove(p)
+            except OSError:
+                pass
+
+    def _volcar(self):
+        """Escribe la cola, rotando cuando el archivo llega a max_bytes (llamar con _lock tomado)."""
+        cola = self._cola
+        while cola:
+            try:
+                if self._f is None:
+                    self._abrir()
+                libre = self.max_bytes - self._f.tell()
+            except OSError:
+                self.errores += 1
+                self.perdidos += len(cola)
+                cola.clear()
+                self._f = None
+                return
+            buf = bytearray()
+            n = 0
+            while cola and len(buf) < libre:
+                t, canal, tipo, data = cola.popleft()
+                _empacar(buf, t, canal, tipo, data)
+                n += 1
+            try:
+                self._f.write(buf)
+                self._f.flush()
+                self._tocado = time.monotonic()
+                self.registros += n
+                self.bytes += len(buf)
+            except OSError:
+                self.errores += 1
+                self.perdidos += n
+            if len(buf) >= libre:
+                self._f.close()
+                self._f = None
+
+
+def _empacar(buf: bytearray, t: float, canal: int, tipo: int, data: bytes):
+    # un registro no puede pasar de 64 KiB; lecturas más largas se parten
+    for i in range(0, max(1, len(data)), 0xFFFF):
+        trozo = data[i:i + 0xFFFF]
+        buf += CABECERA.pack(t, canal, tipo, len(trozo))
+        buf += trozo
+
+
+# ---------------- Lectura ----------------
+def archivos(origen: str) -> List[str]:
+    """Un .blog (y las partes siguientes de la misma sesión) o la sesión más nueva de un directorio."""
+    if os.path.isdir(origen):
+        todos = sorted(glob.glob(os.path.join(origen, "sesion-*.blog")))
+        if not todos:
+            return []
+        sesion = os.path.basename(todos[-1]).rsplit("-", 1)[0]
+        return [p for p in todos if os.path.basename(p).startswith(sesion + "-")]
+    base = os.path.basename(origen)
+    if base.startswith("sesion-") and base.count("-") == 3:
+        sesion = base.rsplit("-", 1)[0]
+        partes = sorted(glob.glob(os.path.join(os.path.dirname(origen) or ".", sesion + "-*.blog")))
+        return [p for p in partes if os.path.basename(p) >= base]
+    return [origen]
+
+
+def leer(paths: Iterable[str]) -> Iterator[Registro]:
+    """
+    Registros de los archivos en orden. Un archivo cortado (la app se cerró mal) termina
+    ahí; un MAGIC en el medio (archivo de una versión que agregaba con "ab") se saltea.
+    """
+    for path in paths:
+        with open(path, "rb") as f:
+            datos = f.read()
+        if not datos.startswith(MAGIC):
+            raise ValueError(f"{path}: no es una bitácora")
+        i, n = len(MAGIC), len(datos)
+        while i + CABECERA.size <= n:
+            if datos.startswith(MAGIC, i):
+                i += len(MAGIC)
+                continue
+            t, canal, tipo, largo = CABECERA.unpack_from(datos, i)
+            i += CABECERA.size
+            if i + largo > n:
+                break
+            yield Registro(t, canal, tipo, datos[i:i + largo])
+            i += largo
+
+
+def canal_info(reg: Registro) -> dict:
+    return json.loads(reg.data.decode("utf-8"))
@@ -0,0 +1,148 @@
+"""
+Cinemática directa del brazo (4 articulaciones: base, hombro, codo, muñeca).
+
+Las cuentas 0..1023 se pasan a grados igual que el firmware (map de RAW_MIN..RAW_MAX
+a 0..180°) y de ahí a ángulos de articulación con un offset y un sentido por motor.
+Convención (vista lateral, en el plano del brazo):
+  - base:   giro alrededor de Z; 90° = mirando hacia +X
+  - hombro: ángulo del brazo respecto de la horizontal; 90° = vertical
+  - codo y muñeca: relativos al eslabón anterior; 90° = alineados con él
+Las medidas están en mm y se ajustan con Geometria si el brazo real difiere.
+
+fk() resuelve una pose; fk_lote() resuelve muchas de una vez (con numpy si está
+instalado, vectorizado sobre el array de poses; si no, con tablas de seno/coseno).
+"""
+import math
+from array import array
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+
+# ---- numpy opcional (sólo acelera fk_lote) ----
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except Exception:
+    NUMPY_AVAILABLE = False
+
+from poses import STRIDE
+
+RAW_MAX = 1020      # igual que RAW_MAX del firmware (cuentas que corresponden a 180°)
+ANGLE_SPAN = 180.0
+
+
+@dataclass(frozen=True)
+class Geometria:
+    altura: float = 70.0      # piso -> eje del hombro
+    l1: float = 105.0         # hombro -> codo
+    l2: float = 100.0         # codo -> muñeca
+    l3: float = 60.0          # muñeca -> punta (electroimán)
+    offset: Tuple[float, float, float, float] = (-90.0, 0.0, -90.0, -90.0)  # grados
+    sentido: Tuple[int, int, int, int] = (1, 1, 1, 1)
+
+    @property
+    def alcance(self) -> float:
+        return self.l1 + self.l2 + self.l3
+
+
+GEOMETRIA = Geometria()
+
+
+def _tabla(geo: Geometria, j: int) -> List[float]:
+    """Ángulo (rad) de la articulación j para cada cuenta 0..1023."""
+    k = ANGLE_SPAN / RAW_MAX
+    return [math.radians(geo.sentido[j] * (min(c, RAW_MAX) * k + geo.offset[j])) for c in range(1024)]
+
+
+_TABLAS = {}
+
+
+def tablas(geo: Geometria = GEOMETRIA) -> List[List[float]]:
+    t = _TABLAS.get(geo)
+    if t is None:
+        t = _TABLAS[geo] = [_tabla(geo, j) for j in range(4)]
+    return t
+
+
+def angulos(pose: Sequence[int], geo: Geometria = GEOMETRIA) -> Tuple[float, float, float, float]:
+    """(base, hombro, codo, muñeca) en radianes."""
+    t = tablas(geo)
+    return tuple(t[j][int(pose[j])] for j in range(4))
+
+
+def fk_plano(pose: Sequence[int], geo: Geometria = GEOMETRIA) -> Tuple[float, List[Tuple[float, float]]]:
+    """
+    Vista lateral: devuelve (giro_base, [(r, z)] de base, hombro, codo, muñeca y punta),
+    con r la distancia horizontal en el plano del brazo (negativa si se inclina hacia atrás).
+    """
+    q1, a, q3, q4 = angulos(pose, geo)
+    r, z = 0.0, geo.altura
+    pts = [(0.0, 0.0), (r, z)]
+    for largo, giro in ((geo.l1, 0.0), (geo.l2, q3), (geo.l3, q4)):
+        a += giro
+        r += largo * math.cos(a)
+        z += largo * math.sin(a)
+        pts.append((r, z))
+    return q1, pts
+
+
+def fk(pose: Sequence[int], geo: Geometria = GEOMETRIA) -> List[Tuple[float, float, float]]:
+    """Puntos (x, y, z) de base, hombro, codo, muñeca y punta."""
+    q1, pts = fk_plano(pose, geo)
+    c, s = math.cos(q1), math.sin(q1)
+    return [(r * c, r * s, z) for r, z in pts]
+
+
+def _como_filas(poses) -> Tuple[array, int]:
+    """Acepta PoseStore, array('H') plano o iterable de poses; devuelve (array plano, stride)."""
+    data = getattr(poses, "data", poses)
+    if isinstance(data, array):
+        return data, STRIDE
+    plano = array("H")
+    for p in poses:
+        plano.extend(int(v) for v in p[:4])
+    return plano, 4
+
+
+def _lote(data: array, stride: int, geo: Geometria):
+    """(giro_base, r, z) de la punta de cada fila; con numpy no recorre las poses en Python."""
+    if NUMPY_AVAILABLE:
+        q = np.frombuffer(data, dtype=np.uint16).reshape(-1, stride)
+        t = np.asarray(tablas(geo))
+        q1, a2, q3, q4 = (t[j][q[:, j]] for j in range(4))
+        a3 = a2 + q3
+        a4 = a3 + q4
+        r = geo.l1 * np.cos(a2) + geo.l2 * np.cos(a3) + geo.l3 * np.cos(a4)
+        z = geo.altura + geo.l1 * np.sin(a2) + geo.l2 * np.sin(a3) + geo.l3 * np.sin(a4)
+        return q1.tolist(), r.tolist(), z.tolist()
+
+    t1, t2, t3, t4 = tablas(geo)
+    cos, sin = math.cos, math.sin
+    l1, l2, l3, h = geo.l1, geo.l2, geo.l3, geo.altura
+    q1s, rs, zs = [], [], []
+    for k in range(0, len(data), stride):
+        a2 = t2[data[k + 1]]
+        a3 = a2 + t3[data[k + 2]]
+        a4 = a3 + t4[data[k + 3]]
+        q1s.append(t1[data[k]])
+        rs.append(l1 * cos(a2) + l2 * cos(a3) + l3 * cos(a4))
+        zs.append(h + l1 * sin(a2) + l2 * sin(a3) + l3 * sin(a4))
+    return q1s, rs, zs
+
+
+def fk_lote(poses, geo: Geometria = GEOMETRIA) -> List[Tuple[float, float, float]]:
+    """Punta (x, y, z) de cada pose (PoseStore, array plano o iterable de poses)."""
+    data, stride = _como_filas(poses)
+    if not data:
+        return []
+    q1s, rs, zs = _lote(data, stride, geo)
+    cos, sin = math.cos, math.sin
+    return [(r * cos(q1), r * sin(q1), z) for q1, r, z in zip(q1s, rs, zs)]
+
+
+def puntas_plano(poses, geo: Geometria = GEOMETRIA) -> List[Tuple[float, float]]:
+    """(r, z) de la punta de cada pose, para superponer el recorrido en la vista lateral."""
+    data, stride = _como_filas(poses)
+    if not data:
+        return []
+    _, rs, zs = _lote(data, stride, geo)
+    return list(zip(rs, zs))
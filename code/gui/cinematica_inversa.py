@@ -0,0 +1,294 @@
+"""
+Cinemática inversa: de un punto (x, y, z) en mm a cuentas m1..m4.
+
+El giro de la base sale directo de atan2(y, x); lo que queda es un problema plano
+(r, z) con tres articulaciones (hombro, codo, muñeca), redundante si no se fija
+el cabeceo de la punta. Se resuelve en dos pasos:
+  1. Semilla: un índice espacial precalculado sobre una grilla de cuentas
+     (hombro, codo, muñeca) -> (r, z) de la punta, agrupada en celdas cuadradas.
+     Buscar la muestra más cercana es mirar un puñado de celdas.
+  2. Refinado: unas pocas iteraciones de mínimos cuadrados amortiguados con el
+     jacobiano analítico (2x3, o 3x3 si se pide cabeceo), con límites de articulación.
+
+El índice tarda menos de 1 s en construirse y se guarda en disco (un archivo por
+geometría y paso de grilla, en BRAZO_CACHE o ~/.cache/brazo); después se carga en
+menos de 1 ms. Una resolución desde el índice cuesta ~0.1 ms; sembrada con la pose
+anterior (puntos cercanos, ik_lote) unos 35 µs. El resultado se redondea a cuentas,
+así que queda un error de hasta ~1 mm por la resolución del servo.
+"""
+import hashlib
+import math
+import os
+import struct
+from array import array
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import cinematica
+from cinematica import ANGLE_SPAN, GEOMETRIA, RAW_MAX, Geometria
+
+PASO_GRILLA = 16      # cuentas entre muestras del índice (64^3 muestras)
+CELDA_MM = 5.0        # lado de cada celda del índice
+POR_CELDA = 6         # muestras que se guardan por celda (sólo hace falta una semilla cercana)
+CANDIDATOS = 3        # semillas que se prueban antes de dar el punto por inalcanzable
+TOL_MM = 0.5          # error aceptado al refinar
+MAX_ITER = 20
+LAMBDA = 1.0          # amortiguación (mm) del paso de mínimos cuadrados
+
+_MAGIC = b"IKX2"
+_HEADER = struct.Struct("<4s16sHfffIII")  # magic, huella, paso, celda, r0, z0, nr, nz, n
+
+
+class FueraDeAlcance(ValueError):
+    pass
+
+
+def _huella(geo: Geometria, paso: int) -> bytes:
+    return hashlib.sha1(repr((geo, paso, POR_CELDA, RAW_MAX, ANGLE_SPAN)).encode()).digest()[:16]
+
+
+def _cache_dir() -> str:
+    return os.environ.get("BRAZO_CACHE") or os.path.join(os.path.expanduser("~"), ".cache", "brazo")
+
+
+# ---- cuentas <-> ángulos ----
+def _a_angulo(geo: Geometria, j: int, c: float) -> float:
+    return math.radians(geo.sentido[j] * (c * ANGLE_SPAN / RAW_MAX + geo.offset[j]))
+
+
+def _a_cuenta(geo: Geometria, j: int, ang: float) -> float:
+    return (math.degrees(ang) * geo.sentido[j] - geo.offset[j]) * RAW_MAX / ANGLE_SPAN
+
+
+def _rango(geo: Geometria, j: int) -> Tuple[float, float]:
+    a, b = _a_angulo(geo, j, 0), _a_angulo(geo, j, RAW_MAX)
+    return (a, b) if a <= b else (b, a)
+
+
+# ---------------- Índice ----------------
+class Indice:
+    """Muestras (hombro, codo, muñeca) agrupadas por celda (r, z) de la punta."""
+    def __init__(self, geo: Geometria, paso: int, celda: float, r0: float, z0: float,
+                 nr: int, nz: int, inicio: array, cuentas: array, puntas: array):
+        self.geo, self.paso, self.celda = geo, paso, celda
+        self.r0, self.z0, self.nr, self.nz = r0, z0, nr, nz
+        self.inicio = inicio      # array('I') nr*nz+1: muestras de la celda k en [inicio[k], inicio[k+1])
+        self.cuentas = cuentas    # array('H') 3 por muestra
+        self.puntas = puntas      # array('f') 2 por muestra (r, z)
+
+    def __len__(self) -> int:
+        return len(self.cuentas) // 3
+
+    @classmethod
+    def construir(cls, geo: Geometria = GEOMETRIA, paso: int = PASO_GRILLA, celda: float = CELDA_MM) -> "Indice":
+        valores = list(range(0, RAW_MAX + 1, paso))
+        if valores[-1] != RAW_MAX:
+            valores.append(RAW_MAX)
+        filas = array("H")
+        for c2 in valores:
+            for c3 in valores:
+                for c4 in valores:
+                    filas.extend((0, c2, c3, c4))
+        _, rs, zs = cinematica._lote(filas, 4, geo)
+
+        alc = geo.alcance
+        r0, z0 = -alc, geo.altura - alc
+        nr = nz = int(math.ceil(2 * alc / celda)) + 1
+        celdas = [[] for _ in range(nr * nz)]
+        for i, (r, z) in enumerate(zip(rs, zs)):
+            celdas[int((z - z0) / celda) * nr + int((r - r0) / celda)].append(i)
+
+        inicio, cuentas, puntas = array("I", [0]), array("H"), array("f")
+        for lista in celdas:
+            if len(lista) > POR_CELDA:
+                # repartidas a lo largo de la grilla: distintas configuraciones de codo/muñeca
+                lista = [lista[k * len(lista) // POR_CELDA] for k in range(POR_CELDA)]
+            for i in lista:
+                cuentas.extend(filas[4 * i + 1:4 * i + 4])
+                puntas.extend((rs[i], zs[i]))
+            inicio.append(len(cuentas) // 3)
+        return cls(geo, paso, celda, r0, z0, nr, nz, inicio, cuentas, puntas)
+
+    # ---- disco ----
+    def guardar(self, path: str):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, _huella(self.geo, self.paso), self.paso, self.celda,
+                                 self.r0, self.z0, self.nr, self.nz, len(self)))
+            self.inicio.tofile(f)
+            self.cuentas.tofile(f)
+            self.puntas.tofile(f)
+        os.replace(tmp, path)  # nunca queda un archivo a medio escribir
+
+    @classmethod
+    def abrir(cls, path: str, geo: Geometria, paso: int) -> Optional["Indice"]:
+        """Carga el índice; None si no existe o es de otra geometría/versión."""
+        try:
+            with open(path, "rb") as f:
+                magic, huella, p, celda, r0, z0, nr, nz, n = _HEADER.unpack(f.read(_HEADER.size))
+                if magic != _MAGIC or huella != _huella(geo, paso) or p != paso:
+                    return None
+                inicio, cuentas, puntas = array("I"), array("H"), array("f")
+                inicio.fromfile(f, nr * nz + 1)
+                cuentas.fromfile(f, 3 * n)
+                puntas.fromfile(f, 2 * n)
+        except (OSError, EOFError, struct.error):
+            return None
+        return cls(geo, paso, celda, r0, z0, nr, nz, inicio, cuentas, puntas)
+
+    # ---- consulta ----
+    def cercanos(self, r: float, z: float, n: int = 1) -> List[Tuple[int, int, int]]:
+        """Cuentas (hombro, codo, muñeca) de las n muestras más cercanas a (r, z)."""
+        ci = int((r - self.r0) / self.celda)
+        cj = int((z - self.z0) / self.celda)
+        vistos = []   # (d², muestra)
+        anillo = 0
+        lim = max(self.nr, self.nz)
+        while anillo < lim:
+            for j in range(cj - anillo, cj + anillo + 1):
+                if not 0 <= j < self.nz:
+                    continue
+                borde = j in (cj - anillo, cj + anillo)
+                for i in (range(ci - anillo, ci + anillo + 1) if borde else (ci - anillo, ci + anillo)):
+                    if not 0 <= i < self.nr:
+                        continue
+                    k = j * self.nr + i
+                    for m in range(self.inicio[k], self.inicio[k + 1]):
+                        dr = self.puntas[2 * m] - r
+                        dz = self.puntas[2 * m + 1] - z
+                        vistos.append((dr * dr + dz * dz, m))
+            # lo que falta ver está a más de anillo*celda: si ya hay n más cerca, listo
+            if len(vistos) >= n:
+                vistos.sort()
+                if vistos[n - 1][0] <= (anillo * self.celda) ** 2:
+                    break
+            anillo += 1
+        vistos.sort()
+        return [tuple(self.cuentas[3 * m:3 * m + 3]) for _, m in vistos[:n]]
+
+
+_INDICES = {}
+
+
+def indice(geo: Geometria = GEOMETRIA, paso: int = PASO_GRILLA) -> Indice:
+    """Índice en memoria; si no está, lo lee del disco o lo construye y lo guarda."""
+    idx = _INDICES.get((geo, paso))
+    if idx is not None:
+        return idx
+    path = os.path.join(_cache_dir(), f"ik_{_huella(geo, paso).hex()}.bin")
+    idx = Indice.abrir(path, geo, paso)
+    if idx is None:
+        idx = Indice.construir(geo, paso)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            idx.guardar(path)
+        except OSError:
+            pass  # sin caché en disco: se reconstruye la próxima vez
+    _INDICES[(geo, paso)] = idx
+    return idx
+
+
+# ---------------- Refinado ----------------
+def _resolver(a: List[List[float]], b: List[float]) -> List[float]:
+    """Eliminación gaussiana para sistemas chicos (2x2 / 3x3)."""
+    n = len(b)
+    m = [row[:] + [b[i]] for i, row in enumerate(a)]
+    for c in range(n):
+        p = max(range(c, n), key=lambda i: abs(m[i][c]))
+        m[c], m[p] = m[p], m[c]
+        for i in range(c + 1, n):
+            f = m[i][c] / m[c][c]
+            for k in range(c, n + 1):
+                m[i][k] -= f * m[c][k]
+    x = [0.0] * n
+    for i in range(n - 1, -1, -1):
+        x[i] = (m[i][n] - sum(m[i][k] * x[k] for k in range(i + 1, n))) / m[i][i]
+    return x
+
+
+def _refinar(geo: Geometria, q: List[float], r: float, z: float, cabeceo: Optional[float],
+             tol: float) -> Tuple[List[float], float, int]:
+    """Mínimos cuadrados amortiguados sobre (hombro, codo, muñeca) en radianes."""
+    l1, l2, l3, h = geo.l1, geo.l2, geo.l3, geo.altura
+    rangos = [_rango(geo, j) for j in (1, 2, 3)]
+    cos, sin = math.cos, math.sin
+    err = math.inf
+    for it in range(MAX_ITER + 1):
+        a2 = q[0]
+        a3 = a2 + q[1]
+        a4 = a3 + q[2]
+        c2, s2, c3, s3, c4, s4 = cos(a2), sin(a2), cos(a3), sin(a3), cos(a4), sin(a4)
+        pr = l1 * c2 + l2 * c3 + l3 * c4
+        pz = h + l1 * s2 + l2 * s3 + l3 * s4
+        e = [r - pr, z - pz]
+        jac = [[-(pz - h), -(l2 * s3 + l3 * s4), -l3 * s4],
+               [pr, l2 * c3 + l3 * c4, l3 * c4]]
+        if cabeceo is not None:
+            e.append((cabeceo - a4) * l3)       # en mm de arco para pesar parecido
+            jac.append([l3, l3, l3])
+        err = math.sqrt(sum(v * v for v in e))
+        if err <= tol or it == MAX_ITER:
+            break
+        n = len(e)
+        jjt = [[sum(jac[i][k] * jac[j][k] for k in range(3)) + (LAMBDA * LAMBDA if i == j else 0.0)
+                for j in range(n)] for i in range(n)]
+        y = _resolver(jjt, e)
+        for k in range(3):
+            lo, hi = rangos[k]
+            q[k] = min(hi, max(lo, q[k] + sum(jac[i][k] * y[i] for i in range(n))))
+    return q, err, it
+
+
+def ik(x: float, y: float, z: float, cabeceo: Optional[float] = None,
+       semilla: Optional[Sequence[int]] = None, geo: Geometria = GEOMETRIA,
+       tol: float = TOL_MM) -> Tuple[int, int, int, int]:
+    """
+    Cuentas (m1, m2, m3, m4) que llevan la punta a (x, y, z) mm.
+    cabeceo: ángulo de la punta respecto de la horizontal (rad), opcional.
+    semilla: pose de partida (p. ej. la actual) en lugar de la del índice; da
+    soluciones continuas al recorrer puntos cercanos.
+    Lanza FueraDeAlcance si no se llega a menos de `tol` mm.
+    """
+    r = math.hypot(x, y)
+    q1 = math.atan2(y, x) if r > 1e-9 else _a_angulo(geo, 0, semilla[0] if semilla else RAW_MAX / 2)
+    lo, hi = _rango(geo, 0)
+    if not lo <= q1 <= hi:
+        # del otro lado: girar la base 180° y alcanzar el punto "hacia atrás"
+        q1 += math.pi if q1 < lo else -math.pi
+        r = -r
+        if not lo - 1e-9 <= q1 <= hi + 1e-9:
+            raise FueraDeAlcance(f"giro de base fuera de rango para ({x:.1f}, {y:.1f})")
+
+    if math.hypot(r, z - geo.altura) > geo.alcance + tol:
+        raise FueraDeAlcance(f"({x:.1f}, {y:.1f}, {z:.1f}) fuera del espacio de trabajo")
+
+    def semillas():
+        if semilla is not None:
+            yield [_a_angulo(geo, j, semilla[j]) for j in (1, 2, 3)]
+        # si la semilla propia queda en un mínimo local se sigue con las del índice
+        for c in indice(geo).cercanos(r, z, CANDIDATOS):
+            yield [_a_angulo(geo, j + 1, c[j]) for j in range(3)]
+
+    err = math.inf
+    for inicio in semillas():
+        q, err, _ = _refinar(geo, inicio, r, z, cabeceo, tol)
+        if err <= tol:
+            break
+    if err > tol:
+        raise FueraDeAlcance(f"({x:.1f}, {y:.1f}, {z:.1f}) fuera de alcance (error {err:.1f} mm)")
+    cuentas = [_a_cuenta(geo, 0, q1)] + [_a_cuenta(geo, j + 1, q[j]) for j in range(3)]
+    return tuple(min(RAW_MAX, max(0, int(round(c)))) for c in cuentas)
+
+
+def ik_lote(puntos: Iterable[Sequence[float]], semilla: Optional[Sequence[int]] = None,
+            geo: Geometria = GEOMETRIA, tol: float = TOL_MM) -> List[tuple]:
+    """
+    Convierte puntos (x, y, z[, mag]) en poses (m1, m2, m3, m4, mag). Cada punto se
+    siembra con la solución anterior, así el brazo no cambia de "codo" entre puntos.
+    """
+    poses = []
+    for p in puntos:
+        m = ik(p[0], p[1], p[2], semilla=semilla, geo=geo, tol=tol)
+        mag = int(p[3]) if len(p) > 3 else 0
+        semilla = m
+        poses.append(m + (1 if mag else 0,))
+    return poses
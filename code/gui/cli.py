@@ -0,0 +1,384 @@
+"""
+Control del brazo por línea de comandos, sin ventana (no importa Tk ni PIL).
+
+    python cli.py puertos
+    python cli.py detectar                            # qué puerto es el brazo y cuál el mini
+    python cli.py ejecutar COM5 posiciones.json --vmax 600 --hold 300
+    python cli.py teleop COM5 COM7 --segundos 30 --grabar grabacion.brz
+    python cli.py teleop COM5 COM7 --extra COM8 --extra COM9@10,-5,0,0   # varios brazos
+    python cli.py teleop COM5 COM7 --filtro ema --alpha 0.4 --banda 6 --max-hz 30
+    python cli.py home COM5
+    python cli.py calibrar COM5 --segundos 20 --sketch ../arduino/robot_arm.ino   # RAW_MIN/RAW_MAX
+    python cli.py ejecutar COM5 posiciones.json --optimizar            # sin poses repetidas ni pausas de más
+    python cli.py ejecutar COM5 posiciones.json --confirmado --ventana 4   # avanza con el ACK de llegada
+    python cli.py convertir posiciones.json posiciones.brz
+    python cli.py optimizar posiciones.json rapida.json --vmax 600 --hold 300
+    python cli.py validar posiciones.brz --z-min 10 --paso-max 400   # límites, saltos y envolvente
+    python cli.py xyz puntos.csv posiciones.json      # x,y,z[,mag] en mm -> poses (IK)
+    python cli.py repetir --velocidad 4                # última sesión de la bitácora contra sim:brazo
+    python cli.py repetir sesion-20250101-120000-001.blog --brazo COM5 --velocidad 1
+
+Todo el tráfico serie queda en la bitácora de sesión (BRAZO_BITACORA=0 la apaga).
+
+Con --async (antes del subcomando) los puertos y la reproducción corren en un bucle
+asyncio (motor_async) en vez de un hilo por puerto:
+    python cli.py --async ejecutar COM5 posiciones.json
+
+Con BRAZO_SIM=1 se listan y se pueden usar los puertos simulados (sim:brazo, sim:mini).
+"""
+import argparse
+import threading
+import sys
+import time
+
+import bitacora
+import descubrimiento
+import diagnostico
+import filtros
+import flujo
+import grabacion
+import optimizador
+import repeticion
+import validador
+from controlador import ArmController, Calibracion, parse_limites, parse_offset
+
+
+def _controlador(args) -> ArmController:
+    if not getattr(args, "asincrono", False):
+        return ArmController()
+    from motor_async import MotorAsync
+    motor = MotorAsync()
+    motor.start()
+    return ArmController(motor=motor)
+
+
+def _conectar(ctrl: ArmController, args):
+    ctrl.brazos[0].calib = Calibracion(offset=parse_offset(args.offset))
+    ctrl.usar_delta(not args.sin_delta)
+    ctrl.conectar_brazo(args.puerto, args.baud, binario=not args.ascii, esperar=True)
+    for extra in args.extra or []:
+        # PUERTO o PUERTO@o1,o2,o3,o4
+        port, _, off = extra.partition("@")
+        b = ctrl.agregar_brazo(port, Calibracion(offset=parse_offset(off or "0")))
+        ctrl.conectar_brazo(port, args.baud, binario=not args.ascii, esperar=True, brazo=b)
+    print(ctrl.resumen_estado())
+
+
+def _flush(ctrl: ArmController):
+    for b in ctrl.brazos:
+        b.client.flush()
+
+
+def cmd_puertos(args) -> int:
+    memoria = descubrimiento.Memoria()
+    for p in descubrimiento.listar():
+        previo = memoria.get(p.clave)
+        extra = f"  [{previo['rol']} @ {previo['baud']}]" if previo else ""
+        print(f"{p.device:<16} {p.descripcion}{extra}")
+    return 0
+
+
+def cmd_detectar(args) -> int:
+    t0 = time.monotonic()
+    dets = descubrimiento.autodetectar(descubrimiento.listar(), descubrimiento.Memoria(), ventana=args.ventana)
+    for d in dets:
+        print(f"{d.rol:<6} {d.device} @ {d.baud}")
+    print(f"({len(dets)} reconocidos en {time.monotonic() - t0:.1f} s)")
+    return 0 if dets else 1
+
+
+def cmd_ejecutar(args) -> int:
+    ctrl = _controlador(args)
+    # confirmado indexa las poses: el .brz se carga aunque pidan --directo
+    cargada = not args.directo or args.confirmado
+    n = ctrl.cargar(args.archivo) if cargada else 0
+    limites = parse_limites(args.vmax)
+    _conectar(ctrl, args)
+    try:
+        if args.optimizar and cargada:
+            print(ctrl.optimizar(limites, args.hold / 1000.0, args.tol).texto())
+            n = len(ctrl.poses)
+        if args.confirmado:
+            config = flujo.ConfigFlujo(ventana=args.ventana, timeout_ack_s=args.timeout_ack / 1000.0,
+                                       timeout_llegada_s=args.timeout_llegada)
+            ctrl.ejecutar_confirmado(hold_s=args.hold / 1000.0, validar=not args.sin_validar, config=config)
+            print(f"Ejecutando {n} poses con confirmación de llegada...")
+        elif args.directo:
+            n = ctrl.ejecutar_archivo(args.archivo, limites, hold_s=args.hold / 1000.0,
+                                      validar=not args.sin_validar)
+            print(f"Ejecutando {n} poses desde disco...")
+        else:
+            tray = ctrl.ejecutar(limites=limites, hold_s=args.hold / 1000.0, validar=not args.sin_validar)
+            print(f"Ejecutando {n} poses ({tray.duracion:.2f} s planificados)...")
+        while not ctrl.esperar(0.2):
+            pass
+    except KeyboardInterrupt:
+        ctrl.stop()
+        ctrl.esperar(1.0)
+        print("Cancelado: HOME enviado.")
+    finally:
+        _flush(ctrl)
+        ctrl.close()
+    if ctrl.ultimo_reporte is not None:
+        print(ctrl.ultimo_reporte.texto())
+    return 0
+
+
+def cmd_teleop(args) -> int:
+    ctrl = _controlador(args)
+    ctrl.configurar_filtro(_config_filtro(args))
+    _conectar(ctrl, args)
+    ctrl.conectar_mini(args.mini, args.baud_mini, binario=not args.ascii)
+    ctrl.mag = args.mag
+    ctrl.teleop = True
+    if args.grabar:
+        ctrl.iniciar_grabacion()
+    fin = time.monotonic() + args.segundos if args.segundos else None
+    print("Teleop activo (Ctrl+C para terminar)...")
+    try:
+        while fin is None or time.monotonic() < fin:
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        pass
+    ctrl.teleop = False
+    _flush(ctrl)   # el último SET reenviado sale antes de las estadísticas y del close()
+    if args.grabar:
+        muestras, claves = ctrl.detener_grabacion(args.tol)
+        ctrl.guardar(args.grabar)
+        print(f"Grabación: {len(muestras)} muestras -> {len(claves)} poses clave en {args.grabar}")
+    for b, st, _ in ctrl.estadisticas():
+        print(f"{b.nombre}: SET enviados {st['sent']} ({st['bytes']} bytes)  coalescidos {st['coalesced']}  "
+              f"descartados {st['dropped']}")
+    print(f"Filtro: {ctrl.filtro.suprimidas} de {ctrl.filtro.entradas} muestras sin reenviar")
+    ctrl.close()
+    return 0
+
+
+def _config_filtro(args) -> filtros.ConfigFiltro:
+    return filtros.ConfigFiltro(modo=args.filtro, alpha=args.alpha, banda=args.banda, max_hz=args.max_hz)
+
+
+def cmd_repetir(args) -> int:
+    paths = bitacora.archivos(args.origen or bitacora.directorio_por_defecto() or ".")
+    if not paths:
+        raise ValueError(f"No hay bitácoras en {args.origen or bitacora.directorio_por_defecto()}.")
+    ctrl = _controlador(args)
+    ctrl.bitacora = bitacora.Bitacora(None)   # la repetición no se anota sobre la sesión original
+    ctrl.configurar_filtro(_config_filtro(args))
+    args.puerto, args.offset, args.extra = args.brazo, "0", None
+    _conectar(ctrl, args)
+    print(f"Repitiendo {len(paths)} archivo(s) desde {paths[0]}...")
+    cancelar = threading.Event()
+    try:
+        res = repeticion.repetir(bitacora.leer(paths), ctrl, args.velocidad, cancelar)
+    except KeyboardInterrupt:
+        cancelar.set()
+        ctrl.close()
+        return 1
+    ctrl.close()
+    print(res.texto())
+    return 0
+
+
+def cmd_home(args) -> int:
+    ctrl = _controlador(args)
+    _conectar(ctrl, args)
+    ctrl.ir_home()
+    _flush(ctrl)
+    ctrl.close()
+    print("HOME enviado.")
+    return 0
+
+
+def cmd_calibrar(args) -> int:
+    ctrl = _controlador(args)
+    _conectar(ctrl, args)
+    brazo = ctrl.brazos[0]
+    print(f"Leyendo la tabla de diagnóstico {args.segundos:g} s: mové cada articulación de tope a tope...")
+    try:
+        time.sleep(args.segundos)
+    except KeyboardInterrupt:
+        pass
+    ctrl.close()
+    ultimo = brazo.diag.ultimo()
+    if ultimo is None:
+        print("No llegó ninguna tabla (¿firmware robot_arm.ino, baudios?).", file=sys.stderr)
+        return 1
+    for ch, (raw, ema, deg, omin, omax) in enumerate(ultimo[1]):
+        print(f"m{ch + 1}: raw {raw:4}  ema {ema:4}  {deg:3}°  obs [{omin},{omax}]")
+    sug = ctrl.calibracion_sugerida(brazo, args.margen)
+    quietos = [f"m{ch + 1}" for ch, ok in enumerate(sug.movidos) if not ok]
+    print(f"Sugerencia ({sug.tablas} tablas, {brazo.parser.incompletas} incompletas):")
+    print(sug.texto())
+    if quietos:
+        print(f"({', '.join(quietos)} casi no se movieron: quedan los valores de fábrica)")
+    if args.sketch:
+        previo = diagnostico.parchear_sketch(args.sketch, sug)
+        print(f"{args.sketch} actualizado (antes:\n{previo})")
+    return 0
+
+
+def cmd_convertir(args) -> int:
+    ctrl = ArmController()
+    n = ctrl.cargar(args.origen)
+    ctrl.guardar(args.destino)
+    print(f"{args.origen} -> {args.destino} ({n} poses)")
+    return 0
+
+
+def cmd_optimizar(args) -> int:
+    ctrl = ArmController()
+    ctrl.cargar(args.origen)
+    res = ctrl.optimizar(parse_limites(args.vmax), args.hold / 1000.0, args.tol)
+    ctrl.guardar(args.destino)
+    print(res.texto())
+    print("(ciclo desde la primera pose; al reproducir con --optimizar la pausa va sólo donde cambia el electroimán)")
+    return 0
+
+
+def _reglas(args) -> validador.Reglas:
+    """La envolvente se revisa sólo si se pasó alguno de sus bordes (los otros quedan por defecto)."""
+    bordes = {k: getattr(args, k) for k in ("z_min", "z_max", "r_min", "r_max") if getattr(args, k) is not None}
+    env = validador.Envolvente(**bordes) if bordes else None
+    return validador.Reglas(paso_max=args.paso_max, envolvente=env)
+
+
+def cmd_validar(args) -> int:
+    ctrl = ArmController()
+    ctrl.cargar(args.archivo)
+    ctrl.reglas = _reglas(args)
+    informe = ctrl.validar()
+    print(informe.texto(max_items=args.mostrar))
+    if not informe.ok:
+        print(f"({informe.puntos} puntos revisados en {informe.ms:.1f} ms)")
+    return 0 if informe.ok else 2
+
+
+def cmd_xyz(args) -> int:
+    ctrl = ArmController()
+    t0 = time.perf_counter()
+    poses = ctrl.importar_xyz(args.origen)
+    dt = time.perf_counter() - t0
+    ctrl.guardar(args.destino)
+    print(f"{len(poses)} puntos -> {args.destino} ({dt * 1000:.1f} ms, índice incluido)")
+    return 0
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Control del brazo sin interfaz gráfica")
+    ap.add_argument("--async", dest="asincrono", action="store_true",
+                    help="E/S y reproducción en un bucle asyncio en vez de hilos")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("puertos", help="listar puertos serie")
+    p.set_defaults(func=cmd_puertos)
+
+    p = sub.add_parser("detectar", help="reconocer brazo y minibrazo probando todos los puertos")
+    p.add_argument("--ventana", type=float, default=descubrimiento.VENTANA_S, help="segundos de escucha por baudio")
+    p.set_defaults(func=cmd_detectar)
+
+    def brazo(p):
+        p.add_argument("puerto", help="puerto del brazo (COMx, /dev/ttyUSBx o sim:brazo)")
+        p.add_argument("--baud", type=int, default=230400)
+        p.add_argument("--ascii", action="store_true", help="no negociar el protocolo binario")
+        p.add_argument("--sin-delta", action="store_true", help="mandar siempre el SET completo")
+        p.add_argument("--offset", default="0", help="calibración del brazo: 1 o 4 offsets en cuentas")
+        p.add_argument("--extra", action="append", metavar="PUERTO[@OFFSETS]",
+                       help="otro brazo que recibe lo mismo (se puede repetir)")
+
+    def filtro(p):
+        p.add_argument("--filtro", choices=filtros.MODOS, default=filtros.ConfigFiltro.modo)
+        p.add_argument("--alpha", type=float, default=filtros.ConfigFiltro.alpha, help="peso de la muestra nueva (ema)")
+        p.add_argument("--banda", type=int, default=filtros.ConfigFiltro.banda, help="banda muerta (cuentas)")
+        p.add_argument("--max-hz", type=float, default=0.0, help="tope de SET/s por brazo (0 = sin tope extra)")
+
+    p = sub.add_parser("ejecutar", help="reproducir una lista (.json o .brz)")
+    brazo(p)
+    p.add_argument("archivo")
+    p.add_argument("--vmax", default="600", help="cuentas/s, 1 o 4 valores separados por coma")
+    p.add_argument("--hold", type=int, default=300, help="pausa en cada pose (ms)")
+    p.add_argument("--directo", action="store_true", help="leer el .brz desde disco sin cargarlo")
+    p.add_argument("--optimizar", action="store_true",
+                   help="quitar poses redundantes y pausar sólo al cambiar el electroimán")
+    p.add_argument("--tol", type=float, default=optimizador.DEFAULT_TOL, help="tolerancia de fusión (cuentas)")
+    p.add_argument("--sin-validar", action="store_true", help="no revisar límites ni envolvente antes de mover")
+    p.add_argument("--confirmado", action="store_true",
+                   help="esperar el ACK de llegada de cada pose (firmware con PROTO ACK) en vez del perfil")
+    p.add_argument("--ventana", type=int, default=flujo.ConfigFlujo.ventana, help="poses en vuelo por brazo")
+    p.add_argument("--timeout-ack", type=int, default=int(flujo.ConfigFlujo.timeout_ack_s * 1000),
+                   help="ms sin ACK antes de retransmitir")
+    p.add_argument("--timeout-llegada", type=float, default=flujo.ConfigFlujo.timeout_llegada_s,
+                   help="s para alcanzar cada pose antes de abortar")
+    p.set_defaults(func=cmd_ejecutar)
+
+    p = sub.add_parser("teleop", help="reenviar el minibrazo al brazo")
+    brazo(p)
+    p.add_argument("mini", help="puerto del minibrazo")
+    p.add_argument("--baud-mini", type=int, default=115200, help="baud del minibrazo (mini_brazo.ino: Serial.begin(115200))")
+    p.add_argument("--mag", type=int, choices=(0, 1), default=0)
+    p.add_argument("--segundos", type=float, default=0.0, help="0 = hasta Ctrl+C")
+    p.add_argument("--grabar", help="guardar las poses clave en este archivo (.json o .brz)")
+    p.add_argument("--tol", type=float, default=grabacion.DEFAULT_TOL, help="tolerancia de simplificación")
+    filtro(p)
+    p.set_defaults(func=cmd_teleop)
+
+    p = sub.add_parser("repetir", help="pasar una bitácora de sesión por el teleop, contra un brazo (simulado)")
+    p.add_argument("origen", nargs="?", help="archivo .blog o directorio (la sesión más nueva); "
+                                              "por defecto el de la bitácora")
+    p.add_argument("--brazo", default="sim:brazo", help="puerto del brazo que recibe los SET")
+    p.add_argument("--baud", type=int, default=230400)
+    p.add_argument("--ascii", action="store_true", help="no negociar el protocolo binario")
+    p.add_argument("--sin-delta", action="store_true", help="mandar siempre el SET completo")
+    p.add_argument("--velocidad", type=float, default=1.0, help="1 = tiempo real, 4 = x4, 0 = lo más rápido posible")
+    filtro(p)
+    p.set_defaults(func=cmd_repetir)
+
+    p = sub.add_parser("home", help="mandar el brazo a HOME")
+    brazo(p)
+    p.set_defaults(func=cmd_home)
+
+    p = sub.add_parser("calibrar", help="leer la tabla de diagnóstico del brazo y sugerir RAW_MIN/RAW_MAX")
+    brazo(p)
+    p.add_argument("--segundos", type=float, default=15.0)
+    p.add_argument("--margen", type=int, default=diagnostico.DEFAULT_MARGEN, help="cuentas a descontar por lado")
+    p.add_argument("--sketch", help="escribir la sugerencia en este robot_arm.ino")
+    p.set_defaults(func=cmd_calibrar)
+
+    p = sub.add_parser("convertir", help="convertir entre .json y .brz")
+    p.add_argument("origen")
+    p.add_argument("destino")
+    p.set_defaults(func=cmd_convertir)
+
+    p = sub.add_parser("optimizar", help="quitar poses redundantes y estimar el ciclo antes/después")
+    p.add_argument("origen")
+    p.add_argument("destino")
+    p.add_argument("--vmax", default="600", help="cuentas/s, 1 o 4 valores separados por coma")
+    p.add_argument("--hold", type=int, default=300, help="pausa actual entre pasos (ms)")
+    p.add_argument("--tol", type=float, default=optimizador.DEFAULT_TOL, help="tolerancia de fusión (cuentas)")
+    p.set_defaults(func=cmd_optimizar)
+
+    p = sub.add_parser("validar", help="revisar una lista contra límites, saltos y envolvente (sin mover nada)")
+    p.add_argument("archivo")
+    p.add_argument("--paso-max", type=int, default=validador.Reglas.paso_max, help="salto máximo entre poses (cuentas)")
+    p.add_argument("--z-min", type=float, help="altura mínima de codo, muñeca y punta (mm; activa la envolvente)")
+    p.add_argument("--z-max", type=float, help="altura máxima de la punta (mm; activa la envolvente)")
+    p.add_argument("--r-min", type=float, help="distancia mínima de la punta al eje (mm; activa la envolvente)")
+    p.add_argument("--r-max", type=float, help="distancia máxima de la punta al eje (mm; activa la envolvente)")
+    p.add_argument("--mostrar", type=int, default=10, help="cuántas poses con problemas listar")
+    p.set_defaults(func=cmd_validar)
+
+    p = sub.add_parser("xyz", help="convertir puntos cartesianos (CSV x,y,z[,mag]) en poses")
+    p.add_argument("origen")
+    p.add_argument("destino")
+    p.set_defaults(func=cmd_xyz)
+
+    args = ap.parse_args(argv)
+    try:
+        return args.func(args)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,877 @@
+"""
+Núcleo de control del brazo, independiente de la interfaz.
+
+ArmController reúne todo lo que antes vivía dentro de la ventana Tk: conexiones
+(uno o más brazos reales y el minibrazo), hilo de telemetría con reenvío teleop,
+HOME/STOP, reproducción de secuencias, grabación, métricas y E/S de listas (JSON / .brz).
+
+Puertos: un MonitorPuertos (descubrimiento.py) enumera en segundo plano; si un
+puerto en uso desaparece (USB desenchufado) se cierra y, cuando el mismo dispositivo
+vuelve a aparecer, se reconecta solo con el mismo rol y baudios.
+
+Varios brazos: cada Brazo tiene su SerialClient (con su hilo escritor), su
+calibración y sus métricas. Toda pose (teleop, secuencia, HOME) se difunde a todos;
+enviar sólo encola, así un brazo lento o desconectado no demora a los demás.
+No importa Tk ni PIL: lo usan tanto la GUI (main.py) como la línea de comandos (cli.py).
+
+Hilos:
+  - lector de telemetría (uno por conexión del minibrazo)
+  - lector de diagnóstico (uno por brazo conectado)
+  - reproducción de secuencia (uno por ejecución)
+  - monitor de puertos y auto-detección (descubrimiento.py)
+  - escritor de cada SerialClient (uno por brazo y uno para el minibrazo)
+  - escritor de la bitácora de sesión (bitacora.py)
+Con un motor_async.MotorAsync (ArmController(motor=...)) no hay hilos de lectura,
+escritura ni reproducción: todo corre como tareas de su bucle asyncio.
+Brazos: después de negociar, un lector por brazo (hilo o tarea) pasa la tabla de
+diagnóstico que imprime robot_arm.ino a Brazo.diag (diagnostico.py).
+Teleop: las muestras del minibrazo pasan por un filtros.FiltroPose (suavizado, banda
+muerta) antes de difundirse, y los brazos piden tramas delta al negociar el binario.
+Secuencias confirmadas: con ejecutar_confirmado() cada pose espera el ACK de llegada
+del firmware (flujo.py) en vez de seguir un perfil con tiempos fijos; los ACK entran
+por el mismo lector de diagnóstico de cada brazo.
+Bitácora: cada puerto que se conecta anota su tráfico en self.bitacora (bitacora.py,
+siempre activa salvo BRAZO_BITACORA=0); repeticion.py la reproduce sin el hardware.
+Ninguno toca la interfaz: publican en LatestSlot (la GUI los lee en su tick) y
+avisan cambios de estado con el callback on_status(texto | None).
+"""
+import concurrent.futures
+import csv
+import json
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import bitacora
+import cinematica_inversa
+import descubrimiento
+import diagnostico
+import filtros
+import flujo
+import grabacion
+import metricas
+import optimizador
+import protocolo
+import secuencia_bin
+import trayectoria
+import validador
+from poses import PoseStore
+from protocolo import Frame
+from serie import SET_MIN_INTERVAL_S, SerialClient
+
+HOME_DEFAULT = (512, 512, 512, 512, 0)
+
+
+class LatestSlot:
+    """
+    Buzón 'el último gana' entre un único hilo escritor y la UI.
+    put() reemplaza la muestra anterior con una sola asignación (atómica en CPython),
+    así que no hace falta lock. take() devuelve la muestra más nueva y cuántas se
+    coalescieron (descartaron) desde la última lectura.
+    """
+    def __init__(self):
+        self._item = (0, None)   # (secuencia, valor)
+        self._taken = 0
+
+    def put(self, value):
+        self._item = (self._item[0] + 1, value)
+
+    def take(self):
+        seq, value = self._item
+        if seq == self._taken:
+            return None, 0
+        skipped = seq - self._taken - 1
+        self._taken = seq
+        return value, skipped
+
+    def clear(self):
+        self._item = (0, None)
+        self._taken = 0
+
+
+@dataclass
+class Calibracion:
+    """Corrección por brazo: offset en cuentas y límites por motor (se aplica al enviar)."""
+    offset: Tuple[int, int, int, int] = (0, 0, 0, 0)
+    minimo: Tuple[int, int, int, int] = (0, 0, 0, 0)
+    maximo: Tuple[int, int, int, int] = (1023, 1023, 1023, 1023)
+
+    def aplicar(self, pose: Sequence[int]) -> tuple:
+        return tuple(min(self.maximo[i], max(self.minimo[i], int(pose[i]) + self.offset[i]))
+                     for i in range(4)) + (int(pose[4]),)
+
+
+def parse_offset(texto: str) -> Tuple[int, int, int, int]:
+    """'0' o '10,-5,0,3' -> offset por motor."""
+    vals = [int(x) for x in texto.replace(";", ",").split(",") if x.strip()] or [0]
+    if len(vals) == 1:
+        vals = vals * 4
+    if len(vals) != 4:
+        raise ValueError("Offset: poné 1 o 4 enteros separados por coma.")
+    return tuple(vals)
+
+
+class Brazo:
+    """Un brazo real: conexión, calibración, métricas y tabla de diagnóstico propias."""
+    def __init__(self, nombre: str, calib: Optional[Calibracion] = None, motor=None):
+        self.nombre = nombre
+        self.calib = calib or Calibracion()
+        self.client = SerialClient()
+        self.client.motor = motor
+        self.client.usar_delta = True
+        self.client.usar_ack = True
+        self.metricas = metricas.Metricas()
+        self.client.metricas = self.metricas
+        self.diag = diagnostico.Historial()
+        self.parser = diagnostico.Parser(self.diag)
+        self._diag_gen = 0
+        self._diag_tarea = None   # con motor: future de la tarea lectora
+        self.flujo: Optional[flujo.Enlace] = None   # corrida confirmada en curso
+        self.seq_move = 0         # secuencia de la primera MOVE de la próxima corrida
+
+    @property
+    def connected(self) -> bool:
+        return self.client.connected
+
+    def enviar(self, pose: Sequence[int], meta: Optional[list] = None):
+        if self.client.connected:
+            self.client.send_immediate(*self.calib.aplicar(pose), meta)
+
+
+def parse_limites(texto: str) -> trayectoria.Limites:
+    """'600' o '600,500,500,700' (cuentas/s) -> Limites con aceleración proporcional."""
+    vals = [float(x) for x in texto.replace(";", ",").split(",") if x.strip()]
+    if len(vals) == 1:
+        vals = vals * 4
+    if len(vals) != 4 or min(vals) <= 0:
+        raise ValueError("Vel. máx: poné 1 o 4 valores positivos separados por coma.")
+    # aceleración proporcional: llega a velocidad máxima en ~0.25 s
+    return trayectoria.Limites(vmax=tuple(vals), amax=tuple(v * 4.0 for v in vals))
+
+
+class ArmController:
+    def __init__(self, motor=None):
+        self.motor = motor                 # motor_async.MotorAsync opcional (ya arrancado)
+        self.brazos: List[Brazo] = [Brazo("Brazo 1", motor=motor)]  # el primero es el de la ventana principal
+        self._n_brazos = 1
+        self.arm = self.brazos[0].client   # Puerto hacia el brazo REAL (SET ...)
+        self.mini = SerialClient()         # Puerto desde el MINIbrazo (POT ...)
+        self.mini.motor = motor
+
+        self.teleop = False            # reenviar POT del minibrazo como SET al brazo
+        self.mag = 0                   # electroimán que acompaña al teleop
+        self.filtro = filtros.FiltroPose()
+        self._mag_teleop: Optional[int] = None   # electroimán del último SET de teleop
+        self.home = HOME_DEFAULT
+        self.ultima_pose: Optional[tuple] = None  # último SET pedido (punto de partida de secuencias)
+
+        self.poses = PoseStore()
+        self._optimizada: Optional[int] = None   # poses.version de la última optimización
+        self.reglas = validador.Reglas()         # límites / envolvente revisados antes de ejecutar
+        self.recorder = grabacion.RingRecorder()
+        self.metricas = self.brazos[0].metricas
+
+        # Salidas hacia la interfaz
+        self.telemetry_slot = LatestSlot()   # última muestra POT (m1..m4)
+        self.playback_slot = LatestSlot()    # último setpoint de la reproducción
+        self.on_status: Callable[[Optional[str]], None] = lambda text=None: None
+
+        # Puertos: enumeración en segundo plano, memoria de dispositivos y reconexión
+        self.monitor = descubrimiento.MonitorPuertos()
+        self.monitor.on_cambio = self._puertos_cambiaron
+        self.memoria = descubrimiento.Memoria()
+        self.reconexion_auto = True
+        self._conexiones: Dict[SerialClient, tuple] = {}  # client -> (device, clave, baud, binario)
+        self._reconectar: Dict[str, tuple] = {}           # clave -> (client, baud, binario)
+        self._conex_lock = threading.Lock()
+        self.bitacora = bitacora.Bitacora(bitacora.directorio_por_defecto())
+
+        self.ejecutando = False
+        self._seq_cancel = threading.Event()
+        self._seq_thread = None            # Thread, o Future de la tarea si hay motor
+        self._stop_telemetry = True
+        self._telemetry_gen = 0
+        self._telemetry_task = None       # con motor: future de la tarea de telemetría
+        self._corrida: Optional[flujo.Corrida] = None
+        self.ultimo_reporte: Optional[trayectoria.Reporte] = None   # o flujo.ReporteFlujo
+
+    # ---------------- Conexiones ----------------
+    def agregar_brazo(self, nombre: Optional[str] = None, calib: Optional[Calibracion] = None) -> Brazo:
+        self._n_brazos += 1
+        b = Brazo(nombre or f"Brazo {self._n_brazos}", calib, self.motor)
+        b.metricas.activo = self.metricas.activo
+        b.client.min_interval = self.arm.min_interval
+        b.client.usar_delta = self.arm.usar_delta
+        self.brazos = self.brazos + [b]   # se reemplaza la lista: el hilo lector itera sin lock
+        return b
+
+    def quitar_brazo(self, brazo: Brazo):
+        if brazo is self.brazos[0]:
+            raise ValueError("El brazo principal no se puede quitar.")
+        self.desconectar_brazo(brazo)
+        self.brazos = [b for b in self.brazos if b is not brazo]
+
+    def conectar_brazo(self, port: str, baud: int, binario: bool = True, esperar: bool = False,
+                       brazo: Optional[Brazo] = None):
+        """Abre el puerto de un brazo (el principal por defecto), negocia el protocolo
+        (en segundo plano salvo esperar=True) y después lee su tabla de diagnóstico."""
+        brazo = brazo or self.brazos[0]
+        client = brazo.client
+        client.connect(port, baud)
+        self._registrar(client, port, baud, binario)
+        self._parar_diagnostico(brazo)   # un lector viejo que siga vivo se da cuenta y termina
+        if self.motor is not None:
+            fut = self.motor.call(self._negociar_async(client, binario))
+            if esperar:
+                fut.result()
+            brazo._diag_tarea = self.motor.call(self._diagnostico_async(brazo, brazo._diag_gen, fut))
+        elif esperar:
+            self._negociar(client, binario)
+            threading.Thread(target=self._diagnostico_loop, args=(brazo, brazo._diag_gen), daemon=True).start()
+        else:
+            threading.Thread(target=self._diagnostico_loop, args=(brazo, brazo._diag_gen, binario),
+                             daemon=True).start()
+
+    def desconectar_brazo(self, brazo: Optional[Brazo] = None):
+        brazo = brazo or self.brazos[0]
+        self._olvidar(brazo.client)
+        self._parar_diagnostico(brazo)
+        brazo.client.close()
+
+    def conectar_mini(self, port: str, baud: int, binario: bool = True):
+        """Abre el puerto del minibrazo y arranca el hilo de telemetría."""
+        self.mini.connect(port, baud)
+        self._registrar(self.mini, port, baud, binario)
+        self.telemetry_slot.clear()
+        self._stop_telemetry = False
+        self._telemetry_gen += 1   # un hilo lector viejo que siga vivo se da cuenta y termina
+        if self.motor is not None:
+            self._telemetry_task = self.motor.call(self._telemetria_async(binario, self._telemetry_gen))
+        else:
+            threading.Thread(target=self._telemetry_loop, args=(binario, self._telemetry_gen), daemon=True).start()
+
+    def desconectar_mini(self):
+        self._olvidar(self.mini)
+        self._stop_telemetry = True
+        if self._telemetry_task is not None:
+            self._telemetry_task.cancel()
+            self._telemetry_task = None
+        self.mini.close()
+
+    def close(self):
+        self.monitor.stop()
+        self.cancelar()
+        if isinstance(self._seq_thread, concurrent.futures.Future):
+            self._seq_thread.cancel()
+        self.desconectar_mini()
+        for b in self.brazos:
+            self._parar_diagnostico(b)
+            b.client.close()
+        self.bitacora.cerrar()
+
+    def conexion(self, client: SerialClient) -> Optional[tuple]:
+        """(device, clave, baud, binario) con que se abrió client, o None."""
+        return self._conexiones.get(client)
+
+    def _registrar(self, client: SerialClient, port: str, baud: int, binario: bool):
+        if self.bitacora.activa:
+            if client is self.mini:
+                rol, nombre = descubrimiento.ROL_MINI, "Minibrazo"
+            else:
+                rol = descubrimiento.ROL_BRAZO
+                nombre = next((b.nombre for b in self.brazos if b.client is client), rol)
+            client.canal_log = self.bitacora.canal(rol, nombre, port)
+            client.bitacora = self.bitacora
+        with self._conex_lock:
+            clave = self.monitor.clave(port)
+            self._conexiones[client] = (port, clave, baud, binario)
+            self._reconectar.pop(clave, None)
+
+    def _olvidar(self, client: SerialClient):
+        """Desconexión pedida por el usuario: no reconectar."""
+        with self._conex_lock:
+            self._conexiones.pop(client, None)
+            for clave, (c, _, _) in list(self._reconectar.items()):
+                if c is client:
+                    del self._reconectar[clave]
+
+    def _puertos_cambiaron(self, agregados, quitados):
+        """Hilo del monitor: cierra lo desenchufado y reconecta lo que vuelve."""
+        for p in quitados:
+            with self._conex_lock:
+                perdidos = [(c, v) for c, v in self._conexiones.items() if v[0] == p.device]
+                for c, (_, clave, baud, binario) in perdidos:
+                    del self._conexiones[c]
+                    self._reconectar[clave] = (c, baud, binario)
+            for c, _ in perdidos:
+                if c is self.mini:
+                    self._stop_telemetry = True
+                c.close()
+                self.on_status(f"{p.device} desenchufado: esperando que vuelva...")
+        if not self.reconexion_auto:
+            return
+        for p in agregados:
+            with self._conex_lock:
+                pendiente = self._reconectar.pop(p.clave, None)
+            if pendiente is None:
+                continue
+            client, baud, binario = pendiente
+            try:
+                if client is self.mini:
+                    self.conectar_mini(p.device, baud, binario)
+                else:
+                    brazo = next((b for b in self.brazos if b.client is client), None)
+                    if brazo is None:
+                        continue  # lo quitaron mientras estaba desenchufado
+                    self.conectar_brazo(p.device, baud, binario, brazo=brazo)
+                self.on_status(f"{p.device} reconectado.")
+            except Exception as e:
+                with self._conex_lock:
+                    self._reconectar[p.clave] = pendiente
+                self.on_status(f"No se pudo reconectar {p.device}: {e}")
+
+    def autodetectar(self, binario: bool = True, esperar: bool = True,
+                     ventana: float = descubrimiento.VENTANA_S) -> List[descubrimiento.Deteccion]:
+        """
+        Sondea en paralelo los puertos libres, reconoce brazo/minibrazo y conecta lo
+        encontrado (el minibrazo si no hay uno, y brazos a los Brazo sin conexión).
+        Con esperar=False corre en un hilo y avisa el resultado por on_status.
+        """
+        if not esperar:
+            threading.Thread(target=self.autodetectar, args=(binario, True, ventana), daemon=True).start()
+            return []
+        self.on_status("Buscando brazo y minibrazo en todos los puertos...")
+        en_uso = {v[0] for v in self._conexiones.values()}
+        candidatos = [p for p in (self.monitor.puertos or descubrimiento.listar()) if p.device not in en_uso]
+        dets = descubrimiento.autodetectar(candidatos, self.memoria, ventana=ventana)
+        libres = [b for b in self.brazos if not b.connected]
+        conectados = []
+        for d in dets:
+            try:
+                if d.rol == descubrimiento.ROL_MINI and not self.mini.connected:
+                    self.conectar_mini(d.device, d.baud, binario)
+                elif d.rol == descubrimiento.ROL_BRAZO and libres:
+                    self.conectar_brazo(d.device, d.baud, binario, brazo=libres.pop(0))
+                else:
+                    continue
+                conectados.append(f"{d.rol} en {d.device} @ {d.baud}")
+            except Exception as e:
+                conectados.append(f"{d.rol} en {d.device}: error {e}")
+        self.on_status("Auto-detección: " + (", ".join(conectados) if conectados else "no se encontró nada"))
+        return dets
+
+    def _negociar(self, client: SerialClient, binario: bool):
+        """Intenta binario o fuerza ASCII, y avisa para refrescar el estado."""
+        if binario:
+            client.negotiate_binary()
+        else:
+            client.use_ascii()
+        self.on_status(None)
+
+    async def _negociar_async(self, client: SerialClient, binario: bool):
+        if binario:
+            await self.motor.negociar(client)
+        else:
+            client.use_ascii()
+        self.on_status(None)
+
+    # ---------------- Diagnóstico del brazo (tabla de robot_arm.ino) ----------------
+    def _diagnostico_loop(self, brazo: Brazo, gen: int, negociar: Optional[bool] = None):
+        """Hilo lector del brazo (negocia primero si negociar no es None)."""
+        client = brazo.client
+        if negociar is not None:
+            self._negociar(client, negociar)
+        while client.connected and gen == brazo._diag_gen:
+            self._procesar_diagnostico(brazo, client.read())
+
+    async def _diagnostico_async(self, brazo: Brazo, gen: int, negociacion=None):
+        import asyncio   # las corrutinas sólo corren con MotorAsync: no se importa al arrancar
+        client = brazo.client
+        if negociacion is not None:
+            await asyncio.wrap_future(negociacion)   # no leer mientras negocia: la respuesta es suya
+        while client.connected and gen == brazo._diag_gen:
+            msgs = await self.motor.recibir(client)
+            if msgs is None:
+                break
+            self._procesar_diagnostico(brazo, msgs)
+
+    @staticmethod
+    def _parar_diagnostico(brazo: Brazo):
+        brazo._diag_gen += 1
+        if brazo._diag_tarea is not None:
+            brazo._diag_tarea.cancel()
+            brazo._diag_tarea = None
+
+    @staticmethod
+    def _procesar_diagnostico(brazo: Brazo, msgs: list):
+        parser = brazo.parser
+        t = brazo.client.last_read_t
+        for msg in msgs:
+            if isinstance(msg, str):
+                parser.linea(msg, t)
+            elif msg.tipo == protocolo.T_ACK and brazo.flujo is not None:
+                brazo.flujo.recibir(msg, t)
+
+    def calibracion_sugerida(self, brazo: Optional[Brazo] = None,
+                             margen: int = diagnostico.DEFAULT_MARGEN) -> Optional[diagnostico.Sugerencia]:
+        """RAW_MIN/RAW_MAX para robot_arm.ino según el rango de los potes visto en la tabla."""
+        return diagnostico.sugerir((brazo or self.brazos[0]).diag, margen)
+
+    # ---------------- Telemetría (POT ...) ----------------
+    def _telemetry_loop(self, binario: bool = False, gen: int = 0):
+        """
+        Hilo lector: lee POT (línea 'POT m1 m2 m3 m4' o trama binaria) desde el minibrazo.
+        Si teleop está activo reenvía SET al brazo directamente desde acá (así un
+        redibujo lento no suma latencia) y deja la muestra en telemetry_slot.
+        """
+        self._negociar(self.mini, binario)
+        mini = self.mini
+        while mini.connected and not self._stop_telemetry and gen == self._telemetry_gen:
+            self._procesar_telemetria(mini.read())
+
+    async def _telemetria_async(self, binario: bool, gen: int):
+        """Tarea del motor equivalente a _telemetry_loop: se despierta sólo cuando llegan bytes."""
+        await self._negociar_async(self.mini, binario)
+        mini = self.mini
+        while mini.connected and not self._stop_telemetry and gen == self._telemetry_gen:
+            msgs = await self.motor.recibir(mini)
+            if msgs is None:
+                break
+            self._procesar_telemetria(msgs)
+
+    def _procesar_telemetria(self, msgs: list):
+        mini = self.mini
+        filtro = self.filtro
+        for msg in msgs:
+            if not isinstance(msg, Frame) or msg.tipo != protocolo.T_POT:
+                continue
+            pot = msg.canales
+            cambio = filtro.filtrar(pot, mini.last_read_t)
+            m1, m2, m3, m4 = filtro.salida
+            reenviar = self.teleop and (cambio is not None or self.mag != self._mag_teleop)
+
+            # Teleop: reenviar a cada brazo real (cada uno con su muestra de latencia)
+            pose = (m1, m2, m3, m4, self.mag)
+            for b in self.brazos:
+                met = b.metricas
+                meta = met.nueva(mini.last_read_t, mini.last_parse_t) if met.activo else None
+                if reenviar and b.client.connected:
+                    if meta is not None:
+                        meta[2] = time.monotonic()
+                    b.enviar(pose, meta)
+                elif meta is not None:
+                    met.cerrar(meta)
+            if reenviar:
+                self.ultima_pose = pose
+                self._mag_teleop = self.mag
+
+            # Grabación: después del reenvío, para no sumarle latencia
+            if self.recorder.activo:
+                self.recorder.record(time.monotonic(), m1, m2, m3, m4, self.mag)
+
+            self.telemetry_slot.put(pot)
+
+    def configurar_filtro(self, config: filtros.ConfigFiltro):
+        """Filtro del teleop y tope de SET/s (max_hz) en el enlace de cada brazo."""
+        self.filtro = filtros.FiltroPose(config)
+        intervalo = max(SET_MIN_INTERVAL_S, 1.0 / config.max_hz) if config.max_hz > 0 else SET_MIN_INTERVAL_S
+        for b in self.brazos:
+            b.client.min_interval = intervalo
+
+    def usar_delta(self, activo: bool):
+        """Pedir tramas delta en las próximas conexiones de los brazos."""
+        for b in self.brazos:
+            b.client.usar_delta = activo
+
+    # ---------------- Comandos directos ----------------
+    def _difundir(self, pose: Sequence[int]):
+        for b in self.brazos:
+            b.enviar(pose)
+
+    def enviar_pose(self, m1: int, m2: int, m3: int, m4: int, mag: int):
+        self.ultima_pose = (int(m1), int(m2), int(m3), int(m4), int(mag))
+        self._difundir(self.ultima_pose)
+
+    def ir_home(self):
+        self.teleop = False
+        self.enviar_pose(*self.home)
+
+    def ir_a(self, x: float, y: float, z: float, cabeceo: Optional[float] = None) -> tuple:
+        """Lleva la punta a (x, y, z) mm por cinemática inversa. Lanza FueraDeAlcance."""
+        m = cinematica_inversa.ik(x, y, z, cabeceo, semilla=self.ultima_pose)
+        self.enviar_pose(*m, self.mag)
+        return self.ultima_pose
+
+    def stop(self):
+        """STOP seguro: corta la secuencia y el teleop y manda HOME."""
+        self.cancelar()
+        self.playback_slot.clear()
+        self.ir_home()
+
+    # ---------------- Secuencias ----------------
+    def _inicio(self, inicio: Optional[Sequence[int]], primera: Optional[Sequence[int]]) -> tuple:
+        if inicio is not None:
+            return tuple(inicio)
+        if self.ultima_pose is not None:
+            return self.ultima_pose
+        return tuple(primera) if primera is not None else self.home
+
+    def ejecutar(self, poses: Optional[Iterable[Sequence[int]]] = None,
+                 limites: Optional[trayectoria.Limites] = None, hold_s: float = 0.0,
+                 inicio: Optional[Sequence[int]] = None, validar: bool = True) -> trayectoria.Trayectoria:
+        """
+        Planifica y reproduce (en un hilo) `poses` o, si es None, la lista guardada.
+        Antes valida la secuencia completa con self.reglas (validador.SecuenciaInvalida
+        si falla; validar=False lo saltea).
+        """
+        if self.ejecutando:
+            raise RuntimeError("Ya se está ejecutando.")
+        poses = self.poses if poses is None else poses
+        if isinstance(poses, PoseStore):
+            primera = poses[0] if len(poses) else None
+        else:
+            poses = list(poses)
+            primera = poses[0] if poses else None
+        if primera is None:
+            raise ValueError("No hay posiciones guardadas.")
+        inicio = self._inicio(inicio, primera)
+        if validar:
+            self._exigir_valida(poses, inicio)
+        if poses is self.poses and self.optimizada:
+            hold_s = optimizador.pausas(inicio, poses, hold_s)   # pausa sólo al cambiar el imán
+        tray = trayectoria.Trayectoria(inicio, poses, limites, hold_s)
+        self._lanzar(tray)
+        return tray
+
+    def ejecutar_confirmado(self, poses: Optional[Iterable[Sequence[int]]] = None, hold_s: float = 0.0,
+                            inicio: Optional[Sequence[int]] = None, validar: bool = True,
+                            config: Optional[flujo.ConfigFlujo] = None) -> flujo.Corrida:
+        """
+        Reproduce `poses` (o la lista guardada) pose por pose, avanzando cuando cada brazo
+        confirma que llegó (flujo.py) en vez de seguir un perfil de velocidad: la pausa
+        hold_s sólo se hace donde cambia el electroimán. Todos los brazos conectados tienen
+        que haber aceptado "PROTO ACK" al negociar (RuntimeError si no).
+        """
+        if self.ejecutando:
+            raise RuntimeError("Ya se está ejecutando.")
+        poses = self.poses if poses is None else poses
+        if not isinstance(poses, PoseStore):
+            poses = list(poses)
+        if not len(poses):
+            raise ValueError("No hay posiciones guardadas.")
+        brazos = [b for b in self.brazos if b.connected]
+        if not brazos:
+            raise RuntimeError("Conectá el brazo primero.")
+        sin_ack = [b.nombre for b in brazos if not b.client.ack]
+        if sin_ack:
+            raise RuntimeError(f"{', '.join(sin_ack)}: el firmware no confirma movimientos (PROTO ACK).")
+        inicio = self._inicio(inicio, poses[0])
+        if validar:
+            self._exigir_valida(poses, inicio)
+        pausas = optimizador.pausas(inicio, poses, hold_s) if hold_s > 0 else None
+        corrida = flujo.Corrida(poses, pausas, config, self._llego)
+        for b in brazos:
+            b.flujo = corrida.enlace(b.nombre, b.client, b.calib.aplicar, b.seq_move)
+        self._corrida = corrida
+        self.ejecutando = True
+        self._seq_cancel.clear()
+        if self.motor is not None:
+            self._seq_thread = self.motor.call(self._run_confirmado_async(corrida, brazos))
+        else:
+            self._seq_thread = threading.Thread(target=self._run_confirmado, args=(corrida, brazos), daemon=True)
+            self._seq_thread.start()
+        return corrida
+
+    def validar(self, poses=None, inicio: Optional[Sequence[int]] = None) -> validador.Informe:
+        """Revisa `poses` (o la lista guardada) contra self.reglas sin ejecutar nada."""
+        poses = self.poses if poses is None else poses
+        if inicio is None and self.ultima_pose is not None:
+            inicio = self.ultima_pose
+        return validador.validar(poses, self.reglas, inicio)
+
+    def _exigir_valida(self, poses, inicio: Sequence[int]):
+        informe = self.validar(poses, inicio)
+        if not informe.ok:
+            raise validador.SecuenciaInvalida(informe)
+
+    @property
+    def optimizada(self) -> bool:
+        """La lista guardada no cambió desde optimizar()."""
+        return self._optimizada == self.poses.version
+
+    def optimizar(self, limites: Optional[trayectoria.Limites] = None, hold_s: float = 0.0,
+                  tol: float = optimizador.DEFAULT_TOL, inicio: Optional[Sequence[int]] = None,
+                  aplicar: bool = True) -> optimizador.Resultado:
+        """
+        Reemplaza la lista guardada por su versión optimizada (aplicar=False sólo la
+        calcula). Mientras no se edite, ejecutar() hace la pausa hold_s sólo donde
+        cambia el electroimán.
+        """
+        if not len(self.poses):
+            raise ValueError("No hay posiciones guardadas.")
+        res = optimizador.optimizar(self._inicio(inicio, self.poses[0]), self.poses, limites, hold_s, tol)
+        if not aplicar:
+            return res
+        self.poses.replace_data(PoseStore(res.poses).data)
+        self._optimizada = self.poses.version
+        return res
+
+    def ejecutar_archivo(self, path: str, limites: Optional[trayectoria.Limites] = None,
+                         hold_s: float = 0.0, inicio: Optional[Sequence[int]] = None,
+                         validar: bool = True) -> int:
+        """Reproduce un .brz directo desde disco (mmap), sin cargarlo. Devuelve la cantidad de poses."""
+        if self.ejecutando:
+            raise RuntimeError("Ya se está ejecutando.")
+        seq = secuencia_bin.SecuenciaBin(path)
+        if not len(seq):
+            seq.close()
+            raise ValueError("El archivo no tiene poses.")
+        inicio = self._inicio(inicio, seq[0])
+        try:
+            poses = seq.como_array()   # revisa el rango 0..1023 aunque no se valide
+            if validar:
+                self._exigir_valida(poses, inicio)
+        except ValueError:   # FormatoInvalido o validador.SecuenciaInvalida
+            seq.close()
+            raise
+        segs = trayectoria.planificar(inicio, iter(seq), limites, hold_s)
+        self._lanzar(segs, seq)
+        return len(seq)
+
+    def _lanzar(self, segmentos, fuente=None):
+        self.ejecutando = True
+        self._seq_cancel.clear()
+        if self.motor is not None:
+            self._seq_thread = self.motor.call(self._run_sequence_async(segmentos, fuente))
+            return
+        self._seq_thread = threading.Thread(target=self._run_sequence, args=(segmentos, fuente), daemon=True)
+        self._seq_thread.start()
+
+    def _enviar_setpoint(self, sp: tuple):
+        self._difundir(sp)
+        self.ultima_pose = sp
+        self.playback_slot.put(sp)
+
+    def _run_sequence(self, segmentos, fuente=None):
+        """Hilo de reproducción: difunde cada setpoint a todos los brazos y lo publica en playback_slot."""
+        try:
+            self._sincronizar()
+            self.ultimo_reporte = trayectoria.reproducir(segmentos, self._enviar_setpoint, cancel=self._seq_cancel)
+            self.on_status(self.ultimo_reporte.texto())
+        except Exception as e:
+            self.on_status(f"Error durante la ejecución: {e}")
+        finally:
+            self._fin_secuencia(segmentos, fuente)
+
+    async def _run_sequence_async(self, segmentos, fuente=None):
+        """Tarea del motor equivalente a _run_sequence; cancelarla corta la secuencia en el acto."""
+        import asyncio
+        try:
+            await self._sincronizar_async()
+            self.ultimo_reporte = await trayectoria.reproducir_async(segmentos, self._enviar_setpoint,
+                                                                     cancel=self._seq_cancel)
+            self.on_status(self.ultimo_reporte.texto())
+        except asyncio.CancelledError:
+            self.on_status("Secuencia cancelada.")
+            raise
+        except Exception as e:
+            self.on_status(f"Error durante la ejecución: {e}")
+        finally:
+            self._fin_secuencia(segmentos, fuente)
+
+    def _llego(self, i: int, pose: Sequence[int]):
+        """Todos los brazos alcanzaron la pose i de la corrida confirmada."""
+        self.ultima_pose = tuple(int(v) for v in pose)
+        self.playback_slot.put(self.ultima_pose)
+
+    def _run_confirmado(self, corrida: flujo.Corrida, brazos: List[Brazo]):
+        """Hilo de la reproducción confirmada (lo despiertan los ACK que pasa el lector de cada brazo)."""
+        try:
+            self._sincronizar()
+            self.ultimo_reporte = flujo.reproducir(corrida)
+            self.on_status(self.ultimo_reporte.texto())
+        except flujo.SinConfirmacion as e:
+            self._abortar_confirmado(corrida, e)
+        except Exception as e:
+            self.on_status(f"Error durante la ejecución: {e}")
+        finally:
+            self._fin_confirmado(corrida, brazos)
+
+    async def _run_confirmado_async(self, corrida: flujo.Corrida, brazos: List[Brazo]):
+        import asyncio
+        try:
+            await self._sincronizar_async()
+            self.ultimo_reporte = await flujo.reproducir_async(corrida)
+            self.on_status(self.ultimo_reporte.texto())
+        except asyncio.CancelledError:
+            self.on_status("Secuencia cancelada.")
+            raise
+        except flujo.SinConfirmacion as e:
+            self._abortar_confirmado(corrida, e)
+        except Exception as e:
+            self.on_status(f"Error durante la ejecución: {e}")
+        finally:
+            self._fin_confirmado(corrida, brazos)
+
+    def _abortar_confirmado(self, corrida: flujo.Corrida, e: Exception):
+        # un SET vacía la cola del firmware: el brazo se queda en la última pose alcanzada
+        if self.ultima_pose is not None:
+            self._difundir(self.ultima_pose)
+        self.ultimo_reporte = corrida.reporte
+        self.on_status(f"Ejecución abortada: {e}")
+
+    def _fin_confirmado(self, corrida: flujo.Corrida, brazos: List[Brazo]):
+        for b in brazos:
+            if b.flujo is not None and b.flujo.corrida is corrida:
+                b.seq_move = corrida.siguiente_seq(b.flujo)
+                b.flujo = None
+        self._corrida = None
+        self.ejecutando = False
+
+    def _fin_secuencia(self, segmentos, fuente):
+        if fuente is not None:
+            segmentos.close()  # suelta el iterador sobre el mmap antes de cerrarlo
+            fuente.close()
+        self.ejecutando = False
+
+    def _sincronizar(self, timeout: float = 1.0):
+        """Arranque sincronizado: espera a que todos los brazos hayan vaciado lo pendiente
+        para que el primer setpoint salga a la vez (un mismo reloj maneja a todos)."""
+        deadline = time.monotonic() + timeout
+        for b in self.brazos:
+            if b.client.connected:
+                b.client.flush(max(0.0, deadline - time.monotonic()))
+
+    async def _sincronizar_async(self, timeout: float = 1.0):
+        deadline = time.monotonic() + timeout
+        for b in self.brazos:
+            if b.client.connected:
+                await self.motor.vaciar(b.client, max(0.0, deadline - time.monotonic()))
+
+    def cancelar(self):
+        self._seq_cancel.set()
+        corrida = self._corrida
+        if corrida is not None:
+            corrida.cancelar()
+
+    def esperar(self, timeout: Optional[float] = None) -> bool:
+        """Bloquea hasta que termine la reproducción. False si venció el timeout."""
+        t = self._seq_thread
+        if isinstance(t, concurrent.futures.Future):
+            try:
+                t.result(timeout)
+            except concurrent.futures.TimeoutError:
+                return False
+            except concurrent.futures.CancelledError:
+                pass
+            return True
+        if t is not None:
+            t.join(timeout)
+            return not t.is_alive()
+        return True
+
+    # ---------------- Grabación ----------------
+    def iniciar_grabacion(self):
+        if not self.mini.connected:
+            raise RuntimeError("Conectá el minibrazo para grabar.")
+        self.recorder.start()
+
+    def detener_grabacion(self, tol: float = grabacion.DEFAULT_TOL, agregar: bool = True):
+        """Corta la grabación y la reduce a poses clave. Devuelve (muestras, claves)."""
+        self.recorder.stop()
+        _, muestras = self.recorder.muestras()
+        claves = self._claves(muestras, tol)
+        if agregar:
+            self.poses.extend(claves)
+        return muestras, claves
+
+    def detener_grabacion_en_hilo(self, tol: float = grabacion.DEFAULT_TOL) -> concurrent.futures.Future:
+        """
+        Como detener_grabacion(agregar=False), pero RDP corre en un hilo: con el anillo
+        lleno tarda segundos y no puede trabar la UI. El Future da (muestras, claves);
+        agregar las claves a la lista le toca a quien lo espera, desde su hilo. Hasta
+        que termine no hay que volver a grabar (el hilo lee el anillo).
+        """
+        self.recorder.stop()
+        fut = concurrent.futures.Future()
+
+        def simplificar():
+            try:
+                _, muestras = self.recorder.muestras()
+                fut.set_result((muestras, self._claves(muestras, tol)))
+            except Exception as e:
+                fut.set_exception(e)
+
+        threading.Thread(target=simplificar, daemon=True).start()
+        return fut
+
+    @staticmethod
+    def _claves(muestras: List[tuple], tol: float) -> List[tuple]:
+        return [muestras[i] for i in grabacion.simplificar(muestras, tol)] if muestras else []
+
+    # ---------------- Guardar / Cargar ----------------
+    def guardar(self, path: str, poses: Optional[PoseStore] = None):
+        poses = self.poses if poses is None else poses
+        if path.lower().endswith(".brz"):
+            secuencia_bin.escribir(path, poses)
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(poses.as_lists(), f, ensure_ascii=False, indent=2)
+
+    def cargar(self, path: str) -> int:
+        """Reemplaza la lista guardada por el contenido de path (.json o .brz)."""
+        if path.lower().endswith(".brz"):
+            with secuencia_bin.SecuenciaBin(path) as seq:
+                self.poses.replace_data(seq.como_array())
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.poses.replace_data(PoseStore(data).data)
+        return len(self.poses)
+
+    def importar_xyz(self, path: str, agregar: bool = True) -> list:
+        """
+        Lee puntos 'x,y,z[,mag]' (mm) de un CSV y los convierte en poses por IK.
+        Las filas que no son numéricas (encabezado, comentarios) se ignoran.
+        """
+        puntos = []
+        with open(path, newline="", encoding="utf-8") as f:
+            for fila in csv.reader(f):
+                try:
+                    puntos.append([float(v) for v in fila[:4]])
+                except ValueError:
+                    continue
+        poses = cinematica_inversa.ik_lote(puntos, semilla=self.ultima_pose or self.home)
+        if agregar:
+            self.poses.extend(poses)
+        return poses
+
+    # ---------------- Estado ----------------
+    @staticmethod
+    def estado(client: SerialClient) -> str:
+        if not client.connected:
+            return "desconectado"
+        if not client.binary:
+            return "conectado"
+        extras = (", delta" if client.delta else "") + (", ack" if client.ack else "")
+        return f"conectado (BIN{extras})"
+
+    def resumen_estado(self) -> str:
+        texto = f"Brazo: {self.estado(self.arm)} | Mini: {self.estado(self.mini)}"
+        if len(self.brazos) > 1:
+            n = sum(1 for b in self.brazos if b.connected)
+            texto += f" | Brazos: {n}/{len(self.brazos)} conectados"
+        return texto
+
+    def medir_latencias(self, activo: bool):
+        for b in self.brazos:
+            b.metricas.activo = activo
+
+    def estadisticas(self) -> List[tuple]:
+        """[(brazo, stats del SerialClient, (n, p50, p95, máx) de la latencia total)] por brazo."""
+        out = []
+        for b in self.brazos:
+            total = next(r for r in b.metricas.resumen() if r[0] == "total")
+            out.append((b, b.client.stats(), (total[1], total[2], total[3], total[5])))
+        return out
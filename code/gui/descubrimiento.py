@@ -0,0 +1,202 @@
+"""
+Descubrimiento de puertos: enumeración en segundo plano, auto-detección y memoria.
+
+  - MonitorPuertos: hilo que enumera los puertos cada `periodo` s y guarda la lista
+    (la UI sólo lee la copia en memoria; enumerar en Windows puede tardar cientos de ms).
+    Avisa altas y bajas con on_cambio(agregados, quitados), que es lo que usa el
+    controlador para reconectar cuando se vuelve a enchufar un USB.
+  - autodetectar(): abre todos los puertos candidatos en paralelo (uno por hilo) y en
+    cada uno prueba baudios hasta reconocer lo que llega:
+        "POT a b c d" o tramas POT binarias  -> minibrazo (mini_brazo.ino)
+        la tabla "CH | raw  ema  deg ..."     -> brazo (robot_arm.ino)
+    Sólo escucha, no manda nada: abrir el puerto ya reinicia el Arduino y la tabla
+    de diagnóstico sale sola cada 120 ms.
+  - Memoria: clave del dispositivo (número de serie USB o hwid) -> rol y baudios, en
+    un JSON en BRAZO_CACHE o ~/.cache/brazo. Lo recordado se prueba primero, y como la
+    clave no es el nombre del puerto sigue valiendo si al re-enchufar cambia de COM.
+"""
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+# ---- Serie (pyserial) ----
+try:
+    import serial.tools.list_ports
+    SERIAL_AVAILABLE = True
+except Exception:
+    SERIAL_AVAILABLE = False
+
+import diagnostico
+import protocolo
+import simulador
+from protocolo import Frame
+from serie import SerialClient
+
+BAUDS = (230400, 115200, 9600, 57600, 38400)   # los de los sketches primero
+VENTANA_S = 2.5        # escucha por baudio (el Arduino tarda ~1.5 s en arrancar al abrir)
+PERIODO_S = 1.0        # cada cuánto se re-enumeran los puertos
+
+ROL_BRAZO = "brazo"
+ROL_MINI = "mini"
+
+InfoPuerto = namedtuple("InfoPuerto", "device descripcion clave")
+Deteccion = namedtuple("Deteccion", "device rol baud clave")
+
+def _datos_dir() -> str:
+    return os.environ.get("BRAZO_CACHE") or os.path.join(os.path.expanduser("~"), ".cache", "brazo")
+
+
+def listar() -> List[InfoPuerto]:
+    """Enumera los puertos (bloquea: llamar fuera del hilo de la UI)."""
+    out = []
+    if SERIAL_AVAILABLE:
+        for p in serial.tools.list_ports.comports():
+            clave = p.serial_number or p.hwid or p.device
+            out.append(InfoPuerto(p.device, p.description or "", clave))
+    if os.environ.get("BRAZO_SIM") == "1":
+        out += [InfoPuerto(p, "simulado", p) for p in simulador.PUERTOS]
+    return out
+
+
+# ---------------- Memoria ----------------
+class Memoria:
+    """clave del dispositivo -> {"rol", "baud"} persistido en JSON."""
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(_datos_dir(), "puertos.json")
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.datos: Dict[str, dict] = json.load(f)
+        except (OSError, ValueError):
+            self.datos = {}
+
+    def get(self, clave: str) -> Optional[dict]:
+        return self.datos.get(clave)
+
+    def recordar(self, clave: str, rol: str, baud: int):
+        with self._lock:
+            self.datos[clave] = {"rol": rol, "baud": int(baud)}
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.path, "w", encoding="utf-8") as f:
+                    json.dump(self.datos, f, indent=2)
+            except OSError:
+                pass  # sin disco: se recuerda sólo en esta sesión
+
+
+# ---------------- Enumeración en segundo plano ----------------
+class MonitorPuertos:
+    def __init__(self, periodo: float = PERIODO_S, listar_fn: Callable[[], List[InfoPuerto]] = listar):
+        self.periodo = periodo
+        self._listar = listar_fn
+        self.puertos: List[InfoPuerto] = []   # se reemplaza entero, nunca se modifica
+        self.version = 0                      # cambia cuando cambia la lista
+        self.on_cambio: Callable[[List[InfoPuerto], List[InfoPuerto]], None] = lambda agregados, quitados: None
+        self._wake = threading.Event()
+        self._run = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._run:
+            return
+        self._run = True
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._run = False
+        self._wake.set()
+
+    def refrescar(self):
+        """Pide una enumeración inmediata (no espera el resultado)."""
+        self._wake.set()
+
+    def devices(self) -> List[str]:
+        return [p.device for p in self.puertos]
+
+    def clave(self, device: str) -> str:
+        return next((p.clave for p in self.puertos if p.device == device), device)
+
+    def _loop(self):
+        while self._run:
+            try:
+                nuevos = self._listar()
+            except Exception:
+                nuevos = self.puertos
+            if nuevos != self.puertos:
+                antes = set(self.puertos)
+                despues = set(nuevos)
+                self.puertos = nuevos
+                self.version += 1
+                try:
+                    self.on_cambio([p for p in nuevos if p not in antes],
+                                   [p for p in antes if p not in despues])
+                except Exception:
+                    pass
+            self._wake.wait(self.periodo)
+            self._wake.clear()
+
+
+# ---------------- Auto-detección ----------------
+def clasificar(msgs: Iterable) -> Optional[str]:
+    """ROL_MINI / ROL_BRAZO según lo recibido, o None si no se reconoce."""
+    for m in msgs:
+        if isinstance(m, Frame):
+            if m.tipo == protocolo.T_POT:
+                return ROL_MINI
+        elif diagnostico.es_tabla(m):
+            return ROL_BRAZO
+    return None
+
+
+def sondear(info: InfoPuerto, bauds: Sequence[int] = BAUDS, ventana: float = VENTANA_S,
+            cancel: Optional[threading.Event] = None) -> Optional[Deteccion]:
+    """Prueba un puerto con cada baudio hasta reconocerlo. None si no responde nada conocido."""
+    for baud in bauds:
+        client = SerialClient()
+        try:
+            client.connect(info.device, baud)
+        except Exception:
+            return None   # ocupado o inexistente: no tiene sentido probar otros baudios
+        try:
+            deadline = time.monotonic() + ventana
+            while time.monotonic() < deadline and not (cancel and cancel.is_set()):
+                rol = clasificar(client.read())
+                if rol is not None:
+                    return Deteccion(info.device, rol, baud, info.clave)
+        finally:
+            client.close()
+        if cancel and cancel.is_set():
+            return None
+    return None
+
+
+def autodetectar(puertos: Iterable[InfoPuerto], memoria: Optional[Memoria] = None,
+                 bauds: Sequence[int] = BAUDS, ventana: float = VENTANA_S,
+                 cancel: Optional[threading.Event] = None) -> List[Deteccion]:
+    """
+    Sondea todos los puertos a la vez; en cada uno prueba primero el baudio recordado.
+    Lo reconocido se guarda en `memoria`. Tarda ~ventana × (baudios probados) en el peor
+    puerto, no la suma de todos.
+    """
+    puertos = list(puertos)
+    if not puertos:
+        return []
+
+    def orden(info: InfoPuerto) -> List[int]:
+        previo = memoria.get(info.clave) if memoria else None
+        if previo is None:
+            return list(bauds)
+        return [previo["baud"]] + [b for b in bauds if b != previo["baud"]]
+
+    with ThreadPoolExecutor(max_workers=len(puertos)) as ex:
+        res = list(ex.map(lambda p: sondear(p, orden(p), ventana, cancel), puertos))
+    encontrados = [d for d in res if d is not None]
+    if memoria is not None:
+        for d in encontrados:
+            memoria.recordar(d.clave, d.rol, d.baud)
+    return encontrados
@@ -0,0 +1,266 @@
+"""
+Tabla de diagnóstico de robot_arm.ino: parser, historial y calibración sugerida.
+
+Cada SERIAL_PERIOD_MS (120 ms) el firmware del brazo imprime
+
+    CH | raw  ema  deg  obs[min,max]
+    0  | 512   510   90   [100,900]
+    ...                               (una fila por canal)
+    <línea vacía>
+
+  - Parser: recibe las líneas de a una (como llegan del SerialClient) y arma un
+    bloque por tabla; una tabla cortada (bytes perdidos, reinicio) se descarta;
+  - Historial: anillo columnar de tamaño fijo, un array por columna y canal (raw,
+    ema, deg, obs_min, obs_max) más los tiempos. Agregar es O(1) y la memoria no crece:
+    por defecto ~5 h de tablas en ~7 MB;
+  - diezmado para graficar: minmax() deja el mínimo y el máximo de cada columna de
+    píxeles (no pierde picos) y lttb() (Largest-Triangle-Three-Buckets, Steinarsson
+    2013) elige un punto por balde conservando la forma. Para LTTB sobre horas de
+    historia conviene pasar antes por minmax() a unas pocas veces el ancho (MinMaxLTTB);
+  - calibración: sugerir() propone RAW_MIN/RAW_MAX por canal con el rango de `raw`
+    visto (la lectura directa del pote, aunque la PC esté mandando SET) y
+    parchear_sketch() los escribe en robot_arm.ino.
+"""
+import bisect
+import re
+from array import array
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+from cinematica import NUMPY_AVAILABLE
+
+if NUMPY_AVAILABLE:
+    import numpy as np
+
+N_CANALES = 4
+COLUMNAS = ("raw", "ema", "deg", "obs_min", "obs_max")
+PERIODO_S = 0.120
+DEFAULT_CAPACIDAD = 150_000       # tablas (~5 h a 120 ms)
+RAW_MIN_FW = 0                    # robot_arm.ino: valores de fábrica
+RAW_MAX_FW = 1020
+DEFAULT_MARGEN = 3                # cuentas que se le quitan al rango visto (ruido del pote)
+
+CABECERA = "CH | raw"
+_FILA_RE = re.compile(r"^(\d)\s+\|\s+(-?\d+)\s+(-?\d+)\s+(-?\d+)\s+\[(-?\d+),(-?\d+)\]")
+
+
+def es_tabla(linea: str) -> bool:
+    """La línea es parte de la tabla de diagnóstico (cabecera o fila)."""
+    linea = linea.strip()
+    return linea.startswith(CABECERA) or _FILA_RE.match(linea) is not None
+
+
+# ---------------- Historial ----------------
+class Historial:
+    def __init__(self, capacidad: int = DEFAULT_CAPACIDAD, canales: int = N_CANALES):
+        self.capacidad = capacidad
+        self.canales = canales
+        self._t = array("d", bytes(8 * capacidad))
+        self._cols = {c: [array("h", bytes(2 * capacidad)) for _ in range(canales)] for c in COLUMNAS}
+        self.n = 0          # tablas agregadas en total (sirve de versión para redibujar)
+
+    def __len__(self) -> int:
+        return min(self.n, self.capacidad)
+
+    def agregar(self, t: float, filas: Sequence[Sequence[int]]):
+        """filas[canal] = (raw, ema, deg, obs_min, obs_max)."""
+        i = self.n % self.capacidad
+        self._t[i] = t
+        cols = self._cols
+        for ch, fila in enumerate(filas):
+            for c, v in zip(COLUMNAS, fila):
+                cols[c][ch][i] = v
+        self.n += 1
+
+    def ultimo(self) -> Optional[Tuple[float, List[tuple]]]:
+        if not self.n:
+            return None
+        i = (self.n - 1) % self.capacidad
+        return self._t[i], [tuple(self._cols[c][ch][i] for c in COLUMNAS) for ch in range(self.canales)]
+
+    def _cronologico(self, a: array) -> array:
+        if self.n <= self.capacidad:
+            return a[:self.n]
+        i = self.n % self.capacidad
+        return a[i:] + a[:i]
+
+    def tiempos(self) -> array:
+        return self._cronologico(self._t)
+
+    def serie(self, columna: str, canal: int, desde: int = 0) -> array:
+        """Valores de una columna en orden cronológico, a partir del índice `desde`."""
+        out = self._cronologico(self._cols[columna][canal])
+        return out[desde:] if desde else out
+
+    def rango_raw(self, canal: int) -> Optional[Tuple[int, int]]:
+        if not self.n:
+            return None
+        raw = self.serie("raw", canal)
+        return min(raw), max(raw)
+
+
+# ---------------- Parser ----------------
+class Parser:
+    """Líneas sueltas -> tablas completas en el Historial."""
+    def __init__(self, historial: Historial):
+        self.historial = historial
+        self._filas: List[Optional[tuple]] = [None] * historial.canales
+        self._t = 0.0
+        self._abierta = False
+        self.tablas = 0
+        self.incompletas = 0
+
+    def linea(self, texto: str, t: float) -> bool:
+        """Procesa una línea; True si no era de la tabla (para que la use otro)."""
+        texto = texto.strip()
+        if texto.startswith(CABECERA):
+            if self._abierta:
+                self._cerrar()
+            self._abierta = True
+            self._t = t
+            return False
+        if not self._abierta:
+            return not _FILA_RE.match(texto) if texto else False
+        if not texto:
+            self._cerrar()
+            return False
+        m = _FILA_RE.match(texto)
+        if m is None:
+            return True
+        ch = int(m.group(1))
+        if ch < len(self._filas):
+            self._filas[ch] = tuple(int(g) for g in m.groups()[1:])
+        if all(f is not None for f in self._filas):
+            self._cerrar()
+        return False
+
+    def _cerrar(self):
+        if all(f is not None for f in self._filas):
+            self.historial.agregar(self._t, self._filas)
+            self.tablas += 1
+        elif any(f is not None for f in self._filas):
+            self.incompletas += 1
+        self._filas = [None] * len(self._filas)
+        self._abierta = False
+
+
+# ---------------- Diezmado ----------------
+def minmax(t: Sequence[float], y: Sequence[int], t0: float, t1: float,
+           ancho: int) -> List[Tuple[float, int, int]]:
+    """(t del balde, mínimo, máximo) por columna de píxeles entre t0 y t1; baldes vacíos se omiten."""
+    if ancho <= 0 or t1 <= t0 or not len(t):
+        return []
+    dt = (t1 - t0) / ancho
+    bordes = [t0 + k * dt for k in range(ancho + 1)]
+    if NUMPY_AVAILABLE:
+        tn = np.frombuffer(t, dtype=np.float64) if isinstance(t, array) else np.asarray(t, dtype=np.float64)
+        yn = np.asarray(y)
+        idx = np.searchsorted(tn, bordes)
+        llenos = np.flatnonzero(idx[1:] > idx[:-1])
+        if not len(llenos):
+            return []
+        ini = idx[llenos]
+        mins = np.minimum.reduceat(yn, ini)
+        maxs = np.maximum.reduceat(yn, ini)
+        # reduceat toma hasta el próximo inicio: recortar el último balde
+        fin = idx[llenos[-1] + 1]
+        mins[-1] = yn[ini[-1]:fin].min()
+        maxs[-1] = yn[ini[-1]:fin].max()
+        return [(bordes[k] + dt / 2, int(a), int(b)) for k, a, b in zip(llenos.tolist(), mins.tolist(), maxs.tolist())]
+    out = []
+    a = bisect.bisect_left(t, t0)
+    for k in range(ancho):
+        b = bisect.bisect_left(t, bordes[k + 1], a)
+        if b > a:
+            trozo = y[a:b]
+            out.append((bordes[k] + dt / 2, min(trozo), max(trozo)))
+        a = b
+    return out
+
+
+def minmax_puntos(baldes: Sequence[Tuple[float, int, int]]) -> Tuple[List[float], List[int]]:
+    """Baldes de minmax() como serie (t, y): mínimo y máximo de cada balde, en ese orden."""
+    ts, ys = [], []
+    for tb, lo, hi in baldes:
+        ts += (tb, tb)
+        ys += (lo, hi)
+    return ts, ys
+
+
+def lttb(t: Sequence[float], y: Sequence[float], n: int) -> Tuple[List[float], List[float]]:
+    """Largest-Triangle-Three-Buckets: n puntos de (t, y) que conservan la forma."""
+    largo = len(t)
+    if n >= largo or n < 3:
+        return list(t), list(y)
+    ts, ys = [t[0]], [y[0]]
+    paso = (largo - 2) / (n - 2)
+    a = 0
+    for k in range(n - 2):
+        ini = int(k * paso) + 1
+        fin = int((k + 1) * paso) + 1
+        sig_ini, sig_fin = fin, min(largo, int((k + 2) * paso) + 1)
+        cnt = sig_fin - sig_ini
+        if cnt > 0:
+            cx = sum(t[sig_ini:sig_fin]) / cnt
+            cy = sum(y[sig_ini:sig_fin]) / cnt
+        else:
+            cx, cy = t[largo - 1], y[largo - 1]
+        ax, ay = t[a], y[a]
+        mejor, area_max = ini, -1.0
+        for i in range(ini, fin):
+            area = abs((ax - cx) * (y[i] - ay) - (ax - t[i]) * (cy - ay))
+            if area > area_max:
+                area_max, mejor = area, i
+        ts.append(t[mejor])
+        ys.append(y[mejor])
+        a = mejor
+    ts.append(t[largo - 1])
+    ys.append(y[largo - 1])
+    return ts, ys
+
+
+# ---------------- Calibración ----------------
+@dataclass
+class Sugerencia:
+    raw_min: Tuple[int, ...]
+    raw_max: Tuple[int, ...]
+    movidos: Tuple[bool, ...]     # canales con rango suficiente (los otros quedan de fábrica)
+    tablas: int
+
+    def texto(self) -> str:
+        return (f"int RAW_MIN[N_CHANNELS] = {{{', '.join(map(str, self.raw_min))}}};\n"
+                f"int RAW_MAX[N_CHANNELS] = {{{', '.join(map(str, self.raw_max))}}};")
+
+
+def sugerir(historial: Historial, margen: int = DEFAULT_MARGEN, rango_min: int = 100) -> Optional[Sugerencia]:
+    """
+    RAW_MIN/RAW_MAX por canal con el rango de raw del historial, achicado `margen`
+    cuentas por lado. Canales que se movieron menos de `rango_min` quedan de fábrica.
+    """
+    if not historial.n:
+        return None
+    lo, hi, mov = [], [], []
+    for ch in range(historial.canales):
+        a, b = historial.rango_raw(ch)
+        ok = b - a >= rango_min
+        lo.append(a + margen if ok else RAW_MIN_FW)
+        hi.append(b - margen if ok else RAW_MAX_FW)
+        mov.append(ok)
+    return Sugerencia(tuple(lo), tuple(hi), tuple(mov), len(historial))
+
+
+def parchear_sketch(path: str, sug: Sugerencia) -> str:
+    """Reescribe RAW_MIN / RAW_MAX en robot_arm.ino. Devuelve el texto anterior de esas líneas."""
+    with open(path, "r", encoding="utf-8") as f:
+        texto = f.read()
+    previo = []
+    for nombre, valores in (("RAW_MIN", sug.raw_min), ("RAW_MAX", sug.raw_max)):
+        patron = re.compile(rf"^(\s*int\s+{nombre}\s*\[N_CHANNELS\]\s*=\s*)\{{[^}}]*\}}", re.M)
+        m = patron.search(texto)
+        if m is None:
+            raise ValueError(f"{path}: no encontré la línea de {nombre}.")
+        previo.append(m.group(0).strip())
+        texto = patron.sub(lambda m: m.group(1) + "{" + ", ".join(map(str, valores)) + "}", texto, count=1)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(texto)
+    return "\n".join(previo)
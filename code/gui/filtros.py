@@ -0,0 +1,118 @@
+"""
+Filtro de teleop del lado de la PC, entre las muestras POT del minibrazo y los SET.
+
+El minibrazo ya manda su salida con EMA + banda muerta propia; acá se puede suavizar
+un poco más y, sobre todo, no reenviar lo que el brazo no va a notar:
+
+  - suavizado por canal: EMA (alpha fijo por muestra) o One-Euro (Casiez et al. 2012:
+    corte bajo en reposo, sube con la velocidad, así que casi no agrega retardo al
+    mover rápido);
+  - banda muerta: la salida de un canal sólo cambia cuando el valor filtrado se aleja
+    `banda` cuentas del último enviado. Si ningún canal cambia no hay SET;
+  - tope de tasa (max_hz): no se descarta nada acá, se aplica como intervalo mínimo
+    entre SET del SerialClient, que ya coalesce (siempre sale la pose más nueva).
+
+El firmware del brazo mueve los servos de a DEAD_DEG = 2° (~11 cuentas), así que una
+banda de pocas cuentas no se ve en el brazo pero corta los SET por temblor del pote.
+Por defecto sólo banda: con mini_brazo.ino, que ya suaviza, un segundo suavizado suma
+retardo sin bajar mucho los SET (ver `bench.py --solo filtro`). EMA / One-Euro sirven
+para un minibrazo que mande los potes crudos o muy ruidosos.
+"""
+import math
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+MODOS = ("no", "ema", "euro")
+DT_MIN_S = 0.010   # el minibrazo manda cada ~15 ms
+
+
+@dataclass(frozen=True)
+class ConfigFiltro:
+    modo: str = "no"            # "no" | "ema" | "euro"
+    alpha: float = 0.5          # EMA: peso de la muestra nueva
+    min_cutoff: float = 1.0     # One-Euro: corte en reposo (Hz)
+    beta: float = 0.05          # One-Euro: cuánto sube el corte por cuenta/s de velocidad
+    d_cutoff: float = 1.0       # One-Euro: corte del estimador de velocidad (Hz)
+    banda: int = 6              # cuentas (~1°)
+    max_hz: float = 0.0         # SET/s en el enlace del brazo (0 = el límite del SerialClient)
+
+    def __post_init__(self):
+        if self.modo not in MODOS:
+            raise ValueError(f"Filtro: modo desconocido '{self.modo}' (usá {', '.join(MODOS)}).")
+
+
+SIN_FILTRO = ConfigFiltro(modo="no", banda=0)
+
+
+def _alpha(cutoff: float, dt: float) -> float:
+    tau = 1.0 / (2.0 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class OneEuro:
+    """One-Euro de un canal; t en segundos."""
+    def __init__(self, min_cutoff: float, beta: float, d_cutoff: float):
+        self.min_cutoff, self.beta, self.d_cutoff = min_cutoff, beta, d_cutoff
+        self.x: Optional[float] = None
+        self.dx = 0.0
+        self.t = 0.0
+
+    def __call__(self, x: float, t: float) -> float:
+        if self.x is None:
+            self.x, self.t = float(x), t
+            return self.x
+        # muestras que llegan juntas (misma lectura) no deben parecer un salto de velocidad
+        dt = max(t - self.t, DT_MIN_S)
+        self.t = t
+        a_d = _alpha(self.d_cutoff, dt)
+        self.dx += a_d * ((x - self.x) / dt - self.dx)
+        a = _alpha(self.min_cutoff + self.beta * abs(self.dx), dt)
+        self.x += a * (x - self.x)
+        return self.x
+
+
+class Ema:
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self.x: Optional[float] = None
+
+    def __call__(self, x: float, t: float) -> float:
+        if self.x is None:
+            self.x = float(x)
+        else:
+            self.x += self.alpha * (x - self.x)
+        return self.x
+
+
+class FiltroPose:
+    """Filtro de los 4 canales del minibrazo; filtrar() dice qué hay que reenviar."""
+    def __init__(self, config: ConfigFiltro = ConfigFiltro()):
+        self.config = config
+        if config.modo == "euro":
+            self._canales = [OneEuro(config.min_cutoff, config.beta, config.d_cutoff) for _ in range(4)]
+        elif config.modo == "ema":
+            self._canales = [Ema(config.alpha) for _ in range(4)]
+        else:
+            self._canales = None
+        self.salida: Optional[tuple] = None   # último valor reenviado por canal
+        self.entradas = 0
+        self.suprimidas = 0                   # muestras que no generaron SET
+
+    def filtrar(self, canales: Sequence[int], t: float) -> Optional[tuple]:
+        """(m1..m4) a reenviar, o None si ningún canal salió de la banda muerta."""
+        self.entradas += 1
+        if self._canales is not None:
+            valores = [min(1023, max(0, int(round(f(v, t))))) for f, v in zip(self._canales, canales)]
+        else:
+            valores = [int(v) for v in canales]
+        previo = self.salida
+        if previo is None:
+            self.salida = tuple(valores)
+            return self.salida
+        banda = self.config.banda
+        nueva = tuple(v if abs(v - p) >= banda else p for v, p in zip(valores, previo))
+        if nueva == previo:
+            self.suprimidas += 1
+            return None
+        self.salida = nueva
+        return nueva
@@ -0,0 +1,307 @@
+"""
+Reproducción confirmada: el brazo avisa cuándo recibió cada pose y cuándo la alcanzó.
+
+Con "PROTO ACK" negociado (SerialClient.ack) cada pose sale como trama T_MOVE con su
+número de secuencia y entra a una cola de robot_arm.ino. El firmware responde un T_ACK
+al aceptarla y otro con F_LLEGO cuando su salida filtrada (el EMA que maneja el servo,
+que no tiene realimentación) quedó a REACH_TOL cuentas del objetivo; recién ahí pasa a
+la siguiente. La PC mantiene hasta `ventana` poses en vuelo por brazo (créditos: nunca
+más que la cola que informa el firmware), así que la secuencia avanza tan rápido como
+el brazo termina cada movimiento, sin un delay fijo entre pasos:
+
+  - retransmisión go-back-N: si la MOVE más vieja sin ACK no se confirma en
+    timeout_ack_s se reenvían todas las pendientes (el firmware descarta las que
+    llegan fuera de orden y vuelve a confirmar las repetidas);
+  - llegada: cada ACK trae la última pose alcanzada, así que un F_LLEGO perdido se
+    recupera con el siguiente; si una pose en movimiento pasa sondeo_s sin novedades
+    se reenvía (el firmware la descarta por repetida y responde su estado). Una pose
+    que no se alcanza en timeout_llegada_s aborta la corrida (SinConfirmacion), igual
+    que una MOVE sin ACK después de `reintentos`;
+  - pausas: la pausa al llegar a una pose (optimizador.pausas: sólo donde cambia el
+    electroimán) frena el envío hasta que todos los brazos la alcanzaron y pasó la pausa;
+  - varios brazos: una pose sale a todos a la vez, cuando todos tienen crédito.
+
+ReporteFlujo: poses/s, ida y vuelta envío -> ACK (sólo de MOVE no retransmitidas,
+algoritmo de Karn), tiempo de cada movimiento, retransmisiones, timeouts y sondeos.
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+
+import protocolo
+from protocolo import Frame
+from trayectoria import _percentil
+
+
+@dataclass(frozen=True)
+class ConfigFlujo:
+    ventana: int = 4                  # poses en vuelo por brazo (el firmware puede pedir menos)
+    timeout_ack_s: float = 0.25       # MOVE sin ACK: se retransmite
+    timeout_llegada_s: float = 5.0    # pose recibida que no se alcanza: se aborta
+    reintentos: int = 5               # retransmisiones de la misma MOVE antes de abortar
+    sondeo_s: float = 0.5             # pose en movimiento sin novedades: se pregunta de nuevo
+
+
+class SinConfirmacion(TimeoutError):
+    """Un brazo dejó de confirmar: no recibe las MOVE o no llega a la pose."""
+
+
+@dataclass
+class ReporteFlujo:
+    poses: int
+    ventana: int
+    completadas: int = 0              # poses alcanzadas por todos los brazos
+    duracion: float = 0.0
+    rtt_ms: List[float] = field(default_factory=list)   # envío -> ACK
+    mov_ms: List[float] = field(default_factory=list)   # inicio del movimiento -> llegada
+    retransmisiones: int = 0
+    timeouts: int = 0
+    sondeos: int = 0
+    cancelado: bool = False
+    error: Optional[str] = None
+
+    @property
+    def poses_s(self) -> float:
+        return self.completadas / self.duracion if self.duracion > 0 else 0.0
+
+    def texto(self) -> str:
+        estado = " (cancelada)" if self.cancelado else f" (abortada: {self.error})" if self.error else ""
+        return (f"Confirmada{estado}: {self.completadas}/{self.poses} poses en {self.duracion:.2f} s "
+                f"({self.poses_s:.1f} poses/s, ventana {self.ventana})\n"
+                f"  ACK: p50 {_percentil(self.rtt_ms, 0.5):.1f} ms / p95 {_percentil(self.rtt_ms, 0.95):.1f} ms; "
+                f"movimiento: p50 {_percentil(self.mov_ms, 0.5):.0f} ms / "
+                f"p95 {_percentil(self.mov_ms, 0.95):.0f} ms\n"
+                f"  retransmisiones {self.retransmisiones}, timeouts {self.timeouts}, sondeos {self.sondeos}")
+
+
+class Enlace:
+    """Lo que un brazo tiene en vuelo en la corrida: índices enviados, recibidos y alcanzados."""
+    def __init__(self, corrida: "Corrida", nombre: str, client, calib: Optional[Callable] = None,
+                 seq0: int = 0):
+        self.corrida = corrida
+        self.nombre = nombre
+        self.client = client
+        self.calib = calib              # Calibracion.aplicar del brazo
+        self.seq0 = seq0 & 0xFF
+        self.capacidad = 1              # hasta el primer ACK, una sola en vuelo
+        self.recibidas = 0              # índices < recibidas: en la cola del firmware
+        self.llegadas = 0               # índices < llegadas: alcanzados
+        self.t_llegada = 0.0            # de la última alcanzada (arranque del movimiento siguiente)
+        self.t_novedad = 0.0            # último ACK o sondeo
+        self._t_envio: Dict[int, float] = {}
+        self._reenvios: Dict[int, int] = {}
+        self._t_recibida: Dict[int, float] = {}
+
+    def _indice(self, seq: int, desde: int) -> Optional[int]:
+        """Índice en vuelo (desde .. enviadas-1) con esa secuencia, o None."""
+        k = desde + ((seq - self.seq0 - desde) & 0xFF)
+        return k if k < self.corrida.enviadas else None
+
+    def mandar(self, i: int, now: float):
+        pose = self.corrida.poses[i]
+        if self.calib is not None:
+            pose = self.calib(pose)
+        self.client.send_bytes(protocolo.encode_move(self.seq0 + i, pose, nueva=i == 0))
+        self._t_envio[i] = now
+
+    def recibir(self, fr: Frame, t: float):
+        """T_ACK del firmware (desde el lector del brazo)."""
+        c = self.corrida
+        with c.cond:
+            k = self._indice(fr.seq, self.llegadas)
+            if k is None:
+                return   # de una corrida anterior, o una confirmación repetida
+            self.capacidad = max(1, min(c.config.ventana, fr.canales[1]))
+            if k >= self.recibidas:
+                # acumulativo: todo hasta k está en la cola; la ida y vuelta sólo se mide en k
+                for i in range(self.recibidas, k + 1):
+                    self._t_recibida[i] = t
+                if not self._reenvios.get(k):
+                    c.reporte.rtt_ms.append((t - self._t_envio[k]) * 1000.0)
+                self.recibidas = k + 1
+            self.t_novedad = t
+            r = self._indice(fr.canales[2] & 0xFF, self.llegadas) if fr.canales[2] & 0x100 else None
+            if r is not None:
+                if fr.flags & protocolo.F_LLEGO and r == self.llegadas:
+                    # el tiempo del movimiento sólo se mide con el aviso de esa misma llegada
+                    inicio = max(self._t_recibida[r], self.t_llegada)
+                    c.reporte.mov_ms.append((t - inicio) * 1000.0)
+                for i in range(self.llegadas, r + 1):
+                    self._t_envio.pop(i, None)
+                    self._reenvios.pop(i, None)
+                    self._t_recibida.pop(i, None)
+                self.llegadas = r + 1
+                self.t_llegada = t
+            c.avisar()
+
+    def revisar(self, now: float) -> float:
+        """Retransmite o aborta según los plazos; segundos hasta el próximo plazo."""
+        c = self.corrida
+        cfg = c.config
+        espera = cfg.timeout_ack_s
+        if self.recibidas < c.enviadas:
+            i = self.recibidas
+            vence = self._t_envio[i] + cfg.timeout_ack_s
+            if now >= vence:
+                c.reporte.timeouts += 1
+                if self._reenvios.get(i, 0) >= cfg.reintentos:
+                    raise SinConfirmacion(f"{self.nombre}: sin ACK de la pose #{i + 1} "
+                                          f"después de {cfg.reintentos} reintentos")
+                for k in range(i, c.enviadas):   # go-back-N
+                    self._reenvios[k] = self._reenvios.get(k, 0) + 1
+                    self.mandar(k, now)
+                    c.reporte.retransmisiones += 1
+                vence = now + cfg.timeout_ack_s
+            espera = vence - now
+        if self.llegadas < self.recibidas:
+            i = self.llegadas
+            vence = max(self._t_recibida[i], self.t_llegada) + cfg.timeout_llegada_s
+            if now >= vence:
+                c.reporte.timeouts += 1
+                raise SinConfirmacion(f"{self.nombre}: no llegó a la pose #{i + 1} "
+                                      f"en {cfg.timeout_llegada_s:g} s")
+            sondeo = self.t_novedad + cfg.sondeo_s
+            if now >= sondeo:
+                self.mandar(i, now)    # repetida: el firmware sólo contesta su estado
+                c.reporte.sondeos += 1
+                self.t_novedad = now
+                sondeo = now + cfg.sondeo_s
+            espera = min(espera, vence - now, sondeo - now)
+        return espera
+
+
+class Corrida:
+    """
+    Una reproducción confirmada sobre uno o más brazos (un Enlace por brazo).
+    paso() hace el trabajo; reproducir() / reproducir_async() lo llaman cuando llega
+    un ACK o vence un plazo.
+    """
+    def __init__(self, poses: Sequence[Sequence[int]], pausas: Optional[Sequence[float]] = None,
+                 config: Optional[ConfigFlujo] = None,
+                 al_llegar: Optional[Callable[[int, tuple], None]] = None):
+        self.poses = poses              # lista, PoseStore o SecuenciaBin (se indexa)
+        self.n = len(poses)
+        self.pausas = pausas
+        self.config = config or ConfigFlujo()
+        self.al_llegar = al_llegar      # (índice, pose) cuando todos los brazos la alcanzaron
+        self.cond = threading.Condition()
+        self.despertar: Optional[Callable[[], None]] = None
+        self.enlaces: List[Enlace] = []
+        self.enviadas = 0
+        self.cancelada = False
+        self.reporte = ReporteFlujo(self.n, self.config.ventana)
+        self._avisadas = 0
+        self._t0: Optional[float] = None
+
+    def enlace(self, nombre: str, client, calib: Optional[Callable] = None, seq0: int = 0) -> Enlace:
+        e = Enlace(self, nombre, client, calib, seq0)
+        self.enlaces.append(e)
+        return e
+
+    def avisar(self):
+        """Hay novedades (llamar con cond tomado)."""
+        self.cond.notify_all()
+        if self.despertar is not None:
+            self.despertar()
+
+    def cancelar(self):
+        with self.cond:
+            self.cancelada = True
+            self.avisar()
+
+    def paso(self, now: float) -> Optional[float]:
+        """
+        Avisa llegadas, envía lo que permiten créditos y pausas y revisa plazos.
+        Segundos hasta la próxima revisión, o None si todo llegó. Llamar con cond tomado.
+        """
+        if self._t0 is None:
+            self._t0 = now
+            for e in self.enlaces:
+                e.t_llegada = e.t_novedad = now
+        llegadas = min(e.llegadas for e in self.enlaces)
+        while self._avisadas < llegadas:
+            i = self._avisadas
+            self._avisadas += 1
+            if self.al_llegar is not None:
+                self.al_llegar(i, self.poses[i])
+        self.reporte.completadas = llegadas
+        if llegadas >= self.n:
+            return None
+        espera = self.config.timeout_ack_s
+        while self.enviadas < self.n:
+            j = self.enviadas
+            pausa = self.pausas[j - 1] if self.pausas is not None and j > 0 else 0.0
+            if pausa > 0:
+                if llegadas < j:
+                    break
+                resto = max(e.t_llegada for e in self.enlaces) + pausa - now
+                if resto > 0:
+                    espera = min(espera, resto)
+                    break
+            if any(j - e.llegadas >= e.capacidad for e in self.enlaces):
+                break
+            for e in self.enlaces:
+                e.mandar(j, now)
+            self.enviadas += 1
+        for e in self.enlaces:
+            espera = min(espera, e.revisar(now))
+        return max(0.001, espera)
+
+    def siguiente_seq(self, e: Enlace) -> int:
+        """Secuencia para la próxima corrida de ese brazo (distinta de la primera de ésta)."""
+        seq = (e.seq0 + self.enviadas) & 0xFF
+        return seq if seq != e.seq0 else (seq + 1) & 0xFF
+
+    def _terminar(self, t0: float, error: Optional[Exception]):
+        self.reporte.duracion = time.monotonic() - t0
+        self.reporte.cancelado = self.cancelada and self.reporte.completadas < self.n
+        if error is not None:
+            self.reporte.error = str(error)
+
+
+def reproducir(corrida: Corrida) -> ReporteFlujo:
+    """Bloquea hasta que todos los brazos alcancen la última pose, o cancelar(). Lanza SinConfirmacion."""
+    t0 = time.monotonic()
+    error = None
+    try:
+        with corrida.cond:
+            while not corrida.cancelada:
+                espera = corrida.paso(time.monotonic())
+                if espera is None:
+                    break
+                corrida.cond.wait(espera)
+    except SinConfirmacion as e:
+        error = e
+        raise
+    finally:
+        corrida._terminar(t0, error)
+    return corrida.reporte
+
+
+async def reproducir_async(corrida: Corrida) -> ReporteFlujo:
+    """Versión asyncio de reproducir(): los ACK la despiertan con un Event del bucle."""
+    import asyncio   # sólo con MotorAsync (no pesa en el arranque)
+    loop = asyncio.get_running_loop()
+    ev = asyncio.Event()
+    corrida.despertar = lambda: loop.call_soon_threadsafe(ev.set)
+    t0 = time.monotonic()
+    error = None
+    try:
+        while not corrida.cancelada:
+            ev.clear()
+            with corrida.cond:
+                espera = corrida.paso(time.monotonic())
+            if espera is None:
+                break
+            try:
+                await asyncio.wait_for(ev.wait(), espera)
+            except asyncio.TimeoutError:
+                pass
+    except SinConfirmacion as e:
+        error = e
+        raise
+    finally:
+        corrida.despertar = None
+        corrida._terminar(t0, error)
+    return corrida.reporte
@@ -0,0 +1,120 @@
+"""
+Grabación de teleoperación y simplificación a poses clave.
+
+RingRecorder guarda el stream POT en buffers preasignados (array) con timestamp
+monotónico. Es un anillo: si la sesión supera la capacidad se pisan las muestras
+más viejas, así que la memoria queda fija (capacidad por defecto: 15 min a 66 Hz).
+record() es O(1) y lo llama el hilo lector después de reenviar al brazo, así que
+no agrega latencia al teleop.
+
+simplificar() reduce la grabación con Ramer–Douglas–Peucker en el espacio
+articular de 4 dimensiones: se quedan sólo las poses que se apartan más de
+`tol` cuentas de la recta entre sus vecinas. Los cambios del electroimán se
+conservan siempre (cada tramo con el mismo estado se simplifica por separado).
+"""
+import math
+from array import array
+from typing import List, Sequence, Tuple
+
+N_JOINTS = 4
+DEFAULT_CAPACITY = 66 * 60 * 15
+DEFAULT_TOL = 8.0  # cuentas (~1.4°)
+
+
+class RingRecorder:
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._t = array("d", bytes(8 * capacity))
+        self._q = array("H", bytes(2 * 5 * capacity))  # m1 m2 m3 m4 mag por muestra
+        self._n = 0          # muestras escritas en total (puede superar capacity)
+        self.activo = False
+
+    def start(self):
+        self._n = 0
+        self.activo = True
+
+    def stop(self):
+        self.activo = False
+
+    @property
+    def overwritten(self) -> int:
+        return max(0, self._n - self.capacity)
+
+    def __len__(self) -> int:
+        return min(self._n, self.capacity)
+
+    def record(self, t: float, m1: int, m2: int, m3: int, m4: int, mag: int):
+        i = self._n % self.capacity
+        self._t[i] = t
+        k = i * 5
+        q = self._q
+        q[k] = m1; q[k + 1] = m2; q[k + 2] = m3; q[k + 3] = m4; q[k + 4] = mag
+        self._n += 1
+
+    def muestras(self) -> Tuple[List[float], List[tuple]]:
+        """(tiempos, poses) en orden cronológico."""
+        n = len(self)
+        start = self._n % self.capacity if self._n > self.capacity else 0
+        idx = [(start + j) % self.capacity for j in range(n)]
+        q = self._q
+        return ([self._t[i] for i in idx],
+                [(q[i * 5], q[i * 5 + 1], q[i * 5 + 2], q[i * 5 + 3], q[i * 5 + 4]) for i in idx])
+
+    def exportar(self, path: str):
+        """Guarda la grabación cruda como .brz con timestamps (ms desde el inicio)."""
+        import secuencia_bin
+        ts, poses = self.muestras()
+        t0 = ts[0] if ts else 0.0
+        with secuencia_bin.Escritor(path, timestamps=True, sample_rate=0.0) as w:
+            for t, p in zip(ts, poses):
+                w.append(p, int((t - t0) * 1000.0))
+
+
+def _dist_seg(p: Sequence[int], a: Sequence[int], b: Sequence[int]) -> float:
+    """Distancia de p al segmento a-b en 4-D."""
+    ab = [b[j] - a[j] for j in range(N_JOINTS)]
+    ap = [p[j] - a[j] for j in range(N_JOINTS)]
+    L2 = sum(x * x for x in ab)
+    if L2 == 0:
+        return math.sqrt(sum(x * x for x in ap))
+    u = max(0.0, min(1.0, sum(ab[j] * ap[j] for j in range(N_JOINTS)) / L2))
+    return math.sqrt(sum((ap[j] - u * ab[j]) ** 2 for j in range(N_JOINTS)))
+
+
+def rdp(poses: Sequence[Sequence[int]], tol: float) -> List[int]:
+    """Índices que sobreviven a Ramer–Douglas–Peucker (iterativo, sin recursión)."""
+    n = len(poses)
+    if n <= 2:
+        return list(range(n))
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        i, j = stack.pop()
+        a, b = poses[i], poses[j]
+        dmax, kmax = -1.0, -1
+        for k in range(i + 1, j):
+            d = _dist_seg(poses[k], a, b)
+            if d > dmax:
+                dmax, kmax = d, k
+        if dmax > tol:
+            keep[kmax] = True
+            stack.append((i, kmax))
+            stack.append((kmax, j))
+    return [k for k in range(n) if keep[k]]
+
+
+def simplificar(poses: Sequence[Sequence[int]], tol: float = DEFAULT_TOL) -> List[int]:
+    """
+    Índices de las poses clave. Cada cambio del electroimán parte la grabación:
+    se conservan la última pose antes y la primera después del cambio.
+    """
+    out: List[int] = []
+    start = 0
+    n = len(poses)
+    for k in range(1, n + 1):
+        if k == n or poses[k][N_JOINTS] != poses[start][N_JOINTS]:
+            tramo = poses[start:k]
+            out.extend(start + i for i in rdp(tramo, tol))
+            start = k
+    return out
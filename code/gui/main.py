@@ -1,114 +1,494 @@
+import base64
+import bisect
+import dataclasses
+import math
 import os
-import json
-import threading
-import time
+import sys
 import tkinter as tk
+import tkinter.font as tkfont
 from tkinter import ttk, messagebox, filedialog
-from dataclasses import dataclass
-from typing import List, Optional
-from typing import Optional, Any
-
-# ---- Imágenes (Pillow opcional para reescalar) ----
-try:
-    from PIL import Image, ImageTk
-    PIL_AVAILABLE = True
-except Exception:
-    PIL_AVAILABLE = False
-
-# ---- Serie (pyserial) ----
-try:
-    import serial
-    import serial.tools.list_ports
-except Exception:
-    serial = None
-
-
-# ------------------------- DATOS -------------------------
-@dataclass
-class Posicion:
-    m1: int
-    m2: int
-    m3: int
-    m4: int
-    mag: int  # 0/1
-
-    def to_list(self):
-        return [self.m1, self.m2, self.m3, self.m4, self.mag]
+from typing import Dict, Optional
+
+import cinematica
+import cinematica_inversa
+import diagnostico
+import filtros
+import grabacion
+import metricas
+import recursos
+import trayectoria
+import validador
+from controlador import ArmController, parse_limites, parse_offset
+from poses import Posicion, PoseStore
+
+TELEMETRY_UI_MS = 33  # refresco de la UI con telemetría (~30 fps)
+STATS_UI_MS = 500     # refresco del panel de métricas
+GRABACION_UI_MS = 50  # sondeo de la simplificación de una toma (corre en otro hilo)
+RECURSOS_UI_MS = 30   # sondeo de imágenes decodificadas (sólo mientras haya pedidos)
+RECORRIDO_HZ = 20           # muestreo del recorrido superpuesto en la vista del brazo
+RECORRIDO_MAX_POSES = 2000  # más que esto: se unen las poses sin muestrear la trayectoria
+
+
+# ------------------------- VISTA DE POSICIONES -------------------------
+class ListaVirtual(ttk.Frame):
+    """
+    Listbox virtual sobre un PoseStore: el Listbox sólo contiene las filas visibles
+    y se rellena al desplazarse, así que listas de 100k poses no cuestan más que 12.
+    La selección se guarda como índice absoluto en `selected`. marcar() resalta las
+    poses que no pasaron la validación mientras la lista no cambie.
+    """
+    def __init__(self, master, store: PoseStore, height: int = 12):
+        super().__init__(master)
+        self.store = store
+        self.rows = height
+        self.first = 0
+        self.selected: Optional[int] = None
+        self._rendered = None  # (first, rows, version, selected, marcas) de lo que está dibujado
+        self.marcas: Dict[int, str] = {}   # índice -> motivo (validador)
+        self._marcas_version: Optional[int] = None
+
+        self.lb = tk.Listbox(self, height=height, activestyle="none", exportselection=False)
+        self.lb.pack(side="left", fill="both", expand=True)
+        self.sb = ttk.Scrollbar(self, orient="vertical", command=self._on_scroll)
+        self.sb.pack(side="right", fill="y")
+
+        self._line_h = tkfont.Font(font=self.lb.cget("font")).metrics("linespace") + 1
+        self.lb.bind("<<ListboxSelect>>", self._on_select)
+        self.lb.bind("<Configure>", self._on_resize)
+        self.lb.bind("<MouseWheel>", lambda e: self._scroll_units(-1 if e.delta > 0 else 1))
+        self.lb.bind("<Button-4>", lambda e: self._scroll_units(-1))
+        self.lb.bind("<Button-5>", lambda e: self._scroll_units(1))
+        self.lb.bind("<Up>", lambda e: self._move_sel(-1))
+        self.lb.bind("<Down>", lambda e: self._move_sel(1))
 
     @staticmethod
-    def from_list(lst):
-        return Posicion(int(lst[0]), int(lst[1]), int(lst[2]), int(lst[3]), int(lst[4]))
-
-
-# ------------------------- SERIAL -------------------------
-class SerialClient:
-    """Cliente serie simple para enviar/recibir líneas ASCII."""
-    def __init__(self):
-        self.ser: Optional[Any] = None
-
-    def ports(self):
-        if serial is None:
-            return []
-        return [p.device for p in serial.tools.list_ports.comports()]
-
-    def connect(self, port: str, baud: int = 230400, timeout: float = 0.1):
-        if serial is None:
-            raise RuntimeError("pyserial no está instalado. Ejecuta: pip install pyserial")
-        self.close()
-        self.ser = serial.Serial(port=port, baudrate=baud, timeout=timeout)
-
-    def close(self):
-        if self.ser and self.ser.is_open:
-            self.ser.close()
-        self.ser = None
-
-    @property
-    def connected(self) -> bool:
-        return self.ser is not None and self.ser.is_open
-
-    # escritura
-    def send_line(self, text: str):
-        if not self.connected:
+    def formato(i: int, p: tuple) -> str:
+        return f"{i + 1:>5}: {p[0]},{p[1]},{p[2]},{p[3]}, MAG={p[4]}"
+
+    def _texto(self, i: int) -> str:
+        motivo = self.marcas.get(i)
+        texto = self.formato(i, self.store[i])
+        return texto if motivo is None else f"{texto}   ⚠ {motivo}"
+
+    def marcar(self, problemas: Dict[int, str]):
+        """Resalta las poses con problemas; se borran solas cuando se edita la lista."""
+        self.marcas = dict(problemas)
+        self._marcas_version = self.store.version
+        self.refresh(force=True)
+
+    def refresh(self, force: bool = False):
+        n = len(self.store)
+        if self.marcas and self._marcas_version != self.store.version:
+            self.marcas = {}
+        self.first = max(0, min(self.first, n - self.rows))
+        if self.selected is not None and self.selected >= n:
+            self.selected = n - 1 if n else None
+        key = (self.first, self.rows, self.store.version, self.selected, len(self.marcas))
+        if key != self._rendered or force:
+            self._rendered = key
+            self.lb.delete(0, tk.END)
+            last = min(n, self.first + self.rows + 1)  # +1: fila parcial al pie
+            self.lb.insert(tk.END, *[self._texto(i) for i in range(self.first, last)])
+            for i in range(self.first, last):
+                if i in self.marcas:
+                    self.lb.itemconfig(i - self.first, background="#f8d0d0")
+            if self.selected is not None and self.first <= self.selected < last:
+                self.lb.selection_set(self.selected - self.first)
+        if n <= self.rows:
+            self.sb.set(0.0, 1.0)
+        else:
+            self.sb.set(self.first / n, (self.first + self.rows) / n)
+
+    def see(self, i: int):
+        if i < self.first:
+            self.first = i
+        elif i >= self.first + self.rows:
+            self.first = i - self.rows + 1
+        self.refresh()
+
+    def _on_scroll(self, *args):
+        n = len(self.store)
+        if args[0] == "moveto":
+            self.first = int(float(args[1]) * n)
+        elif args[0] == "scroll":
+            step = self.rows if args[2] == "pages" else 1
+            self.first += int(args[1]) * step
+        self.refresh()
+
+    def _scroll_units(self, k: int):
+        self.first += k * 3
+        self.refresh()
+        return "break"
+
+    def _move_sel(self, k: int):
+        n = len(self.store)
+        if not n:
+            return "break"
+        cur = self.selected if self.selected is not None else -k
+        self.selected = max(0, min(n - 1, cur + k))
+        self.see(self.selected)
+        self.refresh()
+        return "break"
+
+    def _on_select(self, _event=None):
+        sel = self.lb.curselection()
+        if sel:
+            self.selected = self.first + sel[0]
+
+    def _on_resize(self, event):
+        rows = max(1, event.height // self._line_h)
+        if rows != self.rows:
+            self.rows = rows
+            self.refresh()
+
+
+# ------------------------- VISTA DEL BRAZO -------------------------
+class VistaBrazo:
+    """
+    Vista lateral en vivo (cinemática directa) sobre un Canvas existente.
+    Los ítems se crean una sola vez; cada actualización sólo mueve coordenadas
+    con coords(), y si la pose no cambió no toca el canvas.
+    """
+    COLORES = ("#555", "#1f77b4", "#2ca02c", "#d62728")
+
+    def __init__(self, canvas: tk.Canvas, geo: cinematica.Geometria = cinematica.GEOMETRIA):
+        self.c = canvas
+        self.geo = geo
+        w, h = int(canvas["width"]), int(canvas["height"])
+        self.ox, self.oy = w / 2, h - 30                  # base del brazo en pantalla
+        self.k = min((w / 2 - 15) / geo.alcance, (self.oy - 15) / (geo.altura + geo.alcance))  # px/mm
+        self._ultima = None
+        self._recorrido_version = None
+        self._recorrido_visible = False
+
+        c = self.c
+        c.create_line(10, self.oy, w - 10, self.oy, fill="#999", tags="vista")
+        self.recorrido = c.create_line(0, 0, 0, 0, fill="#ff7f0e", width=1, state="hidden", tags="vista")
+        self.eslabones = [c.create_line(0, 0, 0, 0, width=7 - i, fill=col, capstyle="round", tags="vista")
+                          for i, col in enumerate(self.COLORES)]
+        self.juntas = [c.create_oval(0, 0, 0, 0, fill="#222", outline="", tags="vista") for _ in range(4)]
+        self.punta = c.create_oval(0, 0, 0, 0, outline="#d62728", width=2, tags="vista")
+        # mini vista superior: giro de la base
+        cx, cy, r = w - 35, 35, 25
+        c.create_oval(cx - r, cy - r, cx + r, cy + r, outline="#999", tags="vista")
+        self._sup = (cx, cy, r)
+        self.giro = c.create_line(cx, cy, cx, cy, width=3, fill="#555", arrow="last", tags="vista")
+        self.texto = c.create_text(10, 10, anchor="nw", font=("Courier", 9), tags="vista")
+
+    def _xy(self, r: float, z: float):
+        return self.ox + r * self.k, self.oy - z * self.k
+
+    def actualizar(self, pose):
+        """Redibuja el brazo en `pose` (m1..m4[, mag]) moviendo los ítems existentes."""
+        pose = tuple(pose[:5])
+        if pose == self._ultima:
             return
-        self.ser.write(text.encode("ascii", errors="ignore"))
-
-    def send_set(self, p: Posicion):
-        self.send_line(f"SET {p.m1} {p.m2} {p.m3} {p.m4} {p.mag}\n")
-
-    def send_immediate(self, m1, m2, m3, m4, mag):
-        self.send_line(f"SET {m1} {m2} {m3} {m4} {mag}\n")
+        self._ultima = pose
+        q1, pts = cinematica.fk_plano(pose, self.geo)
+        xy = [self._xy(r, z) for r, z in pts]
+        c = self.c
+        for i, item in enumerate(self.eslabones):
+            c.coords(item, *xy[i], *xy[i + 1])
+        for i, item in enumerate(self.juntas):
+            x, y = xy[i + 1]
+            c.coords(item, x - 4, y - 4, x + 4, y + 4)
+        x, y = xy[-1]
+        c.coords(self.punta, x - 6, y - 6, x + 6, y + 6)
+        c.itemconfigure(self.punta, fill="#d62728" if len(pose) > 4 and pose[4] else "")
+        cx, cy, r = self._sup
+        c.coords(self.giro, cx, cy, cx + r * math.cos(q1), cy - r * math.sin(q1))
+        rr, zz = pts[-1]
+        c.itemconfigure(self.texto, text=f"r {rr:6.1f} mm\nz {zz:6.1f} mm\nbase {math.degrees(q1):5.1f}°")
+
+    def mostrar_recorrido(self, poses: PoseStore, visible: bool):
+        """Superpone el recorrido de la punta del programa guardado (se recalcula sólo si cambió)."""
+        visible = visible and len(poses) >= 2
+        if visible != self._recorrido_visible:
+            self._recorrido_visible = visible
+            self.c.itemconfigure(self.recorrido, state="normal" if visible else "hidden")
+        if not visible:
+            return
+        if poses.version != self._recorrido_version:
+            self._recorrido_version = poses.version
+            muestras = poses
+            if len(poses) <= RECORRIDO_MAX_POSES:
+                # recorrido real entre poses (interpolación articular), no segmentos rectos
+                muestras = trayectoria.Trayectoria(poses[0], poses).sample_many(RECORRIDO_HZ)
+            flat = []
+            for r, z in cinematica.puntas_plano(muestras, self.geo):
+                flat.extend(self._xy(r, z))
+            self.c.coords(self.recorrido, *flat)
+
+
+# ------------------------- BRAZOS (FAN-OUT) -------------------------
+class VentanaBrazos(tk.Toplevel):
+    """
+    Brazos reales conectados en paralelo: puerto, calibración (offset) y estadísticas
+    de cada uno. El teleop y las secuencias se difunden a todos los conectados.
+    """
+    def __init__(self, app: "ArmControlApp"):
+        super().__init__(app)
+        self.title("Brazos")
+        self.app = app
+        self.ctrl = app.ctrl
+        self.filas = ttk.Frame(self, padding=10)
+        self.filas.pack(fill="both", expand=True)
+        ttk.Button(self, text="Agregar brazo", command=self._agregar).pack(anchor="w", padx=10, pady=(0,10))
+        self._stats = {}
+        self._armar()
+        self._tick()
+
+    def _armar(self):
+        for w in self.filas.winfo_children():
+            w.destroy()
+        self._stats.clear()
+        for col, txt in enumerate(("Brazo", "Puerto", "Baud", "Offset m1..m4", "", "", "SET/coalesc/desc  latencia p50/p95 ms")):
+            ttk.Label(self.filas, text=txt, font=("Arial", 9, "bold")).grid(row=0, column=col, sticky="w", padx=3)
+        puertos = self.ctrl.monitor.devices()
+        for i, b in enumerate(self.ctrl.brazos, start=1):
+            ttk.Label(self.filas, text=b.nombre).grid(row=i, column=0, sticky="w", padx=3)
+            off = tk.StringVar(value=",".join(str(v) for v in b.calib.offset))
+            e = ttk.Entry(self.filas, textvariable=off, width=14)
+            e.grid(row=i, column=3, padx=3)
+            e.bind("<Return>", lambda _e, b=b, v=off: self._calibrar(b, v))
+            e.bind("<FocusOut>", lambda _e, b=b, v=off: self._calibrar(b, v))
+            if i == 1:
+                # el principal se conecta desde la ventana principal
+                ttk.Label(self.filas, text="(ventana principal)").grid(row=i, column=1, columnspan=2, sticky="w", padx=3)
+            else:
+                port = tk.StringVar()
+                ttk.Combobox(self.filas, textvariable=port, values=puertos, width=12, state="readonly").grid(row=i, column=1, padx=3)
+                baud = tk.IntVar(value=230400)
+                ttk.Entry(self.filas, textvariable=baud, width=8).grid(row=i, column=2, padx=3)
+                btn = ttk.Button(self.filas, text="Desconectar" if b.connected else "Conectar")
+                btn.config(command=lambda b=b, p=port, bd=baud, btn=btn: self._toggle(b, p, bd, btn))
+                btn.grid(row=i, column=4, padx=3)
+                ttk.Button(self.filas, text="Quitar", command=lambda b=b: self._quitar(b)).grid(row=i, column=5, padx=3)
+            lbl = ttk.Label(self.filas, text="", font=("Courier", 9))
+            lbl.grid(row=i, column=6, sticky="w", padx=3)
+            self._stats[b] = lbl
+
+    def _agregar(self):
+        self.ctrl.agregar_brazo()
+        self._armar()
+        self.app._set_status()
+
+    def _quitar(self, b):
+        self.ctrl.quitar_brazo(b)
+        self._armar()
+        self.app._set_status()
+
+    def _calibrar(self, b, var: tk.StringVar):
+        try:
+            b.calib.offset = parse_offset(var.get())
+        except ValueError as e:
+            messagebox.showwarning("Calibración", str(e), parent=self)
+            var.set(",".join(str(v) for v in b.calib.offset))
+
+    def _toggle(self, b, port: tk.StringVar, baud: tk.IntVar, btn: ttk.Button):
+        if b.connected:
+            self.ctrl.desconectar_brazo(b)
+            btn.config(text="Conectar")
+        else:
+            if not port.get():
+                messagebox.showwarning("Serie", "Elegí un puerto.", parent=self)
+                return
+            try:
+                self.ctrl.conectar_brazo(port.get(), baud.get(), binario=self.app.bin_var.get() == 1, brazo=b)
+            except Exception as e:
+                messagebox.showerror("Serie", f"No se pudo conectar {b.nombre}:\n{e}", parent=self)
+                return
+            btn.config(text="Desconectar")
+        self.app._set_status()
+
+    def _tick(self):
+        if not self.winfo_exists():
+            return
+        for b, st, (n, p50, p95, _mx) in self.ctrl.estadisticas():
+            lbl = self._stats.get(b)
+            if lbl is None:
+                continue
+            estado = ArmController.estado(b.client)
+            lat = f"{p50:6.2f}/{p95:6.2f}" if n else "   -  /   -  "
+            lbl.config(text=f"{st['sent']:>6}/{st['coalesced']:>5}/{st['dropped']:>4}  {lat}  {estado}")
+        self.after(STATS_UI_MS, self._tick)
+
+
+class VentanaDiagnostico(tk.Toplevel):
+    """
+    Tabla de diagnóstico de robot_arm.ino en vivo: raw (gris) y EMA (azul) de cada
+    canal con el rango observado. Se diezma al ancho del canvas, así que redibujar
+    horas de historia cuesta lo mismo que unos segundos.
+    """
+    VENTANAS = {"1 min": 60.0, "10 min": 600.0, "1 h": 3600.0, "Todo": 0.0}
+    ALTO_CANAL = 110
+    MARGEN_X = 44
+
+    def __init__(self, app: "ArmControlApp"):
+        super().__init__(app)
+        self.title("Diagnóstico del brazo")
+        self.app = app
+        self.ctrl = app.ctrl
+        barra = ttk.Frame(self, padding=(10, 8))
+        barra.pack(fill="x")
+        ttk.Label(barra, text="Brazo").pack(side="left")
+        self.brazo_var = tk.StringVar(value=self.ctrl.brazos[0].nombre)
+        ttk.Combobox(barra, textvariable=self.brazo_var, width=10, state="readonly",
+                     values=[b.nombre for b in self.ctrl.brazos]).pack(side="left", padx=(3, 10))
+        ttk.Label(barra, text="Ventana").pack(side="left")
+        self.ventana_var = tk.StringVar(value="1 min")
+        ttk.Combobox(barra, textvariable=self.ventana_var, width=7, state="readonly",
+                     values=list(self.VENTANAS)).pack(side="left", padx=(3, 10))
+        ttk.Label(barra, text="Diezmado").pack(side="left")
+        self.modo_var = tk.StringVar(value="min/max")
+        ttk.Combobox(barra, textvariable=self.modo_var, width=8, state="readonly",
+                     values=("min/max", "LTTB")).pack(side="left", padx=(3, 10))
+        ttk.Button(barra, text="Calibración sugerida...", command=self._calibrar).pack(side="right")
+
+        self.canvas = tk.Canvas(self, width=720, height=self.ALTO_CANAL * diagnostico.N_CANALES,
+                                bg="white", highlightthickness=0)
+        self.canvas.pack(fill="both", expand=True, padx=10)
+        self.info = ttk.Label(self, text="Esperando la tabla del brazo...", font=("Courier", 9), padding=(10, 6))
+        self.info.pack(anchor="w")
+        self._items = None
+        self._dibujado = None
+        self.canvas.bind("<Configure>", lambda _e: self._armar())
+        self._tick()
+
+    def _brazo(self):
+        return next((b for b in self.ctrl.brazos if b.nombre == self.brazo_var.get()), self.ctrl.brazos[0])
+
+    def _armar(self):
+        """Ejes y un ítem de línea por serie; el tick sólo les cambia las coordenadas."""
+        c = self.canvas
+        c.delete("all")
+        w = max(100, c.winfo_width())
+        h = max(100, c.winfo_height()) / diagnostico.N_CANALES
+        self._items = []
+        for ch in range(diagnostico.N_CANALES):
+            y0 = ch * h
+            c.create_rectangle(self.MARGEN_X, y0 + 4, w - 4, y0 + h - 4, outline="#bbb")
+            c.create_text(4, y0 + 10, text=f"m{ch + 1}", anchor="nw", font=("Arial", 9, "bold"))
+            c.create_text(self.MARGEN_X - 4, y0 + 6, text="1023", anchor="ne", font=("Arial", 7), fill="#888")
+            c.create_text(self.MARGEN_X - 4, y0 + h - 6, text="0", anchor="se", font=("Arial", 7), fill="#888")
+            obs = [c.create_line(0, 0, 0, 0, fill="#d08030", dash=(3, 3)) for _ in range(2)]
+            raw = c.create_line(0, 0, 0, 0, fill="#999")
+            ema = c.create_line(0, 0, 0, 0, fill="#1f5fbf", width=2)
+            self._items.append((raw, ema, obs, y0 + 5, h - 10))
+        self._dibujado = None
+
+    def _tick(self):
+        if not self.winfo_exists():
+            return
+        try:
+            self._redibujar()
+        finally:
+            self.after(250, self._tick)
+
+    def _redibujar(self):
+        brazo = self._brazo()
+        hist = brazo.diag
+        w = self.canvas.winfo_width()
+        # con ventanas largas un píxel abarca muchas tablas: redibujar una vez por píxel alcanza
+        span = self.VENTANAS[self.ventana_var.get()] or len(hist) * diagnostico.PERIODO_S
+        paso = max(1, int(span / max(1, w - self.MARGEN_X) / diagnostico.PERIODO_S))
+        clave = (id(brazo), hist.n // paso, w, self.ventana_var.get(), self.modo_var.get())
+        if self._items is None or clave == self._dibujado or not hist.n:
+            return
+        self._dibujado = clave
+        tiempos = hist.tiempos()
+        t1 = tiempos[-1]
+        span = self.VENTANAS[self.ventana_var.get()] or max(1.0, t1 - tiempos[0])
+        t0 = t1 - span
+        desde = bisect.bisect_left(tiempos, t0)
+        tiempos = tiempos[desde:]
+        x0, ancho = self.MARGEN_X + 1, max(2, w - self.MARGEN_X - 6)
+        lttb = self.modo_var.get() == "LTTB"
+        c = self.canvas
+        _, filas = hist.ultimo()
+        for ch, (raw_it, ema_it, obs_its, y0, h) in enumerate(self._items):
+            for item, col in ((raw_it, "raw"), (ema_it, "ema")):
+                ys = hist.serie(col, ch, desde)
+                if lttb:
+                    ts, ys = diagnostico.minmax_puntos(diagnostico.minmax(tiempos, ys, t0, t1 + 1e-6, 2 * ancho))
+                    ts, ys = diagnostico.lttb(ts, ys, ancho)
+                else:
+                    ts, ys = diagnostico.minmax_puntos(diagnostico.minmax(tiempos, ys, t0, t1 + 1e-6, ancho))
+                c.coords(item, *self._coords(ts, ys, t0, ancho / span, x0, y0, h))
+            for item, v in zip(obs_its, filas[ch][3:5]):
+                y = y0 + h - max(0, min(1023, v)) * h / 1023.0
+                c.coords(item, x0, y, x0 + ancho, y)
+        self.info.config(text="   ".join(f"m{ch + 1}: {raw:4} {ema:4} {deg:3}° [{omin},{omax}]"
+                                           for ch, (raw, ema, deg, omin, omax) in enumerate(filas))
+                         + f"\n{hist.n} tablas, {brazo.parser.incompletas} incompletas")
 
-    # lectura (línea por línea)
-    def readline(self) -> Optional[str]:
-        if not self.connected:
-            return None
+    @staticmethod
+    def _coords(ts, ys, t0: float, k: float, x0: float, y0: float, h: float) -> list:
+        coords = []
+        for t, y in zip(ts, ys):
+            coords += (x0 + (t - t0) * k, y0 + h - y * h / 1023.0)
+        if len(coords) < 4:   # una línea de Tk necesita al menos dos puntos
+            coords = coords * 2 or [0, 0, 0, 0]
+        return coords
+
+    def _calibrar(self):
+        brazo = self._brazo()
+        sug = self.ctrl.calibracion_sugerida(brazo)
+        if sug is None:
+            messagebox.showinfo("Calibración", "Todavía no llegó ninguna tabla del brazo.", parent=self)
+            return
+        self.clipboard_clear()
+        self.clipboard_append(sug.texto())
+        quietos = [f"m{ch + 1}" for ch, ok in enumerate(sug.movidos) if not ok]
+        aviso = f"\n\n{', '.join(quietos)} casi no se movieron: quedan de fábrica." if quietos else ""
+        if not messagebox.askyesno("Calibración", f"Con {sug.tablas} tablas (copiado al portapapeles):\n\n"
+                                   f"{sug.texto()}{aviso}\n\n¿Escribirlo en robot_arm.ino?", parent=self):
+            return
+        inicial = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "arduino")
+        path = filedialog.askopenfilename(parent=self, initialdir=os.path.normpath(inicial),
+                                          filetypes=[("Sketch Arduino", "*.ino")])
+        if not path:
+            return
         try:
-            line = self.ser.readline().decode("ascii", errors="ignore")
-            return line if line else None
-        except Exception:
-            return None
+            diagnostico.parchear_sketch(path, sug)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Calibración", str(e), parent=self)
+            return
+        self.app._set_status_text(f"RAW_MIN/RAW_MAX escritos en {os.path.basename(path)}: volvé a cargar el sketch.")
 
 
 # ------------------------- APP -------------------------
 class ArmControlApp(tk.Tk):
-    def __init__(self):
+    def __init__(self, motor=None):
         super().__init__()
         self.title("Control de Brazo Robot")
         self.geometry("1160x700")
 
-        # Estado serie
-        self.serial_arm = SerialClient()      # Puerto hacia el brazo REAL (SET ...)
-        self.serial_mini = SerialClient()     # Puerto desde el MINIbrazo (POT ...)
-        self.ejecutando = False               # flag para reproducción de secuencia
+        # Toda la lógica vive en el controlador; la ventana sólo lo muestra y lo maneja
+        self.ctrl = ArmController(motor=motor)
+        self.ctrl.on_status = self._post_status
+        self.serial_arm = self.ctrl.arm       # Puerto hacia el brazo REAL (SET ...)
+        self.serial_mini = self.ctrl.mini     # Puerto desde el MINIbrazo (POT ...)
+        self.metricas = self.ctrl.metricas
         self._updating_from_telemetry = False # evita eco al mover sliders por telemetría
-
-        # HOME por defecto (se puede redefinir)
-        self.home = Posicion(512, 512, 512, 512, 0)
-
-        # Rutas fijas que me pasaste
-        self.assets_dir   = r"D:\UTEC\Semestre_4\PIC_2\SOFTWARE CONTROL\brazo_app\imagenes_recursos"
-        self.logo_path    = os.path.join(self.assets_dir, "utec_logo.png")  # LOGO FIJO
-        self.arm_img_path = os.path.join(self.assets_dir, "brazo.png")
+        self.telemetry_coalesced = 0          # muestras POT que la UI no llegó a dibujar
+        self._status_dirty = False            # lo marcan los hilos; la UI refresca el estado en su tick
+        self._status_msg: Optional[str] = None
+        self._tasas = {"mini_rx": metricas.Tasa(), "arm_tx": metricas.Tasa()}
+        self._ventana_brazos: Optional[VentanaBrazos] = None
+        self._ventana_diag: Optional[VentanaDiagnostico] = None
+        self._puertos_version = -1
+        self._simplificando = None            # (Future de detener_grabacion_en_hilo, muestras pisadas)
+
+        # Posiciones guardadas (el Listbox es sólo una vista de este store)
+        self.poses = self.ctrl.poses
+
+        # Imágenes junto al paquete (code/gui/assets); se decodifican en otro hilo
+        self.assets_dir   = recursos.DIR_ASSETS
+        self.logo_path    = recursos.ruta_asset(recursos.LOGO)  # LOGO FIJO
+        self.arm_img_path = recursos.ruta_asset(recursos.BRAZO)
+        self.recursos = recursos.Cargador()
+        self._avisar_imagen: Dict[str, bool] = {}   # clave -> mostrar error (sólo si la eligió el usuario)
 
         # Autores
         self.authors = [
@@ -118,18 +498,20 @@ class ArmControlApp(tk.Tk):
         ]
 
         self._build_ui()
-
-        # Cargar logo e imagen del brazo si existen
-        try:
-            if os.path.exists(self.logo_path):
-                self._cargar_logo(self.logo_path)
-        except Exception:
-            pass
-        try:
-            if os.path.exists(self.arm_img_path):
-                self._cargar_brazo(self.arm_img_path)
-        except Exception:
-            pass
+        self.teleop_var.trace_add("write", lambda *_: self._sync_flags())
+        self.mag_var.trace_add("write", lambda *_: self._sync_flags())
+        self.filtro_var.trace_add("write", lambda *_: self._aplicar_filtro())
+        self.banda_var.trace_add("write", lambda *_: self._aplicar_filtro())
+        self.after(TELEMETRY_UI_MS, self._telemetry_tick)
+        self.after(STATS_UI_MS, self._metricas_tick)
+        self.protocol("WM_DELETE_WINDOW", self._cerrar)
+        self.ctrl.monitor.start()   # enumera puertos en segundo plano (no bloquea la ventana)
+
+        # Logo e imagen del brazo si existen: la ventana aparece ya y se completan al llegar
+        if os.path.exists(self.logo_path):
+            self._cargar_logo(self.logo_path, avisar=False)
+        if os.path.exists(self.arm_img_path):
+            self._cargar_brazo(self.arm_img_path, avisar=False)
 
     # ---------------- UI ----------------
     def _build_ui(self):
@@ -145,15 +527,17 @@ class ArmControlApp(tk.Tk):
 
         # --- Conexión brazo real ---
         ttk.Label(left, text="Puerto (Brazo real)").grid(row=0, column=0, sticky="w")
+        ttk.Button(left, text="Auto-detectar", command=self._autodetectar).grid(row=0, column=1, padx=5, sticky="w")
         self.port_arm_var = tk.StringVar()
         self.port_arm_combo = ttk.Combobox(left, textvariable=self.port_arm_var, width=14, state="readonly")
-        self.port_arm_combo["values"] = self.serial_arm.ports()
         self.port_arm_combo.grid(row=1, column=0, sticky="w", pady=(0,4))
         ttk.Button(left, text="Actualizar", command=self._refrescar_puertos).grid(row=1, column=1, padx=5, sticky="w")
 
         ttk.Label(left, text="Baud (Brazo)").grid(row=2, column=0, sticky="w")
         self.baud_arm_var = tk.IntVar(value=230400)
         ttk.Entry(left, textvariable=self.baud_arm_var, width=14).grid(row=3, column=0, sticky="w", pady=(0,6))
+        self.bin_var = tk.IntVar(value=1)  # intentar protocolo binario al conectar (cae a ASCII si no responde)
+        ttk.Checkbutton(left, text="Binario", variable=self.bin_var).grid(row=3, column=1, padx=5, sticky="w")
 
         self.btn_connect_arm = ttk.Button(left, text="Conectar brazo", command=self._toggle_conexion_arm)
         self.btn_connect_arm.grid(row=4, column=0, columnspan=2, sticky="we", pady=4)
@@ -164,13 +548,13 @@ class ArmControlApp(tk.Tk):
         ttk.Label(left, text="Puerto (Mini brazo)").grid(row=6, column=0, sticky="w")
         self.port_mini_var = tk.StringVar()
         self.port_mini_combo = ttk.Combobox(left, textvariable=self.port_mini_var, width=14, state="readonly")
-        self.port_mini_combo["values"] = self.serial_mini.ports()
         self.port_mini_combo.grid(row=7, column=0, sticky="w", pady=(0,4))
         ttk.Button(left, text="Actualizar", command=self._refrescar_puertos).grid(row=7, column=1, padx=5, sticky="w")
 
         ttk.Label(left, text="Baud (Mini)").grid(row=8, column=0, sticky="w")
         self.baud_mini_var = tk.IntVar(value=9600)  # típico HC-05 de fábrica
         ttk.Entry(left, textvariable=self.baud_mini_var, width=14).grid(row=9, column=0, sticky="w", pady=(0,6))
+        ttk.Checkbutton(left, text="Binario", variable=self.bin_var).grid(row=9, column=1, padx=5, sticky="w")
 
         self.btn_connect_mini = ttk.Button(left, text="Conectar mini", command=self._toggle_conexion_mini)
         self.btn_connect_mini.grid(row=10, column=0, columnspan=2, sticky="we", pady=4)
@@ -184,12 +568,28 @@ class ArmControlApp(tk.Tk):
 
         ttk.Label(left, text="Delay entre pasos (ms)").grid(row=15, column=0, columnspan=2, sticky="w", pady=(10,3))
         self.delay_var = tk.IntVar(value=600)
-        ttk.Entry(left, textvariable=self.delay_var, width=14).grid(row=16, column=0, columnspan=2, sticky="we")
+        ttk.Entry(left, textvariable=self.delay_var, width=14).grid(row=16, column=0, sticky="we")
+        self.confirmado_var = tk.IntVar(value=0)
+        ttk.Checkbutton(left, text="Esperar llegada (ACK)", variable=self.confirmado_var).grid(row=16, column=1, padx=5, sticky="w")
 
         ttk.Separator(left).grid(row=17, column=0, columnspan=2, sticky="we", pady=10)
 
-        ttk.Button(left, text="Guardar lista (JSON)", command=self._guardar_json).grid(row=18, column=0, columnspan=2, sticky="we", pady=3)
-        ttk.Button(left, text="Cargar lista (JSON)", command=self._cargar_json).grid(row=19, column=0, columnspan=2, sticky="we", pady=3)
+        ttk.Button(left, text="Guardar lista (JSON/BRZ)", command=self._guardar_json).grid(row=18, column=0, columnspan=2, sticky="we", pady=3)
+        ttk.Button(left, text="Cargar lista (JSON/BRZ)", command=self._cargar_json).grid(row=19, column=0, columnspan=2, sticky="we", pady=3)
+
+        ttk.Label(left, text="Vel. máx por motor (cuentas/s)").grid(row=20, column=0, columnspan=2, sticky="w", pady=(10,3))
+        self.vmax_var = tk.StringVar(value=",".join(str(int(v)) for v in trayectoria.DEFAULT_VMAX))
+        ttk.Entry(left, textvariable=self.vmax_var, width=14).grid(row=21, column=0, columnspan=2, sticky="we")
+        ttk.Button(left, text="Ejecutar desde archivo (BRZ)", command=self._ejecutar_archivo).grid(row=22, column=0, columnspan=2, sticky="we", pady=(10,3))
+        ttk.Button(left, text="Brazos (varios en paralelo)...", command=self._abrir_brazos).grid(row=23, column=0, columnspan=2, sticky="we", pady=3)
+        ttk.Button(left, text="Optimizar lista", command=self._optimizar).grid(row=24, column=0, columnspan=2, sticky="we", pady=3)
+        ttk.Button(left, text="Validar lista", command=self._validar_lista).grid(row=25, column=0, columnspan=2, sticky="we", pady=3)
+        # envolvente en mm: apagada hasta cargar medidas reales del brazo (ver validador.py)
+        self.env_var = tk.IntVar(value=0)
+        self.zmin_var = tk.StringVar(value=f"{validador.Envolvente.z_min:g}")
+        ttk.Checkbutton(left, text="Envolvente, z mín (mm)", variable=self.env_var).grid(row=26, column=0, sticky="w")
+        ttk.Entry(left, textvariable=self.zmin_var, width=8).grid(row=26, column=1, padx=5, sticky="w")
+        ttk.Button(left, text="Diagnóstico del brazo...", command=self._abrir_diagnostico).grid(row=27, column=0, columnspan=2, sticky="we", pady=3)
 
         # ==== Centro: imagen del brazo + teleop + lista ====
         center = ttk.Frame(self, padding=10)
@@ -197,11 +597,12 @@ class ArmControlApp(tk.Tk):
         center.columnconfigure(0, weight=1)
         center.rowconfigure(4, weight=1)
 
-        # Canvas de imagen del brazo
+        # Canvas: vista en vivo del brazo (la imagen, si se carga, queda de fondo)
         self.arm_canvas = tk.Canvas(center, width=360, height=360, bg="#f4f4f4",
                                     highlightthickness=1, highlightbackground="#888")
         self.arm_canvas.grid(row=0, column=0, pady=5, sticky="n")
-        self.arm_canvas_text = self.arm_canvas.create_text(180, 180, text="IMAGEN DEL BRAZO", font=("Arial", 14))
+        self.vista = VistaBrazo(self.arm_canvas)
+        self.recorrido_var = tk.IntVar(value=0)
 
         # Teleop toggle + seguridad
         teleop_frame = ttk.Frame(center)
@@ -212,15 +613,40 @@ class ArmControlApp(tk.Tk):
         ttk.Button(teleop_frame, text="HOME", command=self._ir_home).pack(side="left", padx=4)
         ttk.Button(teleop_frame, text="Definir HOME", command=self._definir_home).pack(side="left", padx=4)
         ttk.Button(teleop_frame, text="STOP", command=self._stop_seguro).pack(side="left", padx=4)
+        ttk.Label(teleop_frame, text="Filtro").pack(side="left", padx=(10,2))
+        self.filtro_var = tk.StringVar(value=filtros.ConfigFiltro.modo)
+        ttk.Combobox(teleop_frame, textvariable=self.filtro_var, values=filtros.MODOS,
+                     width=5, state="readonly").pack(side="left")
+        ttk.Label(teleop_frame, text="Banda").pack(side="left", padx=(6,2))
+        self.banda_var = tk.StringVar(value=str(filtros.ConfigFiltro.banda))
+        ttk.Entry(teleop_frame, textvariable=self.banda_var, width=4).pack(side="left")
+
+        rec_frame = ttk.Frame(center)
+        rec_frame.grid(row=1, column=0, sticky="we", pady=(8,0))
+        self.rec_var = tk.IntVar(value=0)
+        ttk.Checkbutton(rec_frame, text="Grabar teleop (REC)", variable=self.rec_var,
+                        command=self._toggle_grabacion).pack(side="left", padx=(0,10))
+        ttk.Label(rec_frame, text="Tolerancia (cuentas)").pack(side="left")
+        self.rec_tol_var = tk.DoubleVar(value=grabacion.DEFAULT_TOL)
+        ttk.Entry(rec_frame, textvariable=self.rec_tol_var, width=6).pack(side="left", padx=4)
+        ttk.Checkbutton(rec_frame, text="Ver recorrido", variable=self.recorrido_var).pack(side="left", padx=(10,0))
 
         ttk.Label(center, text="Posiciones guardadas").grid(row=3, column=0, sticky="w", pady=(10,3))
         list_frame = ttk.Frame(center)
         list_frame.grid(row=4, column=0, sticky="nsew")
-        self.lista = tk.Listbox(list_frame, height=12)
+        self.lista = ListaVirtual(list_frame, self.poses, height=12)
         self.lista.pack(side="left", fill="both", expand=True)
-        sb = ttk.Scrollbar(list_frame, orient="vertical", command=self.lista.yview)
-        sb.pack(side="right", fill="y")
-        self.lista.configure(yscrollcommand=sb.set)
+
+        # Métricas de teleop (tasas, colas y latencias por etapa)
+        stats = ttk.LabelFrame(center, text="Métricas teleop")
+        stats.grid(row=5, column=0, sticky="we", pady=(8,0))
+        self.metricas_var = tk.IntVar(value=0)
+        ttk.Checkbutton(stats, text="Medir latencias", variable=self.metricas_var,
+                        command=self._toggle_metricas).grid(row=0, column=0, sticky="w", padx=4)
+        ttk.Button(stats, text="Reset", command=self._reset_metricas).grid(row=0, column=1, padx=4)
+        ttk.Button(stats, text="Exportar CSV", command=self._exportar_metricas).grid(row=0, column=2, padx=4)
+        self.stats_label = tk.Label(stats, text="", font=("Courier", 9), justify="left", anchor="w")
+        self.stats_label.grid(row=1, column=0, columnspan=3, sticky="we", padx=4, pady=(2,4))
 
         # ==== Derecha: sliders + electroimán + branding ====
         right = ttk.Frame(self, padding=10)
@@ -251,10 +677,25 @@ class ArmControlApp(tk.Tk):
         ttk.Checkbutton(right, text="Enviar en vivo al mover sliders",
                         variable=self.live_var).grid(row=10, column=0, columnspan=2, sticky="w")
 
+        # Ir a un punto cartesiano (cinemática inversa)
+        cart = ttk.LabelFrame(right, text="Ir a X / Y / Z (mm)")
+        cart.grid(row=11, column=0, columnspan=3, sticky="we", pady=(10,0))
+        self.xyz_vars = [tk.StringVar(value=v) for v in ("150", "0", "100")]
+        for i, (lbl, var) in enumerate(zip("XYZ", self.xyz_vars)):
+            ttk.Label(cart, text=lbl).grid(row=0, column=i*2, padx=(4,2))
+            e = ttk.Entry(cart, textvariable=var, width=6)
+            e.grid(row=0, column=i*2+1)
+            e.bind("<Return>", lambda _e: self._ir_a())
+        ttk.Label(cart, text="Cabeceo (°, vacío = libre)").grid(row=1, column=0, columnspan=4, sticky="w", padx=4)
+        self.cabeceo_var = tk.StringVar(value="")
+        ttk.Entry(cart, textvariable=self.cabeceo_var, width=6).grid(row=1, column=5, pady=3)
+        ttk.Button(cart, text="Ir", command=self._ir_a).grid(row=2, column=0, columnspan=3, sticky="we", padx=4, pady=(0,4))
+        ttk.Button(cart, text="Importar XYZ (CSV)", command=self._importar_xyz).grid(row=2, column=3, columnspan=3, sticky="we", padx=4, pady=(0,4))
+
         # ---- Branding (logo fijo + autores) ----
-        ttk.Separator(right).grid(row=11, column=0, columnspan=3, sticky="we", pady=10)
+        ttk.Separator(right).grid(row=12, column=0, columnspan=3, sticky="we", pady=10)
         brand = ttk.LabelFrame(right, text="Proyecto / Autores")
-        brand.grid(row=12, column=0, columnspan=3, sticky="nsew")
+        brand.grid(row=13, column=0, columnspan=3, sticky="nsew")
         brand.columnconfigure(0, weight=1)
 
         # Logo fijo (tk.Label con imagen)
@@ -272,12 +713,33 @@ class ArmControlApp(tk.Tk):
 
     # ---------------- Conexiones ----------------
     def _refrescar_puertos(self):
-        self.port_arm_combo["values"] = self.serial_arm.ports()
-        self.port_mini_combo["values"] = self.serial_mini.ports()
+        """Pide una enumeración al monitor; los combos se actualizan en el tick cuando llega."""
+        self.ctrl.monitor.refrescar()
+
+    def _puertos_tick(self):
+        if self.ctrl.monitor.version != self._puertos_version:
+            self._puertos_version = self.ctrl.monitor.version
+            devs = self.ctrl.monitor.devices()
+            self.port_arm_combo["values"] = devs
+            self.port_mini_combo["values"] = devs
+
+    def _autodetectar(self):
+        self.ctrl.autodetectar(binario=self.bin_var.get() == 1, esperar=False)
+
+    def _sincronizar_conexiones(self):
+        """Botones y puertos según el estado real (puede cambiar por auto-detección o reconexión)."""
+        for client, btn, txt, port_var, baud_var in (
+                (self.serial_arm, self.btn_connect_arm, "brazo", self.port_arm_var, self.baud_arm_var),
+                (self.serial_mini, self.btn_connect_mini, "mini", self.port_mini_var, self.baud_mini_var)):
+            btn.config(text=f"Desconectar {txt}" if client.connected else f"Conectar {txt}")
+            con = self.ctrl.conexion(client)
+            if client.connected and con is not None:
+                port_var.set(con[0])
+                baud_var.set(con[2])
 
     def _toggle_conexion_arm(self):
         if self.serial_arm.connected:
-            self.serial_arm.close()
+            self.ctrl.desconectar_brazo()
             self.btn_connect_arm.config(text="Conectar brazo")
             self._set_status()
             return
@@ -286,7 +748,7 @@ class ArmControlApp(tk.Tk):
             messagebox.showwarning("Serie", "Elegí un puerto del brazo.")
             return
         try:
-            self.serial_arm.connect(port, self.baud_arm_var.get())
+            self.ctrl.conectar_brazo(port, self.baud_arm_var.get(), binario=self.bin_var.get() == 1)
             self.btn_connect_arm.config(text="Desconectar brazo")
             self._set_status()
         except Exception as e:
@@ -294,8 +756,7 @@ class ArmControlApp(tk.Tk):
 
     def _toggle_conexion_mini(self):
         if self.serial_mini.connected:
-            self._stop_telemetry_thread = True
-            self.serial_mini.close()
+            self.ctrl.desconectar_mini()
             self.btn_connect_mini.config(text="Conectar mini")
             self._set_status()
             return
@@ -304,59 +765,110 @@ class ArmControlApp(tk.Tk):
             messagebox.showwarning("Serie", "Elegí un puerto del minibrazo.")
             return
         try:
-            self.serial_mini.connect(port, self.baud_mini_var.get())
+            self.ctrl.conectar_mini(port, self.baud_mini_var.get(), binario=self.bin_var.get() == 1)
             self.btn_connect_mini.config(text="Desconectar mini")
             self._set_status()
-            # arrancar hilo de telemetría
-            self._stop_telemetry_thread = False
-            t = threading.Thread(target=self._telemetry_loop, daemon=True)
-            t.start()
         except Exception as e:
             messagebox.showerror("Serie", f"No se pudo conectar al minibrazo:\n{e}")
 
     # ---------------- Telemetría (POT ...) ----------------
-    def _telemetry_loop(self):
-        """
-        Lee líneas tipo: 'POT m1 m2 m3 m4' desde el minibrazo.
-        Si Teleop está ON, actualiza sliders y reenvía SET al brazo.
-        """
-        while self.serial_mini.connected and not getattr(self, "_stop_telemetry_thread", False):
-            line = self.serial_mini.readline()
-            if not line:
-                continue
-            line = line.strip()
-            if not line:
-                continue
-            parts = line.split()
-            if len(parts) == 5 and parts[0] == "POT":
-                try:
-                    m1, m2, m3, m4 = map(int, parts[1:5])
-                except ValueError:
-                    continue
+    def _sync_flags(self):
+        self.ctrl.teleop = self.teleop_var.get() == 1
+        self.ctrl.mag = int(self.mag_var.get())
 
-                # Actualizar sliders desde telemetría (sin eco)
+    def _aplicar_filtro(self):
+        try:
+            banda = max(0, int(self.banda_var.get()))
+        except ValueError:
+            return   # mientras se escribe
+        self.ctrl.configurar_filtro(filtros.ConfigFiltro(modo=self.filtro_var.get(), banda=banda))
+
+    def _post_status(self, text: Optional[str] = None):
+        """Pedido de refresco de estado desde cualquier hilo (la UI lo aplica en su tick)."""
+        self._status_msg = text
+        self._status_dirty = True
+
+    def _telemetry_tick(self):
+        """Tick de UI a ritmo fijo: aplica sólo la muestra más nueva (coalesce las intermedias)."""
+        try:
+            if self._status_dirty:
+                self._status_dirty = False
+                if self._status_msg:
+                    self._set_status_text(self._status_msg)
+                else:
+                    self._set_status()
+            pose, _ = self.ctrl.playback_slot.take()
+            if pose is not None:
+                self._apply_pose(Posicion(*pose))
+            pot, skipped = self.ctrl.telemetry_slot.take()
+            if pot is not None:
+                self.telemetry_coalesced += skipped
                 self._updating_from_telemetry = True
                 try:
-                    prev_live = self.live_var.get()
-                    self.live_var.set(0)
-
-                    self.sl_vars[0].set(m1); self.sl_vars[1].set(m2)
-                    self.sl_vars[2].set(m3); self.sl_vars[3].set(m4)
                     for i in range(4):
-                        self.value_labels[i].config(text=str(int(self.sl_vars[i].get())))
-                    self.update_idletasks()
-
-                    # Teleop: reenviar al brazo real
-                    if self.teleop_var.get() == 1:
-                        p = self._pos_actual()
-                        p.m1, p.m2, p.m3, p.m4 = m1, m2, m3, m4
-                        self.serial_arm.send_set(p)
-
-                    self.live_var.set(prev_live)
+                        self.sl_vars[i].set(pot[i])
+                        self.value_labels[i].config(text=str(pot[i]))
                 finally:
                     self._updating_from_telemetry = False
+            self.vista.actualizar(self._pos_actual().to_list())
+            self.vista.mostrar_recorrido(self.poses, self.recorrido_var.get() == 1)
+        finally:
+            self.after(TELEMETRY_UI_MS, self._telemetry_tick)
+
+    # ---------------- Métricas ----------------
+    def _toggle_metricas(self):
+        self.ctrl.medir_latencias(self.metricas_var.get() == 1)
+
+    def _reset_metricas(self):
+        for b in self.ctrl.brazos:
+            b.metricas.reset()
 
-        return
+    def _abrir_brazos(self):
+        if self._ventana_brazos is not None and self._ventana_brazos.winfo_exists():
+            self._ventana_brazos.lift()
+            return
+        self._ventana_brazos = VentanaBrazos(self)
+
+    def _abrir_diagnostico(self):
+        if self._ventana_diag is not None and self._ventana_diag.winfo_exists():
+            self._ventana_diag.lift()
+            return
+        self._ventana_diag = VentanaDiagnostico(self)
+
+    def _metricas_tick(self):
+        try:
+            self._puertos_tick()
+            arm = self.serial_arm.stats()
+            mini = self.serial_mini.stats()
+            rx = self._tasas["mini_rx"].update(mini["received"])
+            tx = self._tasas["arm_tx"].update(arm["sent"])
+            lineas = [
+                f"mini RX {rx:6.1f}/s  perdidas {mini['lost']}  crc {mini['crc_errors']}",
+                f"brazo TX {tx:5.1f}/s  cola {arm['queue']}  coalesc {arm['coalesced']}  "
+                f"desc {arm['dropped']}  err {arm['errors']}",
+            ]
+            if self.metricas.activo or self.metricas.muestras:
+                lineas.append(f"{'etapa':<10}{'n':>7}{'p50':>8}{'p95':>8}{'p99':>8}{'máx':>8} ms")
+                for etapa, n, p50, p95, p99, mx in self.metricas.resumen():
+                    lineas.append(f"{etapa:<10}{n:>7}{p50:>8.2f}{p95:>8.2f}{p99:>8.2f}{mx:>8.2f}")
+            for b, st, (n, p50, p95, _mx) in self.ctrl.estadisticas()[1:]:
+                lat = f"  total p50 {p50:.2f} p95 {p95:.2f} ms" if n else ""
+                lineas.append(f"{b.nombre}: SET {st['sent']}  coalesc {st['coalesced']}  "
+                              f"desc {st['dropped']}  err {st['errors']}{lat}")
+            self.stats_label.config(text="\n".join(lineas))
+        finally:
+            self.after(STATS_UI_MS, self._metricas_tick)
+
+    def _exportar_metricas(self):
+        if not self.metricas.raw:
+            self._set_status_text("No hay muestras medidas para exportar.")
+            return
+        path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV","*.csv")],
+                                            initialfile="latencias.csv")
+        if not path:
+            return
+        n = self.metricas.exportar_csv(path)
+        self._set_status_text(f"Exportadas {n} muestras: {path}")
 
     # ---------------- Handlers UI ----------------
     def _on_slider(self, idx: int):
@@ -369,7 +881,7 @@ class ArmControlApp(tk.Tk):
 
     def _on_change_send(self):
         p = self._pos_actual()
-        self.serial_arm.send_immediate(p.m1, p.m2, p.m3, p.m4, p.mag)
+        self.ctrl.enviar_pose(p.m1, p.m2, p.m3, p.m4, p.mag)
 
     def _pos_actual(self) -> Posicion:
         return Posicion(
@@ -382,74 +894,230 @@ class ArmControlApp(tk.Tk):
 
     def _grabar_posicion(self):
         p = self._pos_actual()
-        self.lista.insert(tk.END, f"{p.m1},{p.m2},{p.m3},{p.m4}, MAG={p.mag}")
+        self.poses.append(p.to_list())
+        self.lista.see(len(self.poses) - 1)
         self._set_status_text("Posición grabada.")
 
     def _borrar_posicion(self):
-        sel = self.lista.curselection()
-        if not sel:
+        sel = self.lista.selected
+        if sel is None:
             self._set_status_text("Elegí una posición para borrar.")
             return
-        self.lista.delete(sel[0])
+        self.poses.delete(sel)
+        self.lista.refresh()
         self._set_status_text("Posición borrada.")
 
-    def _leer_lista(self) -> List[Posicion]:
-        out = []
-        for i in range(self.lista.size()):
-            txt = self.lista.get(i)
-            parts = txt.replace(" MAG=", ",").split(",")
-            if len(parts) >= 5:
-                out.append(Posicion.from_list(parts[:5]))
-        return out
+    def _limites(self) -> trayectoria.Limites:
+        return parse_limites(self.vmax_var.get())
 
     def _ejecutar_movimientos(self):
-        if self.ejecutando:
+        if self.ctrl.ejecutando:
             self._set_status_text("Ya se está ejecutando.")
             return
-        secuencia = self._leer_lista()
-        if not secuencia:
+        if not len(self.poses):
             self._set_status_text("No hay posiciones guardadas.")
             return
+        try:
+            limites = self._limites()
+        except ValueError as e:
+            messagebox.showwarning("Secuencia", str(e))
+            return
+        if not self._aplicar_reglas():
+            return
         delay_ms = max(0, int(self.delay_var.get()))
-        self.ejecutando = True
-        t = threading.Thread(target=self._run_sequence, args=(secuencia, delay_ms), daemon=True)
-        t.start()
+        validar = True
+        while True:
+            try:
+                if self.confirmado_var.get():
+                    # avanza con el ACK de llegada de cada pose; el delay queda sólo en los cambios de imán
+                    self.ctrl.ejecutar_confirmado(hold_s=delay_ms / 1000.0, inicio=self._pos_actual().to_list(),
+                                                  validar=validar)
+                    self._set_status_text(f"Ejecutando {len(self.poses)} poses con confirmación de llegada...")
+                    return
+                tray = self.ctrl.ejecutar(limites=limites, hold_s=delay_ms / 1000.0,
+                                          inicio=self._pos_actual().to_list(), validar=validar)
+                break
+            except validador.SecuenciaInvalida as e:
+                self._marcar_invalidas(e.informe)
+                if not self._ejecutar_igual(e):
+                    return
+                validar = False
+            except RuntimeError as e:
+                messagebox.showwarning("Secuencia", str(e))
+                return
+        extra = ", pausas sólo en el electroimán" if self.ctrl.optimizada else ""
+        self._set_status_text(f"Ejecutando secuencia ({tray.duracion:.2f} s planificados{extra})...")
+
+    def _aplicar_reglas(self) -> bool:
+        """Pasa al controlador la envolvente elegida en el panel (False si el valor no es un número)."""
+        env = None
+        if self.env_var.get():
+            try:
+                env = validador.Envolvente(z_min=float(self.zmin_var.get().replace(",", ".")))
+            except ValueError:
+                messagebox.showwarning("Envolvente", "z mín tiene que ser un número (mm).")
+                return False
+        self.ctrl.reglas = dataclasses.replace(self.ctrl.reglas, envolvente=env)
+        return True
+
+    def _ejecutar_igual(self, e: validador.SecuenciaInvalida) -> bool:
+        """La validación falló: el usuario decide si corre igual (las poses quedan marcadas en la lista)."""
+        return messagebox.askyesno("Secuencia", f"Hay poses con problemas:\n\n{e}\n\n"
+                                   "¿Ejecutar igual?", icon="warning", default="no")
+
+    def _validar_lista(self):
+        """Revisa toda la lista (límites, saltos y envolvente) y marca las poses con problemas."""
+        if not len(self.poses):
+            self._set_status_text("No hay posiciones guardadas.")
+            return
+        if not self._aplicar_reglas():
+            return
+        informe = self.ctrl.validar(inicio=self._pos_actual().to_list())
+        self._marcar_invalidas(informe)
+        self._set_status_text(informe.texto(max_items=2))
+
+    def _marcar_invalidas(self, informe: validador.Informe):
+        self.lista.marcar(informe.problemas)
+        if informe.problemas:
+            self.lista.see(min(informe.problemas))
+
+    def _optimizar(self):
+        """Quita poses redundantes y deja la pausa sólo donde cambia el electroimán."""
+        if self.ctrl.ejecutando:
+            self._set_status_text("Ya se está ejecutando.")
+            return
+        if not len(self.poses):
+            self._set_status_text("No hay posiciones guardadas.")
+            return
+        try:
+            limites = self._limites()
+        except ValueError as e:
+            messagebox.showwarning("Optimizar", str(e))
+            return
+        hold_s = max(0, int(self.delay_var.get())) / 1000.0
+        inicio = self._pos_actual().to_list()
+        res = self.ctrl.optimizar(limites, hold_s, inicio=inicio, aplicar=False)
+        if not messagebox.askyesno("Optimizar", res.texto() + "\n\nLa pausa se hará sólo al cambiar el "
+                                   "electroimán. ¿Reemplazar la lista?"):
+            return
+        self.ctrl.optimizar(limites, hold_s, inicio=inicio)
+        self.lista.refresh()
+        self._set_status_text(res.texto())
 
-    def _run_sequence(self, secuencia: List[Posicion], delay_ms: int):
+    def _ejecutar_archivo(self):
+        """Reproduce un .brz directo desde disco (mmap), sin cargarlo en la lista."""
+        if self.ctrl.ejecutando:
+            self._set_status_text("Ya se está ejecutando.")
+            return
+        path = filedialog.askopenfilename(filetypes=[("Secuencia binaria", "*.brz")])
+        if not path:
+            return
+        if not self._aplicar_reglas():
+            return
+        delay_ms = max(0, int(self.delay_var.get()))
+        validar = True
+        while True:
+            try:
+                n = self.ctrl.ejecutar_archivo(path, self._limites(), hold_s=delay_ms / 1000.0,
+                                               inicio=self._pos_actual().to_list(), validar=validar)
+                break
+            except validador.SecuenciaInvalida as e:
+                if not self._ejecutar_igual(e):
+                    return
+                validar = False
+            except (ValueError, OSError) as e:
+                messagebox.showerror("Secuencia", f"No se pudo abrir:\n{e}")
+                return
+        self._set_status_text(f"Ejecutando {os.path.basename(path)} ({n} poses)...")
+
+    def _toggle_grabacion(self):
+        if self.rec_var.get():
+            if self._simplificando is not None:
+                self.rec_var.set(0)
+                self._set_status_text("Esperá a que termine de simplificarse la grabación anterior.")
+                return
+            try:
+                self.ctrl.iniciar_grabacion()
+            except RuntimeError as e:
+                self.rec_var.set(0)
+                self._set_status_text(str(e))
+                return
+            self._set_status_text("Grabando teleop...")
+            return
         try:
-            for p in secuencia:
-                self._updating_from_telemetry = True
-                self.sl_vars[0].set(p.m1); self.sl_vars[1].set(p.m2)
-                self.sl_vars[2].set(p.m3); self.sl_vars[3].set(p.m4)
-                self.mag_var.set(p.mag)
-                for i in range(4):
-                    self.value_labels[i].config(text=str(int(self.sl_vars[i].get())))
-                self.update_idletasks()
-                self._updating_from_telemetry = False
-
-                self.serial_arm.send_set(p)
-                time.sleep(delay_ms / 1000.0)
-            self._set_status_text("Secuencia finalizada.")
+            tol = max(0.0, float(self.rec_tol_var.get()))
+        except (tk.TclError, ValueError):
+            tol = grabacion.DEFAULT_TOL
+        # RDP sobre toda la toma en otro hilo; las claves se agregan en _grabacion_tick
+        self._simplificando = (self.ctrl.detener_grabacion_en_hilo(tol), self.ctrl.recorder.overwritten)
+        self._set_status_text(f"Simplificando {len(self.ctrl.recorder)} muestras...")
+        self.after(GRABACION_UI_MS, self._grabacion_tick)
+
+    def _grabacion_tick(self):
+        fut, perdidas = self._simplificando
+        if not fut.done():
+            self.after(GRABACION_UI_MS, self._grabacion_tick)
+            return
+        self._simplificando = None
+        try:
+            muestras, claves = fut.result()
         except Exception as e:
-            self._set_status_text(f"Error durante la ejecución: {e}")
-        finally:
-            self.ejecutando = False
+            self._set_status_text(f"No se pudo simplificar la grabación: {e}")
+            return
+        if not muestras:
+            self._set_status_text("Grabación vacía.")
+            return
+        self.poses.extend(claves)
+        self.lista.see(len(self.poses) - 1)
+        extra = f" ({perdidas} más viejas descartadas)" if perdidas else ""
+        self._set_status_text(f"Grabación: {len(muestras)} muestras -> {len(claves)} poses clave{extra}.")
+
+    # ---- Cartesiano ----
+    def _ir_a(self):
+        try:
+            x, y, z = (float(v.get()) for v in self.xyz_vars)
+            cab = self.cabeceo_var.get().strip()
+            cabeceo = math.radians(float(cab)) if cab else None
+        except ValueError:
+            self._set_status_text("X / Y / Z / cabeceo: tienen que ser números.")
+            return
+        self._sync_flags()
+        try:
+            pose = self.ctrl.ir_a(x, y, z, cabeceo)
+        except cinematica_inversa.FueraDeAlcance as e:
+            self._set_status_text(str(e))
+            return
+        self._apply_pose(Posicion(*pose))
+        self._set_status_text(f"Ir a ({x:.0f}, {y:.0f}, {z:.0f}) -> {pose[:4]}")
+
+    def _importar_xyz(self):
+        path = filedialog.askopenfilename(filetypes=[("Puntos XYZ", "*.csv *.txt")])
+        if not path:
+            return
+        try:
+            poses = self.ctrl.importar_xyz(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Importar XYZ", f"No se pudo convertir:\n{e}")
+            return
+        self.lista.see(len(self.poses) - 1)
+        self._set_status_text(f"Importados {len(poses)} puntos XYZ como poses.")
 
     # ---- HOME / STOP ----
     def _ir_home(self):
         self.teleop_var.set(0)
-        self._apply_pose(self.home)
-        self.serial_arm.send_set(self.home)
+        self._apply_pose(Posicion(*self.ctrl.home))
+        self.ctrl.ir_home()
         self._set_status_text("HOME enviado.")
 
     def _definir_home(self):
-        self.home = self._pos_actual()
-        self._set_status_text(f"HOME definido: {self.home.m1},{self.home.m2},{self.home.m3},{self.home.m4}, MAG={self.home.mag}")
+        self.ctrl.home = tuple(self._pos_actual().to_list())
+        m1, m2, m3, m4, mag = self.ctrl.home
+        self._set_status_text(f"HOME definido: {m1},{m2},{m3},{m4}, MAG={mag}")
 
     def _stop_seguro(self):
         self.teleop_var.set(0)
-        self._apply_pose(self.home)
-        self.serial_arm.send_set(self.home)
+        self.ctrl.stop()
+        self._apply_pose(Posicion(*self.ctrl.home))
         self._set_status_text("STOP: teleop OFF y HOME enviado.")
 
     def _apply_pose(self, p: Posicion):
@@ -466,31 +1134,29 @@ class ArmControlApp(tk.Tk):
 
     # ---- Guardar / Cargar ----
     def _guardar_json(self):
-        data = [p.to_list() for p in self._leer_lista()]
-        if not data:
+        if not len(self.poses):
             self._set_status_text("No hay posiciones para guardar.")
             return
-        path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON","*.json")], initialfile="posiciones.json")
+        path = filedialog.asksaveasfilename(defaultextension=".json",
+                                            filetypes=[("JSON","*.json"), ("Secuencia binaria","*.brz")],
+                                            initialfile="posiciones.json")
         if not path:
             return
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        self.ctrl.guardar(path)
         self._set_status_text(f"Guardado: {path}")
 
     def _cargar_json(self):
-        path = filedialog.askopenfilename(filetypes=[("JSON","*.json")])
+        path = filedialog.askopenfilename(filetypes=[("JSON / BRZ","*.json *.brz"), ("JSON","*.json"), ("Secuencia binaria","*.brz")])
         if not path:
             return
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            self.lista.delete(0, tk.END)
-            for lst in data:
-                p = Posicion.from_list(lst)
-                self.lista.insert(tk.END, f"{p.m1},{p.m2},{p.m3},{p.m4}, MAG={p.mag}")
-            self._set_status_text(f"Cargado: {path}")
+            n = self.ctrl.cargar(path)
+            self.lista.selected = None
+            self.lista.first = 0
+            self.lista.refresh()
+            self._set_status_text(f"Cargado: {path} ({n} poses)")
         except Exception as e:
-            messagebox.showerror("JSON", f"No se pudo cargar:\n{e}")
+            messagebox.showerror("Cargar lista", f"No se pudo cargar:\n{e}")
 
     # ---- Branding / Imágenes ----
     def _refrescar_autores_ui(self):
@@ -500,18 +1166,8 @@ class ArmControlApp(tk.Tk):
         for i, name in enumerate(self.authors, start=1):
             ttk.Label(self._authors_frame, text=f"• {name}").grid(row=i, column=0, sticky="w")
 
-    def _cargar_logo(self, path: str, max_w: int = 260, max_h: int = 120):
-        try:
-            if PIL_AVAILABLE:
-                img = Image.open(path)
-                img.thumbnail((max_w, max_h), Image.LANCZOS)
-                self._logo_tk = ImageTk.PhotoImage(img)
-            else:
-                self._logo_tk = tk.PhotoImage(file=path)
-            self._logo_label.configure(image=self._logo_tk)
-            self._logo_label.image = self._logo_tk  # evitar GC
-        except Exception as e:
-            messagebox.showerror("Logo", f"No se pudo cargar la imagen:\n{e}")
+    def _cargar_logo(self, path: str, max_w: int = 260, max_h: int = 120, avisar: bool = True):
+        self._pedir_imagen("logo", path, max_w, max_h, avisar)
 
     def _cargar_brazo_dialog(self):
         path = filedialog.askopenfilename(filetypes=[('Imágenes','*.png;*.jpg;*.jpeg;*.gif;*.bmp')])
@@ -520,34 +1176,79 @@ class ArmControlApp(tk.Tk):
         self.arm_img_path = path
         self._cargar_brazo(path)
 
-    def _cargar_brazo(self, path: str, max_w: int = 360, max_h: int = 360):
-        """Carga la imagen del brazo y la dibuja centrada en el canvas."""
+    def _cargar_brazo(self, path: str, max_w: int = 360, max_h: int = 360, avisar: bool = True):
+        """Pide la imagen del brazo; se dibuja centrada en el canvas cuando está lista."""
+        self._pedir_imagen("brazo", path, max_w, max_h, avisar)
+
+    def _pedir_imagen(self, clave: str, path: str, max_w: int, max_h: int, avisar: bool):
+        """Decodificar y reescalar va al hilo de recursos; acá sólo se crea el PhotoImage."""
+        self._avisar_imagen[clave] = avisar
+        sondeando = self.recursos.pendientes > 0
+        self.recursos.pedir(clave, path, max_w, max_h)
+        if not sondeando:
+            self.after(RECURSOS_UI_MS, self._recursos_tick)
+
+    def _recursos_tick(self):
+        for img in self.recursos.listos():
+            self._mostrar_imagen(img)
+        if self.recursos.pendientes:
+            self.after(RECURSOS_UI_MS, self._recursos_tick)
+
+    def _mostrar_imagen(self, img: recursos.Imagen):
+        titulo = "Logo" if img.clave == "logo" else "Imagen del brazo"
         try:
-            if PIL_AVAILABLE:
-                img = Image.open(path)
-                img.thumbnail((max_w, max_h), Image.LANCZOS)
-                self._arm_img_tk = ImageTk.PhotoImage(img)
+            if img.error is not None:
+                raise img.error
+            if img.png is not None:
+                foto = tk.PhotoImage(data=base64.b64encode(img.png).decode("ascii"))
             else:
-                self._arm_img_tk = tk.PhotoImage(file=path)
-
-            self.arm_canvas.delete("all")
-            self.arm_canvas.create_image(max_w // 2, max_h // 2, image=self._arm_img_tk)
-            self.arm_canvas.image = self._arm_img_tk  # evitar GC
+                # sin Pillow ni caché: el original, achicado por un factor entero si no entra
+                foto = tk.PhotoImage(file=img.path)
+                k = max(1, -(-foto.width() // img.ancho), -(-foto.height() // img.alto))
+                if k > 1:
+                    foto = foto.subsample(k)
         except Exception as e:
-            messagebox.showerror("Imagen del brazo", f"No se pudo cargar '{path}':\n{e}")
+            if self._avisar_imagen.get(img.clave, True):
+                messagebox.showerror(titulo, f"No se pudo cargar '{img.path}':\n{e}")
+            return
+        if img.clave == "logo":
+            self._logo_tk = foto
+            self._logo_label.configure(image=self._logo_tk)
+            self._logo_label.image = self._logo_tk  # evitar GC
+        else:
+            self._arm_img_tk = foto
+            self.arm_canvas.delete("fondo")
+            self.arm_canvas.create_image(img.ancho // 2, img.alto // 2, image=self._arm_img_tk, tags="fondo")
+            self.arm_canvas.tag_lower("fondo")  # la vista en vivo queda encima
+            self.arm_canvas.image = self._arm_img_tk  # evitar GC
+
+    def _cerrar(self):
+        """Cerrar la ventana: cortar lo que esté corriendo, soltar los puertos y volcar la bitácora."""
+        try:
+            self.ctrl.close()
+        finally:
+            self.destroy()
 
     # ---- Estado ----
     def _set_status(self):
-        arm = "conectado" if self.serial_arm.connected else "desconectado"
-        mini = "conectado" if self.serial_mini.connected else "desconectado"
-        self.status.config(text=f"Brazo: {arm} | Mini: {mini}")
+        self._sincronizar_conexiones()
+        self.status.config(text=self.ctrl.resumen_estado())
 
     def _set_status_text(self, text: str):
-        arm = "conectado" if self.serial_arm.connected else "desconectado"
-        mini = "conectado" if self.serial_mini.connected else "desconectado"
-        self.status.config(text=f"{text}  |  Brazo: {arm} | Mini: {mini}")
+        self._sincronizar_conexiones()
+        self.status.config(text=f"{text}  |  {self.ctrl.resumen_estado()}")
 
 
 if __name__ == "__main__":
-    app = ArmControlApp()
-    app.mainloop()
+    if "--async" in sys.argv[1:]:
+        # Puertos, teleop y secuencias como tareas asyncio en un único hilo aparte de Tk
+        # (así un diálogo modal no frena la E/S)
+        from motor_async import MotorAsync
+        motor = MotorAsync()
+        motor.start()
+        app = ArmControlApp(motor)
+        app.mainloop()
+        motor.stop()
+    else:
+        app = ArmControlApp()
+        app.mainloop()
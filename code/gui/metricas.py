@@ -0,0 +1,129 @@
+"""
+Instrumentación de latencia del camino teleop (minibrazo -> PC -> brazo).
+
+Cada muestra POT lleva una lista de timestamps monotónicos que se va completando:
+    [t_lectura, t_parseo, t_reenvio, t_escritura]
+  - t_lectura:   pyserial devolvió los bytes (lo que tarda el USB/Bluetooth antes no se ve)
+  - t_parseo:    la trama/línea quedó decodificada
+  - t_reenvio:   el hilo lector encoló el SET para el brazo
+  - t_escritura: el hilo escritor del brazo terminó ser.write()
+Si el SET se coalesce (llegó uno más nuevo antes de salir) la muestra se cierra sin
+t_escritura y cuenta como coalescida.
+
+Las latencias van a histogramas de buckets fijos (sumar es O(1), sin listas que crezcan);
+opcionalmente se guardan las filas crudas en un anillo para exportar a CSV.
+Con `activo = False` el hilo lector no crea timestamps y el costo es un if por muestra.
+"""
+import csv
+import math
+import threading
+import time
+from array import array
+from collections import deque
+from typing import Dict, List, Optional
+
+BUCKET_MS = 0.05        # resolución del histograma
+MAX_MS = 250.0          # todo lo que supere esto cae en el último bucket
+RAW_MAX = 200_000       # filas crudas retenidas para CSV (~1 h a 66 Hz)
+
+ETAPAS = ("parseo", "reenvio", "escritura", "total")
+
+
+class Histograma:
+    def __init__(self, bucket_ms: float = BUCKET_MS, max_ms: float = MAX_MS):
+        self.bucket_ms = bucket_ms
+        self.buckets = array("L", bytes(array("L").itemsize * (int(max_ms / bucket_ms) + 1)))
+        self.n = 0
+        self.max_ms = 0.0
+
+    def add(self, ms: float):
+        i = int(ms / self.bucket_ms)
+        if i >= len(self.buckets):
+            i = len(self.buckets) - 1
+        elif i < 0:
+            i = 0
+        self.buckets[i] += 1
+        self.n += 1
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentil(self, q: float) -> float:
+        if not self.n:
+            return 0.0
+        objetivo = q * self.n
+        acc = 0
+        for i, c in enumerate(self.buckets):
+            acc += c
+            if acc >= objetivo:
+                return (i + 0.5) * self.bucket_ms
+        return self.max_ms
+
+    def reset(self):
+        self.buckets = array("L", bytes(len(self.buckets) * self.buckets.itemsize))
+        self.n = 0
+        self.max_ms = 0.0
+
+
+class Metricas:
+    def __init__(self, raw_max: int = RAW_MAX):
+        self.activo = False
+        self.hist: Dict[str, Histograma] = {e: Histograma() for e in ETAPAS}
+        self.raw = deque(maxlen=raw_max)
+        self.muestras = 0
+        self.coalescidas = 0
+        self._lock = threading.Lock()
+
+    def nueva(self, t_lectura: float, t_parseo: float) -> list:
+        return [t_lectura, t_parseo, math.nan, math.nan]
+
+    def cerrar(self, meta: list, escrita: bool = True):
+        """Lo llama el escritor (o el lector si no hubo reenvío) cuando la muestra terminó su camino."""
+        t_l, t_p, t_r, t_w = meta
+        with self._lock:
+            self.muestras += 1
+            self.hist["parseo"].add((t_p - t_l) * 1000.0)
+            if not math.isnan(t_r):
+                self.hist["reenvio"].add((t_r - t_p) * 1000.0)
+                if escrita and not math.isnan(t_w):
+                    self.hist["escritura"].add((t_w - t_r) * 1000.0)
+                    self.hist["total"].add((t_w - t_l) * 1000.0)
+                else:
+                    self.coalescidas += 1
+        self.raw.append(tuple(meta))
+
+    def reset(self):
+        with self._lock:
+            for h in self.hist.values():
+                h.reset()
+            self.raw.clear()
+            self.muestras = 0
+            self.coalescidas = 0
+
+    def resumen(self) -> List[tuple]:
+        """[(etapa, n, p50, p95, p99, max)] en ms."""
+        with self._lock:
+            return [(e, h.n, h.percentil(0.50), h.percentil(0.95), h.percentil(0.99), h.max_ms)
+                    for e, h in self.hist.items()]
+
+    def exportar_csv(self, path: str) -> int:
+        filas = list(self.raw)
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(["t_lectura_s", "t_parseo_s", "t_reenvio_s", "t_escritura_s"])
+            for fila in filas:
+                w.writerow(["" if math.isnan(t) else f"{t:.6f}" for t in fila])
+        return len(filas)
+
+
+class Tasa:
+    """Mensajes por segundo a partir de un contador que sólo crece."""
+    def __init__(self):
+        self._last: Optional[tuple] = None
+        self.valor = 0.0
+
+    def update(self, contador: int, ahora: Optional[float] = None) -> float:
+        ahora = time.monotonic() if ahora is None else ahora
+        if self._last is not None and ahora > self._last[1]:
+            self.valor = (contador - self._last[0]) / (ahora - self._last[1])
+        self._last = (contador, ahora)
+        return self.valor
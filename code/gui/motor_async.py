@@ -0,0 +1,247 @@
+"""
+Motor de E/S con asyncio (opcional): todos los puertos y trabajos en un solo hilo.
+
+En el modo normal cada SerialClient tiene su hilo escritor, el minibrazo un hilo
+lector que se despierta cada 0.1 s aunque no llegue nada, y cada secuencia su hilo.
+Con MotorAsync:
+  - escritura: una tarea por puerto que vacía la cola del SerialClient (la misma
+    lógica de coalescencia y límite de tasa, ver SerialClient._sacar) y duerme en un
+    asyncio.Event hasta que alguien encola;
+  - lectura: loop.add_reader sobre el descriptor del puerto; el bucle sólo se
+    despierta cuando hay bytes. Si el puerto no tiene descriptor (Windows, puertos
+    simulados) se lee con un hilo del executor, bloqueando en ser.read como antes;
+  - secuencias y teleop: tareas cancelables (trayectoria.reproducir_async).
+
+start() corre el bucle en un hilo propio, tanto en la CLI como en la GUI (que sigue
+con el mainloop de Tk). No se bombea Tk desde el bucle: un diálogo modal (messagebox,
+filedialog) abre su propio bucle de Tk y, si el motor dependiera de root.update(),
+pararía la lectura, el teleop y la secuencia en curso mientras esté abierto.
+En Windows asyncio.sleep tiene la resolución del timer del sistema (~15 ms), así que
+el jitter de reproducción es peor que con hilos.
+"""
+import asyncio
+import concurrent.futures
+import threading
+import time
+from typing import Callable, Coroutine, Dict, Optional
+
+import protocolo
+
+
+class _Lector:
+    """Lectura de un puerto: fuente = descriptor vigilado o tarea; q = a quién entregar (None: a nadie)."""
+    __slots__ = ("fuente", "q")
+
+    def __init__(self):
+        self.fuente = None
+        self.q: Optional[asyncio.Queue] = None
+
+
+class MotorAsync:
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread: Optional[threading.Thread] = None
+        self._loop_tid: Optional[int] = None
+        self._escritores: Dict[object, tuple] = {}   # client -> (Event, Task)
+        self._lectores: Dict[object, _Lector] = {}
+
+    # ---------------- Ciclo de vida ----------------
+    def start(self):
+        """Corre el bucle en un hilo propio; vuelve cuando ya está corriendo."""
+        if self._thread is not None:
+            return
+        listo = threading.Event()
+        self.loop.call_soon_threadsafe(listo.set)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        listo.wait(1.0)
+
+    def _run(self):
+        self._loop_tid = threading.get_ident()
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def stop(self):
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self._thread = None
+
+    def call(self, coro: Coroutine) -> concurrent.futures.Future:
+        """Agenda una corrutina en el bucle desde cualquier hilo; future.cancel() cancela la tarea."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def _en_loop(self, fn: Callable[[], None]):
+        """Corre fn en el hilo del bucle y espera a que termine (o directo si es este hilo)."""
+        if not self.loop.is_running() or threading.get_ident() == self._loop_tid:
+            fn()
+            return
+        hecho = threading.Event()
+
+        def envolver():
+            try:
+                fn()
+            finally:
+                hecho.set()
+        self.loop.call_soon_threadsafe(envolver)
+        hecho.wait(1.0)
+
+    # ---------------- Escritura ----------------
+    def agregar(self, client):
+        """Lo llama SerialClient.attach: arranca la tarea escritora del puerto."""
+        def crear():
+            ev = asyncio.Event()
+            self._escritores[client] = (ev, self.loop.create_task(self._escritor(client, ev)))
+        self._en_loop(crear)
+
+    def quitar(self, client):
+        """Lo llama SerialClient.close antes de cerrar el puerto."""
+        def borrar():
+            self._cerrar_lector(client)
+            ev_task = self._escritores.pop(client, None)
+            if ev_task is not None:
+                ev_task[1].cancel()
+        self._en_loop(borrar)
+
+    def despertar(self, client):
+        ev_task = self._escritores.get(client)
+        if ev_task is not None:
+            self.loop.call_soon_threadsafe(ev_task[0].set)
+
+    async def _escritor(self, client, ev: asyncio.Event):
+        while True:
+            with client._cond:
+                item = client._sacar(time.monotonic()) if client._writer_run else None
+                if item is None or not isinstance(item, tuple):
+                    ev.clear()   # bajo el lock: un aviso posterior no se pierde
+            if isinstance(item, tuple):
+                client._escribir(*item)
+                continue
+            if item is None:
+                await ev.wait()
+            else:
+                try:
+                    await asyncio.wait_for(ev.wait(), item)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def vaciar(self, client, timeout: float = 1.0) -> bool:
+        """flush() para usar dentro del bucle (flush() bloquearía al propio escritor)."""
+        deadline = time.monotonic() + timeout
+        while client.pendiente:
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.001)
+        return True
+
+    # ---------------- Lectura ----------------
+    def _escuchar(self, client) -> asyncio.Queue:
+        """Lo recibido de client va a una cola (llamar desde el bucle). Un solo lector por puerto."""
+        lec = self._lectores.get(client)
+        if lec is None:
+            lec = self._lectores[client] = _Lector()
+            try:
+                fd = client.ser.fileno()
+                self.loop.add_reader(fd, self._legible, client, lec)
+                lec.fuente = fd
+            except (AttributeError, NotImplementedError, OSError, ValueError):
+                lec.fuente = self.loop.create_task(self._lector_bloqueante(client, lec))
+        if lec.q is None:
+            lec.q = asyncio.Queue()
+        return lec.q
+
+    def _no_escuchar(self, client):
+        """
+        Nadie más espera mensajes de client: se suelta la cola pero el lector sigue. Con
+        el lector del executor cancelar no frena el ser.read en curso, que se llevaría
+        bytes del puerto; así todo sigue pasando por decodificar() y no hay dos lecturas.
+        """
+        lec = self._lectores.get(client)
+        if lec is not None:
+            lec.q = None
+
+    def _cerrar_lector(self, client):
+        """El puerto se cierra (o se cayó): el lector termina."""
+        lec = self._lectores.pop(client, None)
+        if lec is None:
+            return
+        if isinstance(lec.fuente, int):
+            self.loop.remove_reader(lec.fuente)
+        elif lec.fuente is not None:
+            lec.fuente.cancel()
+        if lec.q is not None:
+            lec.q.put_nowait(None)
+
+    def _legible(self, client, lec: "_Lector"):
+        try:
+            data = client.ser.read(client.ser.in_waiting or 1)
+        except Exception:
+            self._cerrar_lector(client)   # puerto caído: deja de vigilarlo
+            return
+        msgs = client.decodificar(data)
+        if msgs and lec.q is not None:
+            lec.q.put_nowait(msgs)
+
+    async def _lector_bloqueante(self, client, lec: "_Lector"):
+        while client.connected:
+            try:
+                data = await self.loop.run_in_executor(None, client.ser.read, client.ser.in_waiting or 1)
+            except Exception:
+                break
+            msgs = client.decodificar(data)
+            if msgs and lec.q is not None:
+                lec.q.put_nowait(msgs)
+        if self._lectores.get(client) is lec:
+            self._cerrar_lector(client)
+
+    async def recibir(self, client, timeout: Optional[float] = None) -> Optional[list]:
+        """
+        Espera mensajes de client (Frame / str, como SerialClient.read) y devuelve todos
+        los acumulados. [] si venció el timeout; None si el puerto se cerró.
+        """
+        q = self._escuchar(client)
+        try:
+            msgs = await asyncio.wait_for(q.get(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        if msgs is None:
+            return None
+        while not q.empty():
+            mas = q.get_nowait()
+            if mas is None:
+                break
+            msgs += mas
+        return msgs
+
+    async def negociar(self, client, timeout: float = 2.5, retry: float = 0.25) -> bool:
+        """Versión asyncio de SerialClient.negotiate_binary (con los pedidos de delta y ack incluidos)."""
+        lec = self._lectores.get(client)
+        ya_escuchaba = lec is not None and lec.q is not None
+        try:
+            if not await self._pedir(client, protocolo.PROTO_BIN_REQ, protocolo.PROTO_BIN_OK, timeout, retry):
+                return False
+            client.binary = True
+            if client.usar_delta:
+                client.delta = await self._pedir(client, protocolo.PROTO_DELTA_REQ, protocolo.PROTO_DELTA_OK,
+                                                 0.5, retry)
+            if client.usar_ack:
+                client.ack = await self._pedir(client, protocolo.PROTO_ACK_REQ, protocolo.PROTO_ACK_OK,
+                                               0.5, retry)
+            return True
+        finally:
+            if not ya_escuchaba:
+                self._no_escuchar(client)   # nadie más lee este puerto (p. ej. el brazo)
+
+    async def _pedir(self, client, pedido: str, ok: str, timeout: float, retry: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while client.connected and time.monotonic() < deadline:
+            client.send_line(pedido)
+            fin = min(deadline, time.monotonic() + retry)
+            while time.monotonic() < fin:
+                msgs = await self.recibir(client, fin - time.monotonic())
+                if msgs is None:
+                    return False
+                if any(isinstance(m, str) and m.strip() == ok for m in msgs):
+                    return True
+        return False
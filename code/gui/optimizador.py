@@ -0,0 +1,73 @@
+"""
+Optimización de secuencias antes de reproducirlas.
+
+Las listas hechas con "Grabar posición" o cargadas de JSON suelen tener poses casi
+repetidas y se reproducen con la misma pausa entre todos los pasos, así que el ciclo
+dura mucho más de lo que el brazo puede:
+
+  - fusión: dentro de cada tramo con el electroimán igual se quitan las poses que
+    quedan a menos de `tol` cuentas del camino entre sus vecinas (duplicados y puntos
+    intermedios sobre la misma recta en espacio articular, que sólo agregan frenadas).
+    Los cambios de electroimán quedan intactos (grabacion.simplificar);
+  - pausas: la pausa sólo se hace al llegar a una pose donde cambia el electroimán
+    (para que agarre o suelte); en el resto de los pasos ninguna;
+  - duración: cada paso dura lo mínimo que permiten vmax/amax por motor (el perfil
+    trapezoidal de trayectoria.planificar), así que el ciclo predicho es exacto.
+"""
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Union
+
+import grabacion
+import trayectoria
+
+N_JOINTS = 4
+DEFAULT_TOL = 4.0   # cuentas (~0.7°): menos que la zona muerta del firmware
+
+
+@dataclass
+class Resultado:
+    poses: List[tuple]
+    conservadas: List[int]     # índice original de cada pose que quedó
+    pausas: List[float]        # pausa al llegar a cada pose (s)
+    n_antes: int
+    antes_s: float             # ciclo predicho con la lista y la pausa originales
+    despues_s: float
+
+    def texto(self) -> str:
+        ahorro = 100.0 * (1.0 - self.despues_s / self.antes_s) if self.antes_s > 0 else 0.0
+        return (f"Optimizada: {self.n_antes} -> {len(self.poses)} poses, ciclo "
+                f"{self.antes_s:.2f} s -> {self.despues_s:.2f} s ({ahorro:.0f}% menos)")
+
+
+def pausas(inicio: Sequence[int], poses: Sequence[Sequence[int]], hold_s: float) -> List[float]:
+    """hold_s al llegar a las poses donde cambia el electroimán, 0 en las demás."""
+    mag = int(inicio[N_JOINTS]) if len(inicio) > N_JOINTS else 0
+    out = []
+    for p in poses:
+        m = int(p[N_JOINTS])
+        out.append(hold_s if m != mag else 0.0)
+        mag = m
+    return out
+
+
+def duracion(inicio: Sequence[int], poses: Sequence[Sequence[int]],
+             limites: Optional[trayectoria.Limites] = None,
+             hold_s: Union[float, Sequence[float]] = 0.0) -> float:
+    """Duración del ciclo sin guardar los segmentos (sirve para listas largas)."""
+    fin = 0.0
+    for seg in trayectoria.planificar(inicio, poses, limites, hold_s):
+        fin = seg.t_end
+    return fin
+
+
+def optimizar(inicio: Sequence[int], poses: Sequence[Sequence[int]],
+              limites: Optional[trayectoria.Limites] = None, hold_s: float = 0.0,
+              tol: float = DEFAULT_TOL) -> Resultado:
+    """Fusiona poses redundantes y reparte la pausa sólo en los cambios de electroimán."""
+    poses = [tuple(int(v) for v in p) for p in poses]
+    antes = duracion(inicio, poses, limites, hold_s)
+    idx = grabacion.simplificar(poses, tol) if tol > 0 else list(range(len(poses)))
+    nuevas = [poses[i] for i in idx]
+    p = pausas(inicio, nuevas, hold_s)
+    return Resultado(nuevas, idx, p, len(poses), antes, duracion(inicio, nuevas, limites, p))
+
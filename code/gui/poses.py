@@ -0,0 +1,127 @@
+"""
+Modelo de posiciones guardadas.
+
+PoseStore guarda la secuencia en un único array('H') plano (uint16):
+5 valores por pose -> m1, m2, m3, m4, mag. No hay un objeto Python por pose,
+así que programas grabados de decenas de miles de poses ocupan ~10 bytes cada una.
+append es O(1) amortizado; insert/delete mueven memoria con memmove dentro del array
+(sin recorrer objetos), que para estos tamaños es prácticamente instantáneo.
+"""
+import sys
+from array import array
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Sequence
+
+STRIDE = 5  # m1, m2, m3, m4, mag
+
+
+@dataclass
+class Posicion:
+    m1: int
+    m2: int
+    m3: int
+    m4: int
+    mag: int  # 0/1
+
+    def to_list(self):
+        return [self.m1, self.m2, self.m3, self.m4, self.mag]
+
+    @staticmethod
+    def from_list(lst):
+        return Posicion(int(lst[0]), int(lst[1]), int(lst[2]), int(lst[3]), int(lst[4]))
+
+
+def _check(pose: Sequence[int]) -> tuple:
+    m1, m2, m3, m4, mag = (int(v) for v in pose[:STRIDE])
+    for v in (m1, m2, m3, m4):
+        if not 0 <= v <= 1023:
+            raise ValueError(f"valor fuera de rango 0..1023: {v}")
+    return m1, m2, m3, m4, 1 if mag else 0
+
+
+def revisar_rango(data: array):
+    """
+    Lo mismo que _check para un array ya empaquetado, sin recorrerlo en Python: motores
+    en 0..1023 (ValueError si no; encode_set los enmascararía a otra posición) y mag 0/1.
+    """
+    # byte alto de cada uint16: > 3 es un valor > 1023 (en un motor o en mag)
+    altos = data.tobytes()[1 if sys.byteorder == "little" else 0::2]
+    if altos.translate(None, b"\0\1\2\3"):
+        for j in range(STRIDE - 1):
+            col = data[j::STRIDE]
+            i = next((k for k, v in enumerate(col) if v > 1023), None)
+            if i is not None:
+                raise ValueError(f"pose {i + 1}: valor fuera de rango 0..1023: {col[i]}")
+    mags = data[STRIDE - 1::STRIDE]
+    if mags.count(0) + mags.count(1) != len(mags):
+        data[STRIDE - 1::STRIDE] = array("H", (1 if v else 0 for v in mags))
+
+
+class PoseStore:
+    """Lista de poses respaldada por un array plano de uint16."""
+    def __init__(self, poses: Iterable[Sequence[int]] = ()):
+        self.data = array("H")
+        self.version = 0  # cambia con cada modificación (para invalidar vistas)
+        self.extend(poses)
+
+    def __len__(self) -> int:
+        return len(self.data) // STRIDE
+
+    def __getitem__(self, i: int) -> tuple:
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError(i)
+        k = i * STRIDE
+        return tuple(self.data[k:k + STRIDE])
+
+    def __iter__(self) -> Iterator[tuple]:
+        d = self.data
+        for k in range(0, len(d), STRIDE):
+            yield d[k], d[k + 1], d[k + 2], d[k + 3], d[k + 4]
+
+    def posicion(self, i: int) -> Posicion:
+        return Posicion(*self[i])
+
+    def append(self, pose: Sequence[int]):
+        self.data.extend(_check(pose))
+        self.version += 1
+
+    def extend(self, poses: Iterable[Sequence[int]]):
+        buf = array("H")
+        for p in poses:
+            buf.extend(_check(p))
+        self.data.extend(buf)
+        self.version += 1
+
+    def insert(self, i: int, pose: Sequence[int]):
+        i = max(0, min(i, len(self)))
+        k = i * STRIDE
+        self.data[k:k] = array("H", _check(pose))
+        self.version += 1
+
+    def delete(self, i: int):
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError(i)
+        k = i * STRIDE
+        del self.data[k:k + STRIDE]
+        self.version += 1
+
+    def clear(self):
+        self.data = array("H")
+        self.version += 1
+
+    def replace_data(self, data: array):
+        """Toma un array ya empaquetado (5 uint16 por pose), p. ej. leído de archivo."""
+        if data.typecode != "H" or len(data) % STRIDE:
+            raise ValueError("array de poses inválido")
+        revisar_rango(data)
+        self.data = data
+        self.version += 1
+
+    def as_lists(self) -> List[list]:
+        return [list(p) for p in self]
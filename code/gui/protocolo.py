@@ -0,0 +1,235 @@
+"""
+Codec del protocolo serie PC <-> brazos.
+
+Dos modos conviven en el mismo puerto:
+
+ASCII (siempre disponible):
+    PC -> brazo   "SET m1 m2 m3 m4 mag\\n"
+    mini -> PC    "POT m1 m2 m3 m4\\n"
+
+Binario (opcional, se negocia al conectar con "PROTO BIN\\n" -> "PROTO BIN OK"):
+    Trama fija de FRAME_LEN = 9 bytes
+        [0]    SYNC (0xA5, nunca aparece en texto ASCII)
+        [1]    tipo (nibble alto) | flags (nibble bajo, bit0 = electroimán)
+        [2]    secuencia (0..255, cuenta por emisor)
+        [3..7] 4 canales de 10 bits empaquetados little-endian (c0 | c1<<10 | c2<<20 | c3<<30)
+        [8]    CRC-8 (poly 0x07) de los bytes 1..7
+
+    Delta (PC -> brazo, sólo si el firmware respondió "PROTO DELTA OK"): los canales
+    que cambiaron, con valor absoluto (una trama perdida no desfasa a las siguientes)
+        [0]    SYNC
+        [1]    T_DELTA << 4 | flags
+        [2]    secuencia (la misma cuenta que los SET)
+        [3]    máscara de canales presentes (bit i = canal i)
+        [4..]  los canales presentes, 10 bits cada uno, empaquetados igual que arriba
+        [-1]   CRC-8 de los bytes 1..n-2
+    Largo delta_len(mascara): 5 bytes (sólo electroimán) a 10 (los cuatro canales).
+
+    Movimientos confirmados (sólo si el firmware respondió "PROTO ACK OK"), tramas fijas:
+        T_MOVE  PC -> brazo: pose que va a una cola del firmware, en orden de secuencia
+                (secuencia propia de la corrida; F_NUEVA en la primera vacía la cola).
+        T_ACK   brazo -> PC: seq = la última MOVE aceptada (acumulativo) o, con F_LLEGO,
+                la que alcanzó su objetivo; canal 0 = lugares libres en la cola,
+                canal 1 = tamaño de la cola, canal 2 = 0x100 | seq de la última
+                alcanzada (0 si ninguna; así un F_LLEGO perdido se recupera con el
+                ACK siguiente). Una MOVE fuera de orden o repetida se descarta y se
+                responde con el ACK de la última aceptada (la PC retransmite desde ahí).
+        Un SET o delta vacía la cola (STOP / HOME mandan).
+
+El mismo formato está implementado en robot_arm.ino y mini_brazo.ino.
+"""
+from collections import namedtuple
+from typing import List, Optional
+
+# ---- Constantes ----
+SYNC = 0xA5
+FRAME_LEN = 9
+
+T_SET = 0x1   # PC -> brazo
+T_POT = 0x2   # minibrazo -> PC
+T_DELTA = 0x3  # PC -> brazo, sólo los canales que cambiaron
+T_MOVE = 0x4   # PC -> brazo, pose encolada con confirmación
+T_ACK = 0x5    # brazo -> PC, confirmación de una MOVE
+
+F_MAG = 0x1
+F_NUEVA = 0x2   # MOVE: primera de una corrida
+F_LLEGO = 0x1   # ACK: la MOVE alcanzó su objetivo
+
+PROTO_BIN_REQ = "PROTO BIN\n"
+PROTO_ASCII_REQ = "PROTO ASCII\n"
+PROTO_BIN_OK = "PROTO BIN OK"
+PROTO_DELTA_REQ = "PROTO DELTA\n"
+PROTO_DELTA_OK = "PROTO DELTA OK"
+PROTO_ACK_REQ = "PROTO ACK\n"
+PROTO_ACK_OK = "PROTO ACK OK"
+
+MAX_TEXT = 256  # largo máximo de una línea de texto suelta antes de descartarla
+
+Frame = namedtuple("Frame", "tipo seq canales flags")
+
+
+# ---- CRC-8 (poly 0x07, init 0) ----
+def _crc8_table():
+    table = []
+    for i in range(256):
+        c = i
+        for _ in range(8):
+            c = ((c << 1) ^ 0x07) & 0xFF if c & 0x80 else (c << 1) & 0xFF
+        table.append(c)
+    return bytes(table)
+
+
+_CRC_TABLE = _crc8_table()
+
+
+def crc8(data) -> int:
+    c = 0
+    for b in data:
+        c = _CRC_TABLE[c ^ b]
+    return c
+
+
+# ---- ASCII ----
+def format_set(m1: int, m2: int, m3: int, m4: int, mag: int) -> bytes:
+    return f"SET {m1} {m2} {m3} {m4} {mag}\n".encode("ascii")
+
+
+def parse_pot(line: str) -> Optional[tuple]:
+    """Parsea 'POT m1 m2 m3 m4' -> (m1, m2, m3, m4). Devuelve None si no es una línea POT válida."""
+    parts = line.split()
+    if len(parts) != 5 or parts[0] != "POT":
+        return None
+    try:
+        return tuple(map(int, parts[1:5]))
+    except ValueError:
+        return None
+
+
+# ---- Binario ----
+def encode_frame(tipo: int, seq: int, canales, flags: int = 0) -> bytes:
+    c0, c1, c2, c3 = (int(v) & 0x3FF for v in canales)
+    packed = (c0 | (c1 << 10) | (c2 << 20) | (c3 << 30)).to_bytes(5, "little")
+    body = bytes(((tipo & 0xF) << 4 | (flags & 0xF), seq & 0xFF)) + packed
+    return bytes((SYNC,)) + body + bytes((crc8(body),))
+
+
+def encode_set(seq: int, m1: int, m2: int, m3: int, m4: int, mag: int) -> bytes:
+    return encode_frame(T_SET, seq, (m1, m2, m3, m4), F_MAG if mag else 0)
+
+
+def encode_move(seq: int, pose, nueva: bool = False) -> bytes:
+    """pose = (m1, m2, m3, m4, mag)."""
+    flags = (F_MAG if pose[4] else 0) | (F_NUEVA if nueva else 0)
+    return encode_frame(T_MOVE, seq, pose[:4], flags)
+
+
+def delta_len(mascara: int) -> int:
+    k = bin(mascara & 0xF).count("1")
+    return 5 + (10 * k + 7) // 8
+
+
+def encode_delta(seq: int, pose, mascara: int) -> bytes:
+    """pose = (m1, m2, m3, m4, mag); sólo van los canales de la máscara."""
+    x, k = 0, 0
+    for i in range(4):
+        if mascara >> i & 1:
+            x |= (int(pose[i]) & 0x3FF) << (10 * k)
+            k += 1
+    body = (bytes(((T_DELTA << 4) | (F_MAG if pose[4] else 0), seq & 0xFF, mascara & 0xF))
+            + x.to_bytes((10 * k + 7) // 8, "little"))
+    return bytes((SYNC,)) + body + bytes((crc8(body),))
+
+
+def decode_delta(body) -> Frame:
+    """body = bytes 1..n-2 de una trama delta ya validada; los canales ausentes quedan en None."""
+    mascara = body[2] & 0xF
+    x = int.from_bytes(body[3:], "little")
+    canales = []
+    for i in range(4):
+        if mascara >> i & 1:
+            canales.append(x & 0x3FF)
+            x >>= 10
+        else:
+            canales.append(None)
+    return Frame(T_DELTA, body[1], tuple(canales), body[0] & 0xF)
+
+
+def _largo(buf, i: int, n: int) -> int:
+    """Largo de la trama que empieza en buf[i] (SYNC), o 0 si todavía no se sabe."""
+    if n - i < 2:
+        return 0
+    if buf[i + 1] >> 4 != T_DELTA:
+        return FRAME_LEN
+    if n - i < 4:
+        return 0
+    return delta_len(buf[i + 3])
+
+
+def decode_body(body) -> Frame:
+    """body = bytes 1..7 de una trama ya validada."""
+    x = int.from_bytes(body[2:7], "little")
+    canales = (x & 0x3FF, (x >> 10) & 0x3FF, (x >> 20) & 0x3FF, (x >> 30) & 0x3FF)
+    return Frame(body[0] >> 4, body[1], canales, body[0] & 0xF)
+
+
+class FrameDecoder:
+    """
+    Decodificador incremental para un puerto que puede mezclar tramas binarias
+    con texto (p. ej. la respuesta "PROTO BIN OK" o los mensajes de diagnóstico).
+    feed() devuelve una lista con Frame (tramas válidas) y str (líneas de texto).
+    Una trama con CRC inválido se descarta y se resincroniza en el siguiente SYNC.
+    """
+    def __init__(self):
+        self._buf = bytearray()
+        self._text = bytearray()
+        self._last_seq = {}
+        self.frames = 0
+        self.crc_errors = 0
+        self.lost = 0   # huecos en la secuencia (tramas perdidas en el camino)
+
+    def feed(self, data: bytes) -> List[object]:
+        buf = self._buf
+        buf += data
+        out = []
+        i, n = 0, len(buf)
+        while i < n:
+            if buf[i] == SYNC:
+                largo = _largo(buf, i, n)
+                if largo == 0 or n - i < largo:
+                    break
+                body = buf[i + 1:i + largo - 1]
+                if crc8(body) == buf[i + largo - 1]:
+                    fr = decode_delta(body) if body[0] >> 4 == T_DELTA else decode_body(body)
+                    self._track(fr)
+                    out.append(fr)
+                    i += largo
+                else:
+                    self.crc_errors += 1
+                    i += 1
+                continue
+            # texto: hasta el próximo '\n' o SYNC, lo que venga primero
+            nl = buf.find(b"\n", i)
+            sy = buf.find(bytes((SYNC,)), i)
+            if nl != -1 and (sy == -1 or nl < sy):
+                self._text += buf[i:nl]
+                out.append(self._text.decode("ascii", errors="ignore").strip("\r"))
+                self._text.clear()
+                i = nl + 1
+            else:
+                j = n if sy == -1 else sy
+                self._text += buf[i:j]
+                if len(self._text) > MAX_TEXT:
+                    self._text.clear()
+                i = j
+        del buf[:i]
+        return out
+
+    def _track(self, fr: Frame):
+        self.frames += 1
+        if fr.tipo in (T_MOVE, T_ACK):
+            return   # se retransmiten y se repiten: los huecos no son pérdidas
+        flujo = T_SET if fr.tipo == T_DELTA else fr.tipo   # SET y delta comparten la secuencia
+        last = self._last_seq.get(flujo)
+        if last is not None:
+            self.lost += (fr.seq - last - 1) & 0xFF
+        self._last_seq[flujo] = fr.seq
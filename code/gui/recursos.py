@@ -0,0 +1,131 @@
+"""
+Imágenes de la interfaz (logo, foto del brazo): rutas, miniaturas en caché y carga en segundo plano.
+
+  - rutas relativas al paquete: los recursos viven en code/gui/assets (ruta_asset());
+  - miniatura(): decodifica y reescala con Pillow, importado recién ahí y no al abrir
+    la app, y guarda el PNG chico en BRAZO_CACHE (o ~/.cache/brazo)/miniaturas con un
+    nombre que depende del archivo de origen, su fecha de modificación y tamaño, y la
+    caja pedida. La próxima vez se lee ese PNG (unos KB, sin Pillow); si el origen
+    cambia, la miniatura vieja se reemplaza;
+  - Cargador: un hilo atiende los pedidos y la UI retira los resultados con listos()
+    desde su propio hilo, que es el único que crea el tk.PhotoImage. Sin Pillow ni
+    caché el resultado trae sólo la ruta y la UI carga el original como antes.
+"""
+import glob
+import hashlib
+import io
+import os
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+from typing import List, Optional, Tuple
+
+DIR_ASSETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+LOGO = "utec_logo.png"
+BRAZO = "brazo.png"
+
+# png: bytes de la miniatura, o None si hay que cargar `path` tal cual
+Imagen = namedtuple("Imagen", "clave path ancho alto png cache ms error")
+
+
+def ruta_asset(nombre: str) -> str:
+    return os.path.join(DIR_ASSETS, nombre)
+
+
+def directorio_cache() -> str:
+    base = os.environ.get("BRAZO_CACHE") or os.path.join(os.path.expanduser("~"), ".cache", "brazo")
+    return os.path.join(base, "miniaturas")
+
+
+def _pil():
+    """Pillow sólo cuando hay que reescalar (importarlo es lo más caro del arranque)."""
+    try:
+        from PIL import Image
+    except Exception:
+        return None
+    return Image
+
+
+def _nombres(path: str, max_w: int, max_h: int, st: os.stat_result) -> Tuple[str, str]:
+    """(prefijo común a todas las versiones de ese origen y caja, nombre de esta versión)."""
+    origen = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+    prefijo = f"{origen}-{max_w}x{max_h}-"
+    return prefijo, f"{prefijo}{st.st_mtime_ns}-{st.st_size}.png"
+
+
+def miniatura(path: str, max_w: int, max_h: int, cache_dir: Optional[str] = None) -> Tuple[Optional[bytes], bool]:
+    """
+    PNG de `path` reducido para entrar en max_w x max_h (nunca agrandado) y si salió
+    de la caché. (None, False) si no hay Pillow ni caché. OSError si `path` no existe.
+    """
+    st = os.stat(path)
+    cache_dir = directorio_cache() if cache_dir is None else cache_dir
+    prefijo, nombre = _nombres(path, max_w, max_h, st)
+    destino = os.path.join(cache_dir, nombre)
+    try:
+        with open(destino, "rb") as f:
+            return f.read(), True
+    except OSError:
+        pass
+    Image = _pil()
+    if Image is None:
+        return None, False
+    with Image.open(path) as img:
+        img.thumbnail((max_w, max_h), Image.LANCZOS)
+        if img.mode not in ("1", "L", "LA", "P", "RGB", "RGBA"):
+            img = img.convert("RGBA")
+        buf = io.BytesIO()
+        img.save(buf, "PNG")
+    png = buf.getvalue()
+    _guardar(cache_dir, prefijo, destino, png)
+    return png, False
+
+
+def _guardar(cache_dir: str, prefijo: str, destino: str, png: bytes):
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        for viejo in glob.glob(os.path.join(cache_dir, glob.escape(prefijo) + "*.png")):
+            os.remove(viejo)   # otra versión del mismo origen
+        tmp = destino + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(png)
+        os.replace(tmp, destino)
+    except OSError:
+        pass   # sin caché sólo se pierde la próxima vez
+
+
+class Cargador:
+    """Decodifica en un hilo propio: pedir() encola y vuelve; listos() entrega lo terminado."""
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir
+        self._pedidos = queue.Queue()
+        self._listos = deque()
+        self._hilo: Optional[threading.Thread] = None
+        self.pendientes = 0   # pedidos sin retirar (se usa sólo desde la UI)
+
+    def pedir(self, clave: str, path: str, max_w: int, max_h: int):
+        self.pendientes += 1
+        self._pedidos.put((clave, path, max_w, max_h))
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._loop, daemon=True)
+            self._hilo.start()
+
+    def listos(self) -> List[Imagen]:
+        out = []
+        while self._listos:
+            out.append(self._listos.popleft())
+        self.pendientes -= len(out)
+        return out
+
+    def _loop(self):
+        while True:
+            clave, path, max_w, max_h = self._pedidos.get()
+            t0 = time.perf_counter()
+            png, cache, error = None, False, None
+            try:
+                png, cache = miniatura(path, max_w, max_h, self.cache_dir)
+            except Exception as e:
+                error = e
+            self._listos.append(Imagen(clave, path, max_w, max_h, png, cache,
+                                       (time.perf_counter() - t0) * 1000.0, error))
@@ -0,0 +1,153 @@
+"""
+Repetición de una bitácora de sesión (bitacora.py) sin el minibrazo.
+
+Lo que el minibrazo mandó (RX de los canales "mini") se vuelve a decodificar con
+un SerialClient y se pasa por ArmController._procesar_telemetria, el mismo camino
+del teleop real: filtro, banda muerta, difusión a los brazos, coalescencia, delta.
+Los brazos del controlador pueden ser simulados (sim:brazo) o reales.
+
+  - velocidad 1: respeta los tiempos de la bitácora; > 1 la acelera; 0 lo más rápido
+    posible. Acelerada, el límite de SET/s del enlace coalesce más, así que para
+    comparar cantidades de SET usá 1 y para comparar costo de proceso usá 0;
+  - el filtro ve los tiempos originales (last_read_t de la bitácora), así que el
+    One-Euro se comporta igual a cualquier velocidad;
+  - el electroimán se toma de los SET que mandó la sesión original al primer brazo;
+  - se supone teleop activo todo el tiempo (la bitácora no guarda el estado de la GUI).
+
+El Resumen compara lo que salió hacia el brazo en la sesión original y en la
+repetición, y el tiempo de proceso por lectura, para regresiones entre versiones.
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional
+
+import bitacora
+import protocolo
+from protocolo import Frame
+from serie import SerialClient
+from trayectoria import _percentil
+
+N_JOINTS = 4
+
+
+@dataclass
+class Resumen:
+    velocidad: float
+    duracion_log: float = 0.0       # s entre el primer y el último registro repetido
+    duracion: float = 0.0           # s reales que tardó la repetición
+    lecturas: int = 0               # registros RX del minibrazo
+    muestras: int = 0               # POT decodificados
+    sets_original: int = 0
+    bytes_original: int = 0
+    pose_original: Optional[tuple] = None
+    sets: int = 0
+    bytes: int = 0
+    pose: Optional[tuple] = None
+    cancelado: bool = False
+    proceso_us: List[float] = field(default_factory=list)   # _procesar_telemetria por lectura
+
+    def texto(self) -> str:
+        vel = "máx" if self.velocidad <= 0 else f"x{self.velocidad:g}"
+        estado = " (cancelada)" if self.cancelado else ""
+        return (f"Repetición {vel}{estado}: {self.duracion_log:.1f} s de bitácora en {self.duracion:.1f} s, "
+                f"{self.lecturas} lecturas / {self.muestras} POT\n"
+                f"  brazo: original {self.sets_original} SET ({self.bytes_original} B), "
+                f"repetición {self.sets} SET ({self.bytes} B)\n"
+                f"  última pose: original {self.pose_original}, repetición {self.pose}\n"
+                f"  proceso por lectura: p50 {_percentil(self.proceso_us, 0.5):.0f} µs / "
+                f"p95 {_percentil(self.proceso_us, 0.95):.0f} µs / "
+                f"máx {max(self.proceso_us, default=0.0):.0f} µs")
+
+
+class _SetsOriginales:
+    """Sigue los SET que la sesión original escribió a un brazo (binario, delta o ASCII)."""
+    def __init__(self):
+        self.decoder = protocolo.FrameDecoder()
+        self.pose: List[Optional[int]] = [None] * (N_JOINTS + 1)
+        self.sets = 0
+        self.bytes = 0
+
+    def feed(self, data: bytes) -> bool:
+        es_set = False
+        for msg in self.decoder.feed(data):
+            if isinstance(msg, Frame) and msg.tipo in (protocolo.T_SET, protocolo.T_DELTA):
+                for i, v in enumerate(msg.canales):
+                    if v is not None:
+                        self.pose[i] = v
+                self.pose[N_JOINTS] = msg.flags & protocolo.F_MAG
+                es_set = True
+            elif isinstance(msg, str) and msg.startswith("SET "):
+                try:
+                    self.pose = [int(v) for v in msg.split()[1:6]]
+                except ValueError:
+                    continue
+                es_set = True
+        if es_set:
+            self.sets += 1
+            self.bytes += len(data)
+        return es_set
+
+    @property
+    def mag(self) -> Optional[int]:
+        return self.pose[N_JOINTS]
+
+
+def repetir(registros: Iterable[bitacora.Registro], ctrl, velocidad: float = 1.0,
+            cancelar: Optional[threading.Event] = None) -> Resumen:
+    """
+    Repite `registros` sobre ctrl (un ArmController con los brazos ya conectados y
+    negociados). Bloquea hasta terminar; `cancelar` la corta.
+    """
+    res = Resumen(velocidad)
+    roles = {}
+    decod = SerialClient()          # sólo decodifica; no se conecta a nada
+    original = _SetsOriginales()
+    canal_brazo: Optional[int] = None
+    cliente = ctrl.brazos[0].client
+    sent0, bytes0 = cliente.sent, cliente.bytes_tx
+    ctrl.teleop = True
+    t_log0 = t_real0 = None
+    t_log = 0.0
+    for reg in registros:
+        if cancelar is not None and cancelar.is_set():
+            res.cancelado = True
+            break
+        if reg.tipo == bitacora.CANAL:
+            roles[reg.canal] = bitacora.canal_info(reg)["rol"]
+            continue
+        rol = roles.get(reg.canal)
+        if reg.tipo == bitacora.TX and rol == "brazo":
+            if canal_brazo is None:
+                canal_brazo = reg.canal
+            if reg.canal == canal_brazo and original.feed(reg.data) and original.mag is not None:
+                ctrl.mag = original.mag
+            continue
+        if reg.tipo != bitacora.RX or rol != "mini":
+            continue
+        if t_log0 is None:
+            t_log0, t_real0 = reg.t, time.monotonic()
+        t_log = reg.t
+        if velocidad > 0:
+            espera = t_real0 + (reg.t - t_log0) / velocidad - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)
+        t0 = time.perf_counter()
+        msgs = decod.decodificar(reg.data)
+        # el filtro usa el tiempo de la muestra: el de la bitácora, no el de ahora
+        ctrl.mini.last_read_t = ctrl.mini.last_parse_t = reg.t
+        ctrl._procesar_telemetria(msgs)
+        res.proceso_us.append((time.perf_counter() - t0) * 1e6)
+        res.lecturas += 1
+        res.muestras += sum(1 for m in msgs if isinstance(m, Frame) and m.tipo == protocolo.T_POT)
+    ctrl.teleop = False
+    cliente.flush()
+    if t_log0 is not None:
+        res.duracion_log = t_log - t_log0
+        res.duracion = time.monotonic() - t_real0
+    res.sets_original, res.bytes_original = original.sets, original.bytes
+    if None not in original.pose:
+        res.pose_original = tuple(original.pose)
+    res.sets, res.bytes = cliente.sent - sent0, cliente.bytes_tx - bytes0
+    res.pose = ctrl.ultima_pose
+    return res
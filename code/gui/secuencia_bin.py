@@ -0,0 +1,211 @@
+"""
+Formato binario de secuencias (.brz) para programas largos.
+
+Cabecera de 32 bytes (little-endian):
+    magic         4s   b"BRZS"
+    version       u16  1
+    canales       u8   4
+    flags         u8   bit0 = registros con timestamp
+    sample_rate   f32  Hz de la grabación (0 = secuencia de poses sin ritmo fijo)
+    count         u32  cantidad de registros
+    reservado     16 bytes
+
+Registros de ancho fijo inmediatamente después:
+    sin timestamp:  m1 m2 m3 m4 mag          (5 x u16 = 10 bytes, igual que PoseStore)
+    con timestamp:  t_ms(u32) m1 m2 m3 m4 mag (14 bytes)
+
+El lector mapea el archivo en memoria (mmap) y recorre los registros sin cargarlos,
+así que una sesión grabada de horas se puede reproducir directo desde disco.
+
+Uso como conversor:
+    python secuencia_bin.py a-bin posiciones.json posiciones.brz
+    python secuencia_bin.py a-json posiciones.brz posiciones.json
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Iterable, Iterator, Optional, Sequence
+
+from poses import STRIDE, PoseStore, revisar_rango
+
+MAGIC = b"BRZS"
+VERSION = 1
+FLAG_TS = 0x1
+
+HEADER = struct.Struct("<4sHBBfI16x")
+REC = struct.Struct("<5H")
+REC_TS = struct.Struct("<I5H")
+
+_LITTLE = sys.byteorder == "little"
+
+
+class FormatoInvalido(ValueError):
+    pass
+
+
+def _header(count: int, timestamps: bool, sample_rate: float, canales: int = 4) -> bytes:
+    return HEADER.pack(MAGIC, VERSION, canales, FLAG_TS if timestamps else 0, float(sample_rate), count)
+
+
+def _pose_bytes(data: array) -> bytes:
+    if not _LITTLE:
+        data = array("H", data)
+        data.byteswap()
+    return data.tobytes()
+
+
+class Escritor:
+    """
+    Escritura incremental (para grabaciones): append() va agregando registros y
+    close() completa el contador de la cabecera.
+    """
+    def __init__(self, path: str, timestamps: bool = False, sample_rate: float = 0.0):
+        self.path = path
+        self.timestamps = timestamps
+        self.sample_rate = sample_rate
+        self.count = 0
+        self._f = open(path, "wb")
+        self._f.write(_header(0, timestamps, sample_rate))
+
+    def append(self, pose: Sequence[int], t_ms: int = 0):
+        if self.timestamps:
+            self._f.write(REC_TS.pack(int(t_ms) & 0xFFFFFFFF, *pose[:STRIDE]))
+        else:
+            self._f.write(REC.pack(*pose[:STRIDE]))
+        self.count += 1
+
+    def close(self):
+        if self._f.closed:
+            return
+        self._f.seek(0)
+        self._f.write(_header(self.count, self.timestamps, self.sample_rate))
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def escribir(path: str, poses, timestamps: Optional[Iterable[int]] = None, sample_rate: float = 0.0):
+    """Guarda un PoseStore (o un iterable de poses) de una sola vez."""
+    if isinstance(poses, PoseStore) and timestamps is None:
+        with open(path, "wb") as f:
+            f.write(_header(len(poses), False, sample_rate))
+            f.write(_pose_bytes(poses.data))
+        return
+    with Escritor(path, timestamps is not None, sample_rate) as w:
+        ts = iter(timestamps) if timestamps is not None else None
+        for p in poses:
+            w.append(p, next(ts) if ts is not None else 0)
+
+
+class SecuenciaBin:
+    """Lector mapeado en memoria. Usar como context manager para liberar el mmap."""
+    def __init__(self, path: str):
+        self.path = path
+        self._f = open(path, "rb")
+        size = os.fstat(self._f.fileno()).st_size
+        if size < HEADER.size:
+            self._f.close()
+            raise FormatoInvalido("archivo demasiado corto")
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, canales, flags, rate, count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION or canales != 4:
+            self.close()
+            raise FormatoInvalido(f"no es una secuencia .brz v{VERSION} de 4 canales")
+        self.timestamps = bool(flags & FLAG_TS)
+        self.sample_rate = rate
+        self._rec = REC_TS if self.timestamps else REC
+        # un archivo cortado (p. ej. grabación interrumpida) se lee hasta el último registro completo
+        self.count = min(count, (size - HEADER.size) // self._rec.size)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _view(self) -> memoryview:
+        return memoryview(self._mm)[HEADER.size:HEADER.size + self.count * self._rec.size]
+
+    def __getitem__(self, i: int) -> tuple:
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        rec = self._rec.unpack_from(self._mm, HEADER.size + i * self._rec.size)
+        return rec[1:] if self.timestamps else rec
+
+    def __iter__(self) -> Iterator[tuple]:
+        """Poses (m1, m2, m3, m4, mag) leídas directo del mmap, sin copiar el archivo."""
+        with self._view() as view:
+            if self.timestamps:
+                for rec in REC_TS.iter_unpack(view):
+                    yield rec[1:]
+            else:
+                yield from REC.iter_unpack(view)
+
+    def con_tiempo(self) -> Iterator[tuple]:
+        """(t_ms, (m1, m2, m3, m4, mag)); sin timestamps usa el índice / sample_rate."""
+        if self.timestamps:
+            with self._view() as view:
+                for rec in REC_TS.iter_unpack(view):
+                    yield rec[0], rec[1:]
+        else:
+            step = 1000.0 / self.sample_rate if self.sample_rate > 0 else 0.0
+            for i, p in enumerate(self):
+                yield int(i * step), p
+
+    def como_array(self) -> array:
+        """
+        Copia las poses a un array('H') listo para PoseStore.replace_data().
+        FormatoInvalido si algún motor sale de 0..1023.
+        """
+        out = array("H")
+        if not self.timestamps:
+            with self._view() as view:
+                out.frombytes(view)
+            if not _LITTLE:
+                out.byteswap()
+        else:
+            for p in self:
+                out.extend(p)
+        try:
+            revisar_rango(out)
+        except ValueError as e:
+            raise FormatoInvalido(f"{os.path.basename(self.path)}: {e}") from None
+        return out
+
+    def close(self):
+        if getattr(self, "_mm", None) is not None:
+            self._mm.close()
+            self._mm = None
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ---- Conversores JSON <-> .brz ----
+def json_a_bin(src: str, dst: str):
+    with open(src, "r", encoding="utf-8") as f:
+        escribir(dst, PoseStore(json.load(f)))
+
+
+def bin_a_json(src: str, dst: str):
+    with SecuenciaBin(src) as seq:
+        data = [list(p) for p in seq]
+    with open(dst, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] not in ("a-bin", "a-json"):
+        print(__doc__.split("Uso como conversor:")[1].rstrip())
+        sys.exit(2)
+    (json_a_bin if sys.argv[1] == "a-bin" else bin_a_json)(sys.argv[2], sys.argv[3])
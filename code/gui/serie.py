@@ -0,0 +1,394 @@
+"""
+Cliente serie de la app: conexión, negociación de protocolo, hilo escritor
+no bloqueante y lectura de tramas/líneas (ver protocolo.py).
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Optional
+
+# ---- Serie (pyserial) ----
+try:
+    import serial
+    import serial.tools.list_ports
+except Exception:
+    serial = None
+
+import protocolo
+from protocolo import Frame
+import simulador
+
+
+# ------------------------- SERIAL -------------------------
+SET_MIN_INTERVAL_S = 0.015   # = UPDATE_PERIOD_MS del firmware: más rápido no sirve
+OUT_QUEUE_MAX = 64           # líneas no-SET pendientes (si se llena se descartan)
+DELTA_REFRESCO_S = 0.5       # con delta, un SET completo al menos cada tanto (resincroniza)
+CIERRE_DRENAR_S = 0.25       # close(): plazo para mandar lo que ya estaba encolado
+
+
+class SerialClient:
+    """
+    Cliente serie simple para enviar/recibir líneas ASCII o tramas binarias (ver protocolo.py).
+    La escritura pasa por un hilo propio: send_* sólo encola y vuelve enseguida.
+    Los SET se coalescen (sólo importa la pose más nueva) y se limitan a uno
+    cada SET_MIN_INTERVAL_S; el resto de las líneas va a una cola acotada.
+    Con usar_delta, al negociar el binario también se pide "PROTO DELTA": si el
+    firmware lo acepta los SET salen como tramas delta (sólo los canales que cambiaron
+    respecto del último escrito) cuando son más cortas que la trama completa.
+    Con usar_ack también se pide "PROTO ACK": si el firmware lo acepta, `ack` queda en
+    True y se pueden mandar movimientos confirmados (flujo.py) con send_bytes.
+    Con `motor` (motor_async.MotorAsync) no hay hilo: la cola la vacía una tarea
+    del motor y la lectura la hace su bucle de eventos.
+    Con `bitacora` (bitacora.Bitacora) se anota todo lo escrito y leído en el canal
+    `canal_log`; anotar sólo encola, el disco lo maneja el hilo de la bitácora.
+    """
+    def __init__(self, min_interval: float = SET_MIN_INTERVAL_S, queue_max: int = OUT_QUEUE_MAX):
+        self.ser: Optional[Any] = None
+        self.min_interval = min_interval
+
+        self._cond = threading.Condition()
+        self._lines = deque()
+        self._queue_max = queue_max
+        self._pending_set: Optional[tuple] = None   # (m1, m2, m3, m4, mag)
+        self._pending_meta: Optional[list] = None  # timestamps de la muestra que originó el SET
+        self.metricas = None  # metricas.Metricas opcional (instrumentación de latencia)
+        self.motor = None     # motor_async.MotorAsync opcional (asigna antes de conectar)
+        self.bitacora = None  # bitacora.Bitacora opcional
+        self.canal_log = 0
+        self._next_set_t = 0.0
+        self._writer: Optional[threading.Thread] = None
+        self._writer_run = False
+
+        # Protocolo: ASCII por defecto, binario si el firmware lo acepta al conectar
+        self.binary = False
+        self.usar_delta = False   # pedir tramas delta al negociar
+        self.delta = False        # el firmware las aceptó
+        self.usar_ack = False     # pedir movimientos confirmados al negociar
+        self.ack = False          # el firmware los aceptó
+        self._ultimo_set: Optional[tuple] = None   # último SET escrito (referencia del delta)
+        self._t_completo = 0.0
+        self._tx_seq = 0
+        self._decoder = protocolo.FrameDecoder()
+
+        # contadores (sólo informativos)
+        self.sent = 0        # tramas escritas al puerto
+        self.bytes_tx = 0    # bytes escritos al puerto
+        self.repetidos = 0   # SET iguales al anterior que no hizo falta mandar (delta)
+        self.coalesced = 0   # SET reemplazados por uno más nuevo antes de salir
+        self.dropped = 0     # líneas descartadas por cola llena
+        self.errors = 0      # fallas de escritura
+        self.received = 0    # mensajes recibidos (tramas + líneas)
+        # timestamps de la última lectura (para instrumentación)
+        self.last_read_t = 0.0
+        self.last_parse_t = 0.0
+
+    def ports(self):
+        sims = list(simulador.PUERTOS) if os.environ.get("BRAZO_SIM") == "1" else []
+        if serial is None:
+            return sims
+        return [p.device for p in serial.tools.list_ports.comports()] + sims
+
+    def connect(self, port: str, baud: int = 230400, timeout: float = 0.1):
+        if port.startswith("sim:"):
+            self.attach(simulador.abrir(port, baud, timeout))
+            return
+        if serial is None:
+            raise RuntimeError("pyserial no está instalado. Ejecuta: pip install pyserial")
+        self.attach(serial.Serial(port=port, baudrate=baud, timeout=timeout))
+
+    def attach(self, ser: Any):
+        """Usa un puerto ya abierto (serial.Serial o cualquier objeto con la misma interfaz)."""
+        self.close()
+        self.ser = ser
+        self.binary = False
+        self.delta = False
+        self.ack = False
+        self._ultimo_set = None
+        self._decoder = protocolo.FrameDecoder()
+        if self.motor is not None:
+            self._writer_run = True
+            self._next_set_t = 0.0
+            self.motor.agregar(self)
+        else:
+            self._start_writer()
+
+    def close(self):
+        if self.motor is not None:
+            self.motor.quitar(self)   # antes de cerrar: el motor deja de vigilar el descriptor
+        self._stop_writer()
+        if self.connected:
+            self._drenar(CIERRE_DRENAR_S)   # el último SET, un HOME o STOP recién encolado
+        with self._cond:
+            self._lines.clear()
+            self._pending_set = None
+            self._pending_meta = None
+        if self.ser and self.ser.is_open:
+            self.ser.close()
+        self.ser = None
+
+    @property
+    def connected(self) -> bool:
+        return self.ser is not None and self.ser.is_open
+
+    def stats(self) -> dict:
+        with self._cond:
+            depth = len(self._lines) + (1 if self._pending_set is not None else 0)
+        return {"sent": self.sent, "bytes": self.bytes_tx, "repeated": self.repetidos,
+                "coalesced": self.coalesced, "dropped": self.dropped,
+                "errors": self.errors, "queue": depth, "received": self.received,
+                "crc_errors": self._decoder.crc_errors, "lost": self._decoder.lost}
+
+    # escritura (no bloqueante)
+    def send_line(self, text: str):
+        self.send_bytes(text.encode("ascii", errors="ignore"))
+
+    def send_bytes(self, data: bytes):
+        """Bytes tal cual (p. ej. una trama MOVE), en orden con las líneas y sin coalescer."""
+        if not self.connected:
+            return
+        with self._cond:
+            if len(self._lines) >= self._queue_max:
+                self.dropped += 1
+                return
+            self._lines.append(data)
+            self._avisar()
+
+    def _queue_set(self, pose: tuple, meta: Optional[list] = None):
+        if not self.connected:
+            return
+        with self._cond:
+            if self._pending_set is not None:
+                self.coalesced += 1
+                if self._pending_meta is not None and self.metricas is not None:
+                    self.metricas.cerrar(self._pending_meta, escrita=False)
+            self._pending_set = pose
+            self._pending_meta = meta
+            self._avisar()
+
+    def send_set(self, p):
+        """p: Posicion (o cualquier objeto con m1..m4 y mag)."""
+        self._queue_set((p.m1, p.m2, p.m3, p.m4, p.mag))
+
+    def send_immediate(self, m1, m2, m3, m4, mag, meta: Optional[list] = None):
+        self._queue_set((int(m1), int(m2), int(m3), int(m4), int(mag)), meta)
+
+    def _encode_set(self, pose: tuple, now: float) -> Optional[bytes]:
+        # el formato se decide al salir, así la secuencia binaria no tiene huecos por coalescencia
+        # y el delta es respecto de lo que de verdad se escribió
+        if not self.binary:
+            return protocolo.format_set(*pose)
+        previo = self._ultimo_set
+        if self.delta and previo is not None and now - self._t_completo < DELTA_REFRESCO_S:
+            mascara = sum(1 << i for i in range(4) if pose[i] != previo[i])
+            if mascara == 0 and pose[4] == previo[4]:
+                return None
+            if protocolo.delta_len(mascara) < protocolo.FRAME_LEN:
+                self._ultimo_set = pose
+                self._tx_seq = (self._tx_seq + 1) & 0xFF
+                return protocolo.encode_delta(self._tx_seq, pose, mascara)
+        self._ultimo_set = pose
+        self._t_completo = now
+        self._tx_seq = (self._tx_seq + 1) & 0xFF
+        return protocolo.encode_set(self._tx_seq, *pose)
+
+    def _avisar(self):
+        """Hay algo para escribir (se llama con _cond tomado)."""
+        self._cond.notify()
+        if self.motor is not None:
+            self.motor.despertar(self)
+
+    @property
+    def pendiente(self) -> bool:
+        return bool(self._lines) or self._pending_set is not None
+
+    def flush(self, timeout: float = 1.0) -> bool:
+        """Espera a que el escritor vacíe lo pendiente. Devuelve False si venció el timeout."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._lines or self._pending_set is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._writer_run:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    # escritor (hilo propio o tarea del motor; los dos usan _sacar/_escribir)
+    def _sacar(self, now: float):
+        """
+        Próximo envío: (data, meta, is_set), o los segundos que faltan para poder
+        mandar el SET pendiente, o None si no hay nada. Llamar con _cond tomado.
+        """
+        if self._lines:
+            return self._lines.popleft(), None, False
+        if self._pending_set is not None:
+            wait = self._next_set_t - now
+            if wait > 0:
+                return wait
+            data = self._encode_set(self._pending_set, now)
+            meta = self._pending_meta
+            self._pending_set = self._pending_meta = None
+            if data is None:   # igual al último escrito: no ocupa el enlace
+                self.repetidos += 1
+                if meta is not None and self.metricas is not None:
+                    self.metricas.cerrar(meta, escrita=False)
+                self._cond.notify_all()
+                return None
+            return data, meta, True
+        return None
+
+    def _escribir(self, data: bytes, meta: Optional[list], is_set: bool):
+        try:
+            self.ser.write(data)
+            self.sent += 1
+            self.bytes_tx += len(data)
+            if self.bitacora is not None:
+                self.bitacora.tx(self.canal_log, data)
+        except Exception:
+            self.errors += 1
+        if meta is not None and self.metricas is not None:
+            meta[3] = time.monotonic()
+            self.metricas.cerrar(meta)
+        if is_set:
+            self._next_set_t = time.monotonic() + self.min_interval
+        with self._cond:
+            self._cond.notify_all()  # despierta a flush()
+
+    def _start_writer(self):
+        self._writer_run = True
+        self._next_set_t = 0.0
+        self._writer = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer.start()
+
+    def _drenar(self, timeout: float):
+        """
+        Con el escritor ya parado, escribe desde este hilo lo que quedó en la cola
+        (respetando el intervalo entre SET) hasta vaciarla o vencer el plazo.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            with self._cond:
+                item = self._sacar(now)
+            if item is None:
+                return
+            if not isinstance(item, tuple):
+                if now + item > deadline:
+                    return
+                time.sleep(item)
+                continue
+            self._escribir(*item)
+            if time.monotonic() > deadline:
+                return
+
+    def _stop_writer(self):
+        with self._cond:
+            self._writer_run = False
+            self._cond.notify_all()
+        if self._writer is None:
+            return
+        if self._writer is not threading.current_thread():
+            self._writer.join(timeout=1.0)
+        self._writer = None
+
+    def _writer_loop(self):
+        while True:
+            with self._cond:
+                item = None
+                while self._writer_run:
+                    item = self._sacar(time.monotonic())
+                    if isinstance(item, tuple):
+                        break
+                    self._cond.wait(item)  # None: hasta que llegue algo
+                if not self._writer_run:
+                    return
+            self._escribir(*item)
+
+    # negociación de protocolo
+    def negotiate_binary(self, timeout: float = 2.5, retry: float = 0.25) -> bool:
+        """
+        Pide modo binario ("PROTO BIN") hasta recibir "PROTO BIN OK" o vencer el timeout
+        (el Arduino puede estar reiniciándose al abrir el puerto). Sin respuesta se queda
+        en ASCII, que es lo que entiende el firmware viejo. Llamar antes de empezar a leer.
+        """
+        if not self._pedir(protocolo.PROTO_BIN_REQ, protocolo.PROTO_BIN_OK, timeout, retry):
+            return False
+        self.binary = True
+        if self.usar_delta:
+            # firmware sin delta ignora el pedido: se pierde medio segundo y sigue con SET completos
+            self.delta = self._pedir(protocolo.PROTO_DELTA_REQ, protocolo.PROTO_DELTA_OK, 0.5, retry)
+        if self.usar_ack:
+            self.ack = self._pedir(protocolo.PROTO_ACK_REQ, protocolo.PROTO_ACK_OK, 0.5, retry)
+        return True
+
+    def _pedir(self, pedido: str, ok: str, timeout: float, retry: float) -> bool:
+        """Manda `pedido` cada `retry` s hasta leer la línea `ok` o vencer el timeout."""
+        if not self.connected:
+            return False
+        deadline = time.monotonic() + timeout
+        next_try = 0.0
+        while time.monotonic() < deadline and self.connected:
+            if time.monotonic() >= next_try:
+                self.send_line(pedido)
+                next_try = time.monotonic() + retry
+            for msg in self._read_raw():
+                if isinstance(msg, str) and msg.strip() == ok:
+                    return True
+        return False
+
+    def use_ascii(self):
+        """Fuerza ASCII (por si el firmware quedó en binario de una sesión anterior)."""
+        self.binary = False
+        self.send_line(protocolo.PROTO_ASCII_REQ)
+
+    # lectura
+    def _read_raw(self) -> list:
+        try:
+            data = self.ser.read(self.ser.in_waiting or 1)  # bloquea hasta timeout si no hay nada
+        except Exception:
+            return []
+        return self._feed(data)
+
+    def _feed(self, data: bytes) -> list:
+        if not data:
+            return []
+        self.last_read_t = time.monotonic()
+        if self.bitacora is not None:
+            self.bitacora.rx(self.canal_log, data)
+        out = self._decoder.feed(data)
+        self.received += len(out)
+        return out
+
+    def read(self) -> list:
+        """
+        Devuelve lo recibido como lista de Frame (POT ASCII incluidos, con seq=None) y str
+        (cualquier otra línea de texto). Lista vacía si no llegó nada en el timeout.
+        """
+        if not self.connected:
+            return []
+        try:
+            data = self.ser.read(self.ser.in_waiting or 1)
+        except Exception:
+            return []
+        return self.decodificar(data)
+
+    def decodificar(self, data: bytes) -> list:
+        """Como read(), pero con bytes ya leídos (lo usa el motor asyncio)."""
+        out = []
+        for msg in self._feed(data):
+            if isinstance(msg, str):
+                pot = protocolo.parse_pot(msg)
+                if pot is not None:
+                    msg = Frame(protocolo.T_POT, None, pot, 0)
+            out.append(msg)
+        self.last_parse_t = time.monotonic()
+        return out
+
+    def readline(self) -> Optional[str]:
+        if not self.connected:
+            return None
+        try:
+            line = self.ser.readline().decode("ascii", errors="ignore")
+            return line if line else None
+        except Exception:
+            return None
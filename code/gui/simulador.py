@@ -0,0 +1,395 @@
+"""
+Dispositivos simulados para probar la app sin placas.
+
+PuertoSimulado imita lo que SerialClient usa de serial.Serial (write, read, in_waiting,
+is_open, close) y del otro lado corre un "firmware" en un hilo propio:
+
+  BrazoSimulado  ~ robot_arm.ino:  acepta SET ASCII y tramas binarias (SET y delta),
+                   PROTO BIN/ASCII/DELTA/ACK, cola de MOVE con ACK de recibido y llegada,
+                   lazo de 15 ms con EMA entero (1/6), mapeo a grados, zona muerta de 2°,
+                   y la tabla de diagnóstico cada 120 ms.
+  MiniSimulado   ~ mini_brazo.ino: potes leídos de formas de onda programables,
+                   EMA 0.3 + banda muerta de 3 cada ~15 ms, envía POT (texto o binario).
+
+El cable se modela por sentido: cada byte tarda 10/baud segundos (8N1) y los bytes
+llegan en orden, así que a 9600 baud una línea POT de 20 bytes tarda ~21 ms.
+
+Desde la app: conectar a "sim:brazo" o "sim:mini" (aparecen en la lista de puertos
+si la variable de entorno BRAZO_SIM=1).
+"""
+import math
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional, Sequence
+
+import protocolo
+from protocolo import Frame
+
+PUERTOS = ("sim:brazo", "sim:mini")
+
+
+# ---- Cable serie ----
+class _Enlace:
+    """Un sentido del cable: cada escritura llega entera cuando termina de 'transmitirse'."""
+    def __init__(self, baud: int):
+        self.byte_s = 10.0 / baud
+        self._busy_until = 0.0
+        self._q = deque()  # (t_llegada, bytes)
+
+    def push(self, data: bytes, now: float):
+        start = max(now, self._busy_until)
+        self._busy_until = start + len(data) * self.byte_s
+        self._q.append((self._busy_until, data))
+
+    def next_t(self) -> float:
+        return self._q[0][0] if self._q else math.inf
+
+    def pop_ready(self, now: float) -> bytes:
+        out = bytearray()
+        while self._q and self._q[0][0] <= now:
+            out += self._q.popleft()[1]
+        return bytes(out)
+
+
+class PuertoSimulado:
+    """Lado PC del puerto; el lado dispositivo es un DispositivoSimulado."""
+    def __init__(self, dispositivo: "DispositivoSimulado", port: str = "sim", timeout: float = 0.1):
+        self.port = port
+        self.timeout = timeout
+        self.dev = dispositivo
+        self._rx = bytearray()
+        self.is_open = True
+        dispositivo._puerto = self
+        dispositivo.start()
+
+    @property
+    def baudrate(self) -> int:
+        return self.dev.baud
+
+    @property
+    def in_waiting(self) -> int:
+        with self.dev.cond:
+            self._rx += self.dev.rx_link.pop_ready(time.monotonic())
+            return len(self._rx)
+
+    def write(self, data: bytes) -> int:
+        if not self.is_open:
+            raise OSError("puerto simulado cerrado")
+        with self.dev.cond:
+            self.dev.tx_link.push(bytes(data), time.monotonic())
+            self.dev.cond.notify_all()
+        return len(data)
+
+    def read(self, n: int = 1) -> bytes:
+        deadline = time.monotonic() + (self.timeout or 0.0)
+        with self.dev.cond:
+            while True:
+                now = time.monotonic()
+                self._rx += self.dev.rx_link.pop_ready(now)
+                if self._rx or now >= deadline or not self.is_open:
+                    break
+                self.dev.cond.wait(min(deadline, self.dev.rx_link.next_t()) - now)
+            out = bytes(self._rx[:n])
+            del self._rx[:n]
+            return out
+
+    def readline(self) -> bytes:
+        deadline = time.monotonic() + (self.timeout or 0.0)
+        buf = bytearray()
+        while time.monotonic() < deadline:
+            b = self.read(1)
+            if b:
+                buf += b
+                if b == b"\n":
+                    break
+        return bytes(buf)
+
+    def reset_input_buffer(self):
+        with self.dev.cond:
+            self.dev.rx_link.pop_ready(math.inf)
+            self._rx.clear()
+
+    def close(self):
+        self.is_open = False
+        self.dev.stop()
+
+
+class DispositivoSimulado:
+    """Hilo que corre tick() cada `periodo_s` y procesa los bytes que llegan de la PC."""
+    periodo_s = 0.015
+
+    def __init__(self, baud: int):
+        self.baud = baud
+        self.cond = threading.Condition()
+        self.tx_link = _Enlace(baud)   # PC -> dispositivo
+        self.rx_link = _Enlace(baud)   # dispositivo -> PC
+        self._run = False
+        self._thread: Optional[threading.Thread] = None
+        self._puerto: Optional[PuertoSimulado] = None
+        self.t0 = time.monotonic()
+
+    def start(self):
+        self._run = True
+        self.t0 = time.monotonic()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self.cond:
+            self._run = False
+            self.cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+
+    def emitir(self, data: bytes):
+        """Serial.print/write del firmware (llamar con self.cond tomado)."""
+        self.rx_link.push(data, time.monotonic())
+        self.cond.notify_all()
+
+    def _loop(self):
+        next_tick = time.monotonic()
+        with self.cond:
+            while self._run:
+                now = time.monotonic()
+                data = self.tx_link.pop_ready(now)
+                if data:
+                    self.on_bytes(data, now)
+                if now >= next_tick:
+                    self.tick(now)
+                    next_tick += self.periodo_s
+                    if next_tick < now:  # atrasado: no intentar recuperar ticks
+                        next_tick = now + self.periodo_s
+                self.cond.wait(max(0.0, min(next_tick, self.tx_link.next_t()) - time.monotonic()))
+            # al cerrar, lo que ya estaba en el cable llega igual (el driver real termina de transmitir)
+            data = self.tx_link.pop_ready(math.inf)
+            if data:
+                self.on_bytes(data, time.monotonic())
+
+    # a implementar por cada firmware
+    def on_bytes(self, data: bytes, now: float):
+        pass
+
+    def tick(self, now: float):
+        pass
+
+
+def _trunc_div(a: int, b: int) -> int:
+    """División entera de C (trunca hacia cero)."""
+    q = abs(a) // abs(b)
+    return q if (a >= 0) == (b > 0) else -q
+
+
+# ---- robot_arm.ino ----
+class BrazoSimulado(DispositivoSimulado):
+    N = 4
+    RAW_MIN = (0, 0, 0, 0)
+    RAW_MAX = (1020, 1020, 1020, 1020)
+    ANGLE_MIN = (0, 0, 0, 0)
+    ANGLE_MAX = (180, 180, 180, 180)
+    ALPHA_NUM, ALPHA_DEN = 1, 6
+    DEAD_DEG = 2
+    SERIAL_PERIOD_S = 0.120
+    MOVE_QUEUE = 4
+    REACH_TOL = 8
+
+    def __init__(self, baud: int = 230400, potes: Optional[Callable[[float], Sequence[int]]] = None,
+                 diagnostico: bool = True, historial: int = 100_000):
+        super().__init__(baud)
+        self.potes = potes or (lambda t: (512, 512, 512, 512))
+        self.diagnostico = diagnostico
+        self._decoder = protocolo.FrameDecoder()
+        self.host_active = False
+        self.host_target = [0] * self.N
+        self.mag = 0
+        self.proto_bin = False
+        # cola de MOVE: [(seq, pose)], la cabeza es el objetivo una vez arrancada
+        self.movs = deque()
+        self.mov_arrancado = False
+        self.mov_corrida = False
+        self.mov_aceptada = False
+        self.mov_primera = 0
+        self.mov_proxima = 0
+        self.mov_llegada = 0          # 0x100 | seq de la última alcanzada (0: ninguna)
+        p0 = self.potes(0.0)
+        self.ema = [int(v) for v in p0]
+        self.last_angle = [-1000] * self.N
+        self.obs_min = [1020] * self.N
+        self.obs_max = [0] * self.N
+        self._t_serial = 0.0
+        # historial para los benchmarks
+        self.recibidos = deque(maxlen=historial)   # (t, (m1, m2, m3, m4, mag))
+        self.servo_writes = 0
+
+    def angle(self, i: int, x: int) -> int:
+        lo, hi = self.RAW_MIN[i], self.RAW_MAX[i]
+        a0, a1 = self.ANGLE_MIN[i], self.ANGLE_MAX[i]
+        if hi == lo:
+            return a0
+        y = _trunc_div((x - lo) * (a1 - a0), hi - lo) + a0
+        return max(a0, min(a1, y))
+
+    def _set(self, pose, now: float, cola: bool = False):
+        if not cola:   # un SET de la PC vacía la cola de movimientos
+            self.movs.clear()
+            self.mov_arrancado = self.mov_corrida = False
+        self.host_target = [max(0, min(1023, int(v))) for v in pose[:self.N]]
+        self.mag = 1 if pose[self.N] else 0
+        self.host_active = True
+        self.recibidos.append((now, tuple(self.host_target) + (self.mag,)))
+
+    def on_bytes(self, data: bytes, now: float):
+        for msg in self._decoder.feed(data):
+            if isinstance(msg, Frame):
+                if msg.tipo == protocolo.T_SET:
+                    self._set(msg.canales + (msg.flags & protocolo.F_MAG,), now)
+                elif msg.tipo == protocolo.T_DELTA and self.host_active:
+                    canales = tuple(t if c is None else c for c, t in zip(msg.canales, self.host_target))
+                    self._set(canales + (msg.flags & protocolo.F_MAG,), now)
+                elif msg.tipo == protocolo.T_MOVE:
+                    self._move(msg)
+                continue
+            line = msg.strip()
+            if line.startswith("SET "):
+                parts = line.split()
+                if len(parts) == 6:
+                    try:
+                        self._set([int(x) for x in parts[1:]], now)
+                    except ValueError:
+                        pass
+            elif line == "PROTO BIN":
+                self.proto_bin = True
+                self.emitir(b"PROTO BIN OK\r\n")
+            elif line == "PROTO ASCII":
+                self.proto_bin = False
+                self.emitir(b"PROTO ASCII OK\r\n")
+            elif line == "PROTO DELTA":
+                self.emitir(b"PROTO DELTA OK\r\n")
+            elif line == "PROTO ACK":
+                self.emitir(b"PROTO ACK OK\r\n")
+
+    def _ack(self, seq: int, flags: int = 0):
+        libres = self.MOVE_QUEUE - len(self.movs)
+        self.emitir(protocolo.encode_frame(protocolo.T_ACK, seq, (libres, self.MOVE_QUEUE, self.mov_llegada, 0),
+                                           flags))
+
+    def _move(self, msg: Frame):
+        if msg.flags & protocolo.F_NUEVA and not (self.mov_corrida and msg.seq == self.mov_primera):
+            self.movs.clear()
+            self.mov_arrancado = False
+            self.mov_corrida, self.mov_aceptada = True, False
+            self.mov_llegada = 0
+            self.mov_primera = self.mov_proxima = msg.seq
+        if not self.mov_corrida:
+            return
+        if msg.seq != self.mov_proxima or len(self.movs) >= self.MOVE_QUEUE:
+            if self.mov_aceptada:
+                self._ack((self.mov_proxima - 1) & 0xFF)
+            return
+        self.movs.append((msg.seq, msg.canales + (msg.flags & protocolo.F_MAG,)))
+        self.mov_proxima = (msg.seq + 1) & 0xFF
+        self.mov_aceptada = True
+        self._ack(msg.seq)
+
+    def tick(self, now: float):
+        t = now - self.t0
+        pots = None if self.host_active else self.potes(t)
+        for i in range(self.N):
+            raw = self.host_target[i] if self.host_active else int(pots[i])
+            self.obs_min[i] = min(self.obs_min[i], raw)
+            self.obs_max[i] = max(self.obs_max[i], raw)
+            self.ema[i] += _trunc_div((raw - self.ema[i]) * self.ALPHA_NUM, self.ALPHA_DEN)
+            ang = self.angle(i, self.ema[i])
+            if abs(ang - self.last_angle[i]) >= self.DEAD_DEG:
+                self.last_angle[i] = ang
+                self.servo_writes += 1
+        if self.mov_arrancado and all(abs(e - t) <= self.REACH_TOL for e, t in zip(self.ema, self.host_target)):
+            seq, _ = self.movs.popleft()
+            self.mov_arrancado = False
+            self.mov_llegada = 0x100 | seq
+            self._ack(seq, protocolo.F_LLEGO)
+        if not self.mov_arrancado and self.movs:
+            self._set(self.movs[0][1], now, cola=True)
+            self.mov_arrancado = True
+        if self.diagnostico and now - self._t_serial >= self.SERIAL_PERIOD_S:
+            self._t_serial = now
+            self.emitir(self.tabla(pots).encode("ascii"))
+
+    def tabla(self, pots=None) -> str:
+        """Mismo texto que imprime robot_arm.ino cada SERIAL_PERIOD_MS."""
+        out = ["CH | raw  ema  deg  obs[min,max]\n"]
+        for i in range(self.N):
+            raw = self.host_target[i] if pots is None else int(pots[i])
+            out.append(f"{i}  | {raw}   {self.ema[i]}   {self.angle(i, self.ema[i])}   "
+                       f"[{self.obs_min[i]},{self.obs_max[i]}]\r\n")
+        out.append("\r\n")
+        return "".join(out)
+
+
+# ---- mini_brazo.ino ----
+def ondas_seno(periodos=(4.0, 5.0, 6.0, 7.0), amp=400, centro=512):
+    """Forma de onda por defecto: un seno distinto por canal."""
+    def f(t: float):
+        return tuple(centro + amp * math.sin(2 * math.pi * t / p) for p in periodos)
+    return f
+
+
+class MiniSimulado(DispositivoSimulado):
+    N = 4
+    DEADBAND = 3
+    ALPHA = 0.3
+
+    def __init__(self, baud: int = 115200, ondas: Optional[Callable[[float], Sequence[float]]] = None,
+                 historial: int = 100_000):
+        super().__init__(baud)
+        self.ondas = ondas or ondas_seno()
+        v0 = [int(x) for x in self.ondas(0.0)]
+        self.val = list(v0)
+        self.prev = list(v0)
+        self.proto_bin = False
+        self.seq = 0
+        self._line = bytearray()
+        self.emitidos = deque(maxlen=historial)   # (t, (m1, m2, m3, m4))
+
+    def on_bytes(self, data: bytes, now: float):
+        for b in data:
+            if b == 0x0A:
+                line = self._line.decode("ascii", errors="ignore").strip()
+                self._line.clear()
+                if line == "PROTO BIN":
+                    self.emitir(b"PROTO BIN OK\r\n")
+                    self.proto_bin = True
+                elif line == "PROTO ASCII":
+                    self.proto_bin = False
+                    self.emitir(b"PROTO ASCII OK\r\n")
+            elif b != 0x0D and len(self._line) < 23:
+                self._line.append(b)
+
+    def tick(self, now: float):
+        raw = self.ondas(now - self.t0)
+        changed = False
+        for i in range(self.N):
+            r = max(0, min(1023, int(raw[i])))
+            f = int(self.ALPHA * r + (1.0 - self.ALPHA) * self.val[i])
+            self.val[i] = f
+            if abs(f - self.prev[i]) >= self.DEADBAND:
+                self.prev[i] = f
+                changed = True
+        if not changed:
+            return
+        pot = tuple(self.prev)
+        self.emitidos.append((now, pot))
+        if self.proto_bin:
+            self.emitir(protocolo.encode_frame(protocolo.T_POT, self.seq, pot))
+            self.seq = (self.seq + 1) & 0xFF
+        else:
+            self.emitir(f"POT {pot[0]} {pot[1]} {pot[2]} {pot[3]}\n".encode("ascii"))
+
+
+def abrir(port: str, baud: int, timeout: float = 0.1) -> PuertoSimulado:
+    """Crea el puerto simulado para 'sim:brazo' o 'sim:mini'."""
+    if port.startswith("sim:brazo"):  # sim:brazo, sim:brazo2, ...: cada uno es otro brazo
+        return PuertoSimulado(BrazoSimulado(baud), port, timeout)
+    if port == "sim:mini":
+        return PuertoSimulado(MiniSimulado(baud), port, timeout)
+    raise ValueError(f"puerto simulado desconocido: {port}")
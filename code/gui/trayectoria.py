@@ -0,0 +1,254 @@
+"""
+Generador de trayectorias para reproducir secuencias de posiciones.
+
+Entre dos poses consecutivas todas las articulaciones se mueven en línea recta
+(en espacio articular) siguiendo un mismo perfil trapezoidal de velocidad, escalado
+para que ninguna supere su velocidad/aceleración máxima. Así todas llegan juntas y
+el movimiento es suave en vez de saltar de pose en pose.
+
+Unidades: las mismas del slider (cuentas 0..1023), velocidades en cuentas/s y
+aceleraciones en cuentas/s².
+
+La reproducción usa deadlines sobre time.monotonic(): cada setpoint k sale en
+t0 + k*dt, sin acumular el error de sleep() ni la latencia de escritura.
+"""
+import math
+import threading
+import time
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Callable, Generator, Iterable, Iterator, List, Optional, Sequence, Union
+
+N_JOINTS = 4
+
+DEFAULT_VMAX = (600.0, 600.0, 600.0, 600.0)     # cuentas/s (~105 °/s con 0..1023 -> 0..180°)
+DEFAULT_AMAX = (2400.0, 2400.0, 2400.0, 2400.0)  # cuentas/s²
+DEFAULT_RATE_HZ = 1.0 / 0.015                    # = UPDATE_PERIOD_MS del firmware
+
+
+@dataclass
+class Limites:
+    vmax: Sequence[float] = DEFAULT_VMAX
+    amax: Sequence[float] = DEFAULT_AMAX
+
+
+@dataclass
+class Segmento:
+    t0: float          # inicio del movimiento (s desde el comienzo)
+    dur: float         # duración del movimiento (sin la pausa)
+    hold: float        # pausa al llegar
+    q0: tuple          # pose inicial (4 articulaciones)
+    dq: tuple          # desplazamiento por articulación
+    mag0: int          # electroimán durante el movimiento
+    mag1: int          # electroimán al llegar (el de la pose destino)
+    v: float           # velocidad pico del parámetro s (1/s)
+    a: float           # aceleración del parámetro s (1/s²)
+    ta: float          # tiempo de aceleración
+
+    @property
+    def t_end(self) -> float:
+        return self.t0 + self.dur + self.hold
+
+    def s_at(self, t: float) -> float:
+        """Parámetro s in [0, 1] del perfil trapezoidal en t (relativo al inicio del segmento)."""
+        if t <= 0.0 or self.dur <= 0.0:
+            return 0.0 if self.dur > 0.0 else 1.0
+        if t >= self.dur:
+            return 1.0
+        ta, a, v = self.ta, self.a, self.v
+        if t < ta:
+            return 0.5 * a * t * t
+        if t <= self.dur - ta:
+            return 0.5 * a * ta * ta + v * (t - ta)
+        r = self.dur - t
+        return 1.0 - 0.5 * a * r * r
+
+    def sample(self, t: float) -> tuple:
+        """Setpoint (m1, m2, m3, m4, mag) en el instante absoluto t."""
+        tr = t - self.t0
+        s = self.s_at(tr)
+        mag = self.mag1 if tr >= self.dur else self.mag0
+        q0, dq = self.q0, self.dq
+        return (int(round(q0[0] + dq[0] * s)), int(round(q0[1] + dq[1] * s)),
+                int(round(q0[2] + dq[2] * s)), int(round(q0[3] + dq[3] * s)), mag)
+
+
+def _perfil(dq: Sequence[float], lim: Limites):
+    """Escala el trapezoide de s para la articulación más exigida. Devuelve (dur, v, a, ta)."""
+    v = a = math.inf
+    for j, d in enumerate(dq):
+        d = abs(d)
+        if d > 0:
+            v = min(v, lim.vmax[j] / d)
+            a = min(a, lim.amax[j] / d)
+    if v == math.inf:
+        return 0.0, 0.0, 0.0, 0.0
+    if v * v / a >= 1.0:  # no llega a velocidad crucero: triángulo
+        ta = math.sqrt(1.0 / a)
+        return 2.0 * ta, a * ta, a, ta
+    ta = v / a
+    return 1.0 / v + ta, v, a, ta
+
+
+def planificar(inicio: Sequence[int], poses: Iterable[Sequence[int]],
+               limites: Optional[Limites] = None,
+               hold_s: Union[float, Sequence[float]] = 0.0) -> Iterator[Segmento]:
+    """
+    Genera los segmentos de a uno a medida que se consumen (no necesita tener
+    todas las poses en memoria: sirve para reproducir directo desde archivo).
+    hold_s es la pausa al llegar a cada pose: la misma para todas o una por pose.
+    """
+    limites = limites or Limites()
+    holds = None if isinstance(hold_s, (int, float)) else hold_s
+    q = tuple(float(x) for x in inicio[:N_JOINTS])
+    mag = int(inicio[N_JOINTS]) if len(inicio) > N_JOINTS else 0
+    t = 0.0
+    for k, p in enumerate(poses):
+        q1 = tuple(float(x) for x in p[:N_JOINTS])
+        dq = tuple(b - a for a, b in zip(q, q1))
+        dur, v, a, ta = _perfil(dq, limites)
+        hold = holds[k] if holds is not None else hold_s
+        seg = Segmento(t, dur, max(0.0, hold), q, dq, mag, int(p[N_JOINTS]), v, a, ta)
+        yield seg
+        t = seg.t_end
+        q, mag = q1, seg.mag1
+
+
+class Trayectoria:
+    """Trayectoria planificada completa sobre una lista de poses (m1, m2, m3, m4, mag)."""
+    def __init__(self, inicio: Sequence[int], poses: Iterable[Sequence[int]],
+                 limites: Optional[Limites] = None, hold_s: Union[float, Sequence[float]] = 0.0):
+        self.limites = limites or Limites()
+        self.segmentos: List[Segmento] = list(planificar(inicio, poses, self.limites, hold_s))
+        self._starts = [s.t0 for s in self.segmentos]
+        self.duracion = self.segmentos[-1].t_end if self.segmentos else 0.0
+
+    def __iter__(self) -> Iterator[Segmento]:
+        return iter(self.segmentos)
+
+    def sample(self, t: float) -> tuple:
+        """Setpoint (m1, m2, m3, m4, mag) en el instante t."""
+        if not self.segmentos:
+            return ()
+        k = max(0, bisect_right(self._starts, t) - 1)
+        return self.segmentos[k].sample(t)
+
+    def sample_many(self, rate_hz: float = DEFAULT_RATE_HZ) -> List[tuple]:
+        """Toda la trayectoria muestreada a rate_hz (incluye el último punto exacto)."""
+        dt = 1.0 / rate_hz
+        n = int(self.duracion / dt) + 1
+        out = [self.sample(k * dt) for k in range(n)]
+        if self.segmentos:
+            out.append(self.sample(self.duracion))
+        return out
+
+
+@dataclass
+class Reporte:
+    plan_s: float
+    real_s: float
+    setpoints: int
+    saltados: int        # ticks perdidos por llegar tarde (no se reenvían)
+    jitter_p50_ms: float
+    jitter_p95_ms: float
+    jitter_max_ms: float
+    cancelado: bool = False
+
+    def texto(self) -> str:
+        estado = "cancelada" if self.cancelado else "finalizada"
+        return (f"Secuencia {estado}: {self.real_s:.2f} s (plan {self.plan_s:.2f} s), "
+                f"jitter p50 {self.jitter_p50_ms:.1f} ms / p95 {self.jitter_p95_ms:.1f} ms / "
+                f"máx {self.jitter_max_ms:.1f} ms, saltados {self.saltados}")
+
+
+def _percentil(vals: List[float], q: float) -> float:
+    if not vals:
+        return 0.0
+    vals = sorted(vals)
+    return vals[min(len(vals) - 1, int(q * len(vals)))]
+
+
+def _pasos(segmentos: Iterable[Segmento], send: Callable[[tuple], None], rate_hz: float,
+           cancel: Optional[threading.Event], clock: Callable[[], float]) -> Generator[float, None, Reporte]:
+    """
+    Núcleo de reproducir(): envía los setpoints y cede cada espera (segundos) a quien
+    lo maneja, que duerme con time.sleep o con asyncio.sleep. Devuelve el Reporte.
+    """
+    dt = 1.0 / rate_hz
+    it = iter(segmentos)
+    seg = next(it, None)
+    lateness = []
+    saltados = 0
+    cancelado = False
+    plan = 0.0
+    t0 = clock()
+    k = 0
+    while seg is not None:
+        if cancel is not None and cancel.is_set():
+            cancelado = True
+            break
+        deadline = t0 + k * dt
+        now = clock()
+        if deadline > now:
+            yield deadline - now
+            now = clock()
+        late = now - deadline
+        if late > dt:
+            skip = int(late / dt)
+            saltados += skip
+            k += skip
+            deadline = t0 + k * dt
+            late = now - deadline
+        t = k * dt
+        while seg is not None and t >= seg.t_end:
+            plan = seg.t_end
+            nxt = next(it, None)
+            if nxt is None:
+                send(seg.sample(seg.t_end))  # último punto exacto
+                lateness.append(late)
+            seg = nxt
+        if seg is None:
+            break
+        send(seg.sample(t))
+        lateness.append(late)
+        k += 1
+    real = clock() - t0
+    return Reporte(plan, real, len(lateness), saltados,
+                   _percentil(lateness, 0.50) * 1000.0,
+                   _percentil(lateness, 0.95) * 1000.0,
+                   max(lateness, default=0.0) * 1000.0,
+                   cancelado)
+
+
+def reproducir(segmentos: Iterable[Segmento], send: Callable[[tuple], None],
+               rate_hz: float = DEFAULT_RATE_HZ,
+               cancel: Optional[threading.Event] = None,
+               clock: Callable[[], float] = time.monotonic,
+               sleep: Callable[[float], None] = time.sleep) -> Reporte:
+    """
+    Envía los setpoints de una Trayectoria (o de cualquier iterable de segmentos en
+    orden, p. ej. planificar(...)) a ritmo fijo. El tick k se programa en t0 + k/rate_hz;
+    si se llega tarde más de un tick se salta directo al tick que corresponde
+    (no se acumula atraso). Devuelve un Reporte con el tiempo real vs planificado
+    y el jitter (atraso de cada envío respecto de su deadline).
+    """
+    pasos = _pasos(segmentos, send, rate_hz, cancel, clock)
+    try:
+        while True:
+            sleep(next(pasos))
+    except StopIteration as fin:
+        return fin.value
+
+
+async def reproducir_async(segmentos: Iterable[Segmento], send: Callable[[tuple], None],
+                           rate_hz: float = DEFAULT_RATE_HZ,
+                           cancel: Optional[threading.Event] = None,
+                           clock: Callable[[], float] = time.monotonic) -> Reporte:
+    """Igual que reproducir(), pero espera con asyncio.sleep (corre como tarea de MotorAsync)."""
+    import asyncio   # sólo con MotorAsync; importarlo suma ~30 ms al arranque de la GUI
+    pasos = _pasos(segmentos, send, rate_hz, cancel, clock)
+    try:
+        while True:
+            await asyncio.sleep(next(pasos))
+    except StopIteration as fin:
+        return fin.value
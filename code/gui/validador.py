@@ -0,0 +1,236 @@
+"""
+Validación de secuencias completas antes de mandarlas al brazo.
+
+Revisa toda la lista de una vez (con numpy vectorizado sobre el array de poses; sin
+numpy con las tablas de cinematica, más lento):
+
+  - límites suaves por motor, en cuentas; por defecto los ANGLE_MIN/ANGLE_MAX de
+    robot_arm.ino (0..180° -> 0..RAW_MAX cuentas);
+  - salto máximo entre poses consecutivas (cuentas, el motor que más se mueve);
+  - envolvente de trabajo en mm (opcional): codo, muñeca y punta por encima de z_min,
+    punta por debajo de z_max y con distancia al eje entre r_min y r_max. El camino
+    entre dos poses es una recta en espacio articular pero una curva en el espacio, así
+    que se revisan también puntos intermedios cada `resolucion` cuentas. Por defecto no
+    se revisa: las medidas de cinematica.GEOMETRIA son aproximadas y con ellas poses
+    normales (0,0,0,0 incluida) quedan "bajo la mesa". Se activa con medidas reales.
+
+Cada problema se asigna a la pose de destino del tramo (la que hay que corregir).
+"""
+import math
+import time
+from array import array
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+
+import cinematica
+from cinematica import GEOMETRIA, NUMPY_AVAILABLE, Geometria
+
+if NUMPY_AVAILABLE:
+    import numpy as np
+
+N_JOINTS = 4
+
+# robot_arm.ino: ANGLE_MIN / ANGLE_MAX (grados) sobre RAW_MIN..RAW_MAX (cuentas)
+ANGLE_MIN = (0, 0, 0, 0)
+ANGLE_MAX = (180, 180, 180, 180)
+
+
+def limites_firmware(angle_min: Sequence[float] = ANGLE_MIN,
+                     angle_max: Sequence[float] = ANGLE_MAX) -> Tuple[tuple, tuple]:
+    """
+    Límites en grados del firmware -> (mínimo, máximo) en cuentas por motor. Un tope
+    en 0° o 180° no limita nada: el firmware satura el mapeo ahí (1021..1023 = 180°).
+    """
+    k = cinematica.RAW_MAX / cinematica.ANGLE_SPAN
+    return (tuple(0 if a <= 0 else int(math.ceil(a * k)) for a in angle_min),
+            tuple(1023 if a >= cinematica.ANGLE_SPAN else int(math.floor(a * k)) for a in angle_max))
+
+
+_MIN_FW, _MAX_FW = limites_firmware()
+
+
+@dataclass(frozen=True)
+class Envolvente:
+    z_min: float = 0.0        # mm: nada del brazo por debajo de la mesa
+    z_max: float = 1000.0
+    r_min: float = 0.0        # mm: punta alejada del eje de la base
+    r_max: float = 1000.0
+
+
+@dataclass(frozen=True)
+class Reglas:
+    minimo: Tuple[int, int, int, int] = _MIN_FW
+    maximo: Tuple[int, int, int, int] = _MAX_FW
+    paso_max: int = 1023              # cuentas entre poses consecutivas
+    envolvente: Optional[Envolvente] = None   # None: no se revisa la envolvente
+    resolucion: int = 16              # cuentas entre puntos intermedios revisados
+
+
+@dataclass
+class Informe:
+    n: int
+    problemas: Dict[int, str]         # índice de pose -> motivo (el primero encontrado)
+    limite: int = 0
+    paso: int = 0
+    envolvente: int = 0
+    puntos: int = 0                   # puntos revisados en la envolvente (poses + intermedios)
+    ms: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.problemas
+
+    def texto(self, max_items: int = 5) -> str:
+        if self.ok:
+            if self.puntos:
+                return (f"Secuencia válida: {self.n} poses y {self.puntos} puntos de la envolvente "
+                        f"revisados en {self.ms:.1f} ms.")
+            return f"Secuencia válida: {self.n} poses revisadas en {self.ms:.1f} ms (sin envolvente)."
+        items = sorted(self.problemas.items())[:max_items]
+        detalle = "; ".join(f"#{i + 1}: {m}" for i, m in items)
+        mas = f" (y {len(self.problemas) - len(items)} más)" if len(self.problemas) > len(items) else ""
+        return (f"{len(self.problemas)} poses con problemas (límites {self.limite}, saltos {self.paso}, "
+                f"envolvente {self.envolvente}): {detalle}{mas}")
+
+
+class SecuenciaInvalida(ValueError):
+    """La secuencia no pasó la validación; el informe dice qué poses corregir."""
+    def __init__(self, informe: Informe):
+        super().__init__(informe.texto())
+        self.informe = informe
+
+
+def validar(poses, reglas: Optional[Reglas] = None, inicio: Optional[Sequence[int]] = None,
+            geo: Geometria = GEOMETRIA) -> Informe:
+    """
+    Valida PoseStore, array('H') plano o iterable de poses. Con `inicio` también se
+    revisa el tramo desde ahí hasta la primera pose.
+    """
+    reglas = reglas or Reglas()
+    t0 = time.perf_counter()
+    data, stride = cinematica._como_filas(poses)
+    n = len(data) // stride
+    inf = Informe(n, {})
+    if n:
+        if NUMPY_AVAILABLE:
+            _validar_np(data, stride, reglas, inicio, geo, inf)
+        else:
+            _validar_py(data, stride, reglas, inicio, geo, inf)
+    inf.ms = (time.perf_counter() - t0) * 1000.0
+    return inf
+
+
+def _motivo_limite(q: Sequence[int], reglas: Reglas) -> str:
+    j = next(j for j in range(N_JOINTS) if not reglas.minimo[j] <= q[j] <= reglas.maximo[j])
+    return f"m{j + 1}={q[j]} fuera de [{reglas.minimo[j]}, {reglas.maximo[j]}]"
+
+
+def _motivo_paso(d: Sequence[int]) -> str:
+    j = max(range(N_JOINTS), key=lambda j: abs(d[j]))
+    return f"salto de {abs(d[j])} cuentas en m{j + 1}"
+
+
+def _motivo_envolvente(z_codo: float, z_muneca: float, z: float, r: float, env: Envolvente) -> str:
+    if min(z_codo, z_muneca, z) < env.z_min:
+        return f"brazo bajo la mesa (z={min(z_codo, z_muneca, z):.0f} mm)"
+    if z > env.z_max:
+        return f"punta demasiado alta (z={z:.0f} mm)"
+    return f"punta fuera del alcance permitido (r={r:.0f} mm)"
+
+
+# ---------------- numpy ----------------
+def _validar_np(data: array, stride: int, reglas: Reglas, inicio, geo: Geometria, inf: Informe):
+    q = np.frombuffer(data, dtype=np.uint16).reshape(-1, stride)[:, :N_JOINTS].astype(np.int32)
+    n = len(q)
+    lo = np.asarray(reglas.minimo, dtype=np.int32)
+    hi = np.asarray(reglas.maximo, dtype=np.int32)
+
+    fuera = np.flatnonzero(((q < lo) | (q > hi)).any(axis=1))
+    inf.limite = len(fuera)
+    for i in fuera.tolist():
+        inf.problemas.setdefault(i, _motivo_limite(q[i].tolist(), reglas))
+
+    q0 = q[:1] if inicio is None else np.asarray([list(inicio[:N_JOINTS])], dtype=np.int32)
+    prev = np.concatenate([q0, q[:-1]])
+    d = q - prev
+    salto = np.abs(d).max(axis=1)
+    largos = np.flatnonzero(salto > reglas.paso_max)
+    inf.paso = len(largos)
+    for i in largos.tolist():
+        inf.problemas.setdefault(i, _motivo_paso(d[i].tolist()))
+
+    env = reglas.envolvente
+    if env is None:
+        return
+    # puntos a revisar: k = 1..m por tramo (el último es la pose misma)
+    m = np.maximum(1, -(-salto // max(1, reglas.resolucion)))
+    total = int(m.sum())
+    seg = np.repeat(np.arange(n), m)
+    k = np.arange(total) - np.repeat(np.cumsum(m) - m, m) + 1
+    s = (k / m[seg])[:, None]
+    pts = np.rint(prev[seg] + d[seg] * s).astype(np.intp)
+    np.clip(pts, 0, 1023, out=pts)
+
+    t = np.asarray(cinematica.tablas(geo))
+    a2 = t[1][pts[:, 1]]
+    a3 = a2 + t[2][pts[:, 2]]
+    a4 = a3 + t[3][pts[:, 3]]
+    z_codo = geo.altura + geo.l1 * np.sin(a2)
+    z_muneca = z_codo + geo.l2 * np.sin(a3)
+    z = z_muneca + geo.l3 * np.sin(a4)
+    r = geo.l1 * np.cos(a2) + geo.l2 * np.cos(a3) + geo.l3 * np.cos(a4)
+    malo = ((np.minimum(np.minimum(z_codo, z_muneca), z) < env.z_min) | (z > env.z_max)
+            | (np.abs(r) < env.r_min) | (np.abs(r) > env.r_max))
+    inf.puntos = total
+    idx = np.flatnonzero(malo)
+    if len(idx):
+        # primer punto malo de cada tramo
+        segs, primero = np.unique(seg[idx], return_index=True)
+        inf.envolvente = len(segs)
+        for i, p in zip(segs.tolist(), idx[primero].tolist()):
+            inf.problemas.setdefault(i, _motivo_envolvente(float(z_codo[p]), float(z_muneca[p]), float(z[p]),
+                                                           float(abs(r[p])), env))
+
+
+# ---------------- sin numpy ----------------
+def _validar_py(data: array, stride: int, reglas: Reglas, inicio, geo: Geometria, inf: Informe):
+    _, t2, t3, t4 = cinematica.tablas(geo)
+    sin, cos = math.sin, math.cos
+    h, l1, l2, l3 = geo.altura, geo.l1, geo.l2, geo.l3
+    env = reglas.envolvente
+    lo, hi = reglas.minimo, reglas.maximo
+    res = max(1, reglas.resolucion)
+    prev = tuple(inicio[:N_JOINTS]) if inicio is not None else tuple(data[:N_JOINTS])
+    problemas = inf.problemas
+    for i in range(len(data) // stride):
+        b = i * stride
+        q = data[b], data[b + 1], data[b + 2], data[b + 3]
+        if not (lo[0] <= q[0] <= hi[0] and lo[1] <= q[1] <= hi[1]
+                and lo[2] <= q[2] <= hi[2] and lo[3] <= q[3] <= hi[3]):
+            inf.limite += 1
+            problemas.setdefault(i, _motivo_limite(q, reglas))
+        d = (q[0] - prev[0], q[1] - prev[1], q[2] - prev[2], q[3] - prev[3])
+        salto = max(abs(d[0]), abs(d[1]), abs(d[2]), abs(d[3]))
+        if salto > reglas.paso_max:
+            inf.paso += 1
+            problemas.setdefault(i, _motivo_paso(d))
+        if env is None:
+            prev = q
+            continue
+        m = max(1, -(-salto // res))
+        inf.puntos += m
+        for k in range(1, m + 1):
+            s = k / m
+            a2 = t2[min(1023, max(0, int(round(prev[1] + d[1] * s))))]
+            a3 = a2 + t3[min(1023, max(0, int(round(prev[2] + d[2] * s))))]
+            a4 = a3 + t4[min(1023, max(0, int(round(prev[3] + d[3] * s))))]
+            z_codo = h + l1 * sin(a2)
+            z_muneca = z_codo + l2 * sin(a3)
+            z = z_muneca + l3 * sin(a4)
+            r = abs(l1 * cos(a2) + l2 * cos(a3) + l3 * cos(a4))
+            if (min(z_codo, z_muneca, z) < env.z_min or z > env.z_max
+                    or r < env.r_min or r > env.r_max):
+                inf.envolvente += 1
+                problemas.setdefault(i, _motivo_envolvente(z_codo, z_muneca, z, r, env))
+                break
+        prev = q
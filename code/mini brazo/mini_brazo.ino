@@ -6,12 +6,50 @@ const float ALPHA=0.3f;
 
 int ema(int last,int now){ return (int)(ALPHA*now + (1.0f-ALPHA)*last); }
 
+// Protocolo binario opcional (ver code/gui/protocolo.py): la app manda "PROTO BIN\n"
+// y desde ahí cada POT sale como trama de 9 bytes en vez de texto.
+const uint8_t SYNC_BYTE=0xA5, FRAME_LEN=9, T_POT=0x2;
+bool protoBin=false;
+uint8_t seq=0;
+char lineBuf[24]; uint8_t lineLen=0;
+
+uint8_t crc8(const uint8_t *d,uint8_t n){
+  uint8_t c=0;
+  for(uint8_t i=0;i<n;i++){ c^=d[i]; for(uint8_t b=0;b<8;b++) c=(c&0x80)?(uint8_t)((c<<1)^0x07):(uint8_t)(c<<1); }
+  return c;
+}
+
+void pollSerial(){
+  while(Serial.available()){
+    char ch=Serial.read();
+    if(ch=='\n'){
+      lineBuf[lineLen]=0; lineLen=0;
+      if(strcmp(lineBuf,"PROTO BIN")==0){ Serial.println(F("PROTO BIN OK")); protoBin=true; }
+      else if(strcmp(lineBuf,"PROTO ASCII")==0){ protoBin=false; Serial.println(F("PROTO ASCII OK")); }
+    } else if(ch!='\r' && lineLen<sizeof(lineBuf)-1){ lineBuf[lineLen++]=ch; }
+  }
+}
+
+void sendPotFrame(){
+  uint8_t f[FRAME_LEN];
+  f[0]=SYNC_BYTE; f[1]=T_POT<<4; f[2]=seq++;
+  // 4 canales de 10 bits, little-endian: c0 | c1<<10 | c2<<20 | c3<<30
+  f[3]=prevv[0]&0xFF;
+  f[4]=((prevv[0]>>8)&0x03)|((prevv[1]&0x3F)<<2);
+  f[5]=((prevv[1]>>6)&0x0F)|((prevv[2]&0x0F)<<4);
+  f[6]=((prevv[2]>>4)&0x3F)|((prevv[3]&0x03)<<6);
+  f[7]=(prevv[3]>>2)&0xFF;
+  f[8]=crc8(f+1,FRAME_LEN-2);
+  Serial.write(f,FRAME_LEN);
+}
+
 void setup(){
   Serial.begin(115200);               // <-- BAUD para la app (poné "Baud (Mini)" = 115200)
   for(int i=0;i<4;i++){ val[i]=prevv[i]=analogRead(PINS[i]); }
 }
 
 void loop(){
+  pollSerial();
   bool changed=false;
   for(int i=0;i<4;i++){
     int raw=analogRead(PINS[i]);
@@ -19,7 +57,9 @@ void loop(){
     val[i]=f;
     if(abs(f-prevv[i])>=DEADBAND){ prevv[i]=f; changed=true; }
   }
-  if(changed){
+  if(changed && protoBin){
+    sendPotFrame();
+  } else if(changed){
     Serial.print("POT "); Serial.print(prevv[0]); Serial.print(' ');
     Serial.print(prevv[1]); Serial.print(' '); Serial.print(prevv[2]); Serial.print(' ');
     Serial.print(prevv[3]); Serial.print('\n');